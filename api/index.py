@@ -7,6 +7,9 @@ import time
 import requests
 import string
 import secrets
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout
+import sys
 
 def generate_nanoid(size=8):
     """nanoid 스타일의 짧은 ID 생성 (8자리 기본)"""
@@ -16,8 +19,41 @@ def generate_nanoid(size=8):
 # .env 파일 로드
 load_dotenv()
 
+# 프로젝트 루트의 공용 모듈 import 경로 추가 (환경변수를 import 시점에 읽으므로 .env 로드 후 import)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import generation
+import fal_webhook
+import assets
+import staging
+import storage
+import compositor
+import providers
+import retone
+import validation
+import fal_keys
+import feed
+import page_cache
+import profiler
+import prompts
+import memory_budget
+import chunked_upload
+
 app = Flask(__name__, template_folder='../templates')
 app.secret_key = 'ai-4-cut-generator-secret-key-2024'
+# 요청 본문 상한 - 넘으면 본문을 읽기 전에 413 (사진 2장의 data URI + 폼 필드 기준)
+app.config['MAX_CONTENT_LENGTH'] = validation.REQUEST_MAX_BYTES
+
+# 반응형 이미지 manifest 조회 함수 (templates/index.html 의 responsive_img 매크로에서 사용)
+app.jinja_env.globals.update(asset_srcset=assets.srcset, asset_url=assets.url, asset_size=assets.size)
+
+# 요청마다 같은 정적 페이지는 시작 시 한 번 렌더링 + 압축 (page_cache.static_response 로 응답)
+static_pages = {
+    'index': page_cache.prerender(app, 'index.html'),
+    'result': page_cache.prerender(app, 'result.html', saved_image=None),
+}
+
+# 요청 샘플링 프로파일러 (PROFILE_TOKEN / PROFILE_SAMPLE_RATE 설정 시에만 훅 등록)
+profiler.init_app(app)
 
 # FAL AI API 키 설정 (환경변수에서 로드)
 FAL_KEY = os.getenv('FAL_KEY')
@@ -28,23 +64,25 @@ else:
     if not os.getenv('FAL_KEY'):
         print("WARNING: FAL_KEY not found in environment")
 
-# Supabase 설정
-supabase_client = None
-SUPABASE_URL = os.getenv('SUPABASE_URL')
-SUPABASE_KEY = os.getenv('SUPABASE_SERVICE_ROLE_KEY') or os.getenv('SUPABASE_KEY')
-if SUPABASE_URL and SUPABASE_KEY:
-    try:
-        from supabase import create_client
-        supabase_client = create_client(SUPABASE_URL, SUPABASE_KEY)
-        print("✅ Supabase connected")
-    except Exception as e:
-        print(f"⚠️ Supabase connection failed: {e}")
-else:
-    print("⚠️ Supabase credentials not found")
+# 결과 저장소 설정 (STORAGE_BACKEND=supabase|local, 기본은 Supabase 자격증명이 있으면 Supabase)
+storage_backend = storage.create_storage()
+
+# 이미지 생성 프로바이더 라우터 (FAL, Gemini - 지연시간/에러율 기반 선택 및 자동 전환)
+generation_router = providers.create_router()
 
-def create_gallery_placeholder(layout, style, color_mode):
-    """갤러리 레코드를 미리 생성하고 short_id 반환 (이미지 URL은 나중에 업데이트)"""
-    if not supabase_client:
+# 생성 요청과 겹쳐 실행할 저장소 작업 (gallery placeholder insert, 결과 업로드 + 완료 RPC)
+pipeline_executor = ThreadPoolExecutor(max_workers=int(os.getenv('PIPELINE_MAX_WORKERS', '8')), thread_name_prefix='pipeline')
+# 생성이 끝난 뒤 placeholder insert 를 더 기다리는 최대 시간 (넘으면 공유 링크 없이 결과 반환)
+GALLERY_PLACEHOLDER_WAIT_SECONDS = float(os.getenv('GALLERY_PLACEHOLDER_WAIT_SECONDS', '2'))
+# 결과 저장(업로드 + 완료 RPC)을 응답 전에 기다리는 최대 시간 (넘으면 결과를 먼저 반환하고 저장은 백그라운드에서 계속)
+GALLERY_COMPLETE_WAIT_SECONDS = float(os.getenv('GALLERY_COMPLETE_WAIT_SECONDS', '2'))
+
+def create_gallery_placeholder(layout, style, color_mode, is_public=False):
+    """갤러리 레코드를 미리 생성하고 short_id 반환 (이미지 URL은 나중에 업데이트)
+
+    공개 피드에는 사용자가 공유에 동의한 요청(is_public=True)만 노출되고 나머지는 공유 링크로만 볼 수 있다.
+    """
+    if not storage_backend:
         return None
 
     try:
@@ -55,198 +93,325 @@ def create_gallery_placeholder(layout, style, color_mode):
             'layout': layout,
             'style': style,
             'color_mode': color_mode,
-            'is_public': True
+            'is_public': is_public
         }
-        result = supabase_client.table('gallery').insert(gallery_data).execute()
-        gallery_id = result.data[0]['id'] if result.data else None
+        gallery_id = storage_backend.insert_gallery(gallery_data)
         print(f"✅ Gallery placeholder created: {gallery_id}")
         return gallery_id
     except Exception as e:
         print(f"❌ Gallery placeholder error: {e}")
         return None
 
-def update_gallery_with_images(gallery_id, image_data_list):
-    """생성 완료 후 gallery 레코드에 여러 이미지 URL 업데이트"""
-    if not supabase_client or not gallery_id:
+def start_gallery_placeholder(layout, style, color_mode, is_public=False):
+    """gallery placeholder 생성을 백그라운드에서 시작 (gallery_id 또는 None 을 돌려주는 Future 반환)"""
+    return pipeline_executor.submit(create_gallery_placeholder, layout, style, color_mode, is_public)
+
+def wants_public_feed():
+    """요청이 공개 피드 공유에 동의했는지 (폼 필드 is_public=1, 기본은 비공개)"""
+    return request.form.get('is_public') == '1'
+
+def join_gallery_placeholder(placeholder):
+    """placeholder 생성 완료를 GALLERY_PLACEHOLDER_WAIT_SECONDS 까지 기다려 gallery_id 반환 (실패/지연 시 None)"""
+    try:
+        return placeholder.result(timeout=GALLERY_PLACEHOLDER_WAIT_SECONDS)
+    except FuturesTimeout:
+        print(f"⚠️ Gallery placeholder still pending after {GALLERY_PLACEHOLDER_WAIT_SECONDS}s, continuing without share URL")
+        return None
+
+def upload_images_to_storage(image_data_list):
+    """base64 이미지 목록을 Storage 에 동시에 업로드하고 공개 URL 목록 반환 (입력 순서 유지)"""
+    files = []
+    for image_data in image_data_list:
+        filename = f"{generate_nanoid(12)}.png"
+
+        # base64 데이터에서 실제 바이너리 추출
+        if image_data.startswith('data:'):
+            image_data = image_data.split(',')[1]
+        files.append((filename, base64.b64decode(image_data), 'image/png'))
+
+    # Storage에 업로드 후 공개 URL 받기
+    image_urls = storage_backend.upload_images(files)
+    print(f"✅ {len(image_urls)} images saved to {storage_backend.name}")
+    return image_urls
+
+def update_gallery_with_images(gallery_id, image_data_list, extra_fields=None, stats=None):
+    """생성 완료 후 gallery 레코드에 여러 이미지 URL 업데이트 (extra_fields 는 함께 저장할 추가 컬럼)
+
+    stats 를 주면 생성 통계도 같은 호출(RPC 1회)로 기록 (배치는 변형별 통계 목록)
+    """
+    if not storage_backend:
+        return []
+    if not gallery_id:
+        if stats:
+            try:
+                storage_backend.insert_stats(stats)
+            except Exception as e:
+                print(f"❌ Supabase stats error: {e}")
         return []
 
     try:
-        image_urls = []
-        for image_data in image_data_list:
-            # 1. Storage에 이미지 저장
-            filename = f"{generate_nanoid(12)}.png"
-
-            # base64 데이터에서 실제 바이너리 추출
-            if image_data.startswith('data:'):
-                image_data = image_data.split(',')[1]
-            image_bytes = base64.b64decode(image_data)
-
-            # Storage에 업로드
-            storage_result = supabase_client.storage.from_('ai4cut-images').upload(
-                filename,
-                image_bytes,
-                {'content-type': 'image/png'}
-            )
-
-            # 공개 URL 생성
-            image_url = f"{SUPABASE_URL}/storage/v1/object/public/ai4cut-images/{filename}"
-            image_urls.append(image_url)
-            print(f"✅ Image saved to Supabase: {image_url}")
-
-        # 2. 갤러리 레코드 업데이트 (image_urls 배열로 저장)
-        supabase_client.table('gallery').update({
+        # 1. Storage에 이미지 저장
+        image_urls = upload_images_to_storage(image_data_list)
+
+        # 2. 갤러리 레코드 업데이트 (image_urls 배열로 저장) + 통계 기록
+        storage_backend.complete_gallery(gallery_id, dict(extra_fields or {}, **{
             'image_url': image_urls[0] if image_urls else None,
             'image_urls': image_urls
-        }).eq('id', gallery_id).execute()
-        print(f"✅ Gallery updated with {len(image_urls)} images: {gallery_id}")
+        }), stats)
+        print(f"✅ Gallery updated with {len(image_urls)} images: {gallery_id}" + (f" (stats: {stats})" if stats else ""))
 
         return image_urls
     except Exception as e:
         print(f"❌ Gallery update error: {e}")
         return []
 
+def finish_gallery(gallery_id, image_data_list, extra_fields=None, stats=None, save=None):
+    """결과 저장을 pipeline_executor 에서 시작하고 GALLERY_COMPLETE_WAIT_SECONDS 까지만 기다림
+
+    save 를 주면 update_gallery_with_images 대신 실행 (저장 전에 추가 업로드가 필요한 경우).
+    저장소가 느리거나 장애여도 응답은 이 시간 이상 지연되지 않는다. (저장소 호출의 timeout 은 수십 초)
+    반환값은 (완료 Future, 시간 안에 끝난 경우 이미지 URL 목록 / 아니면 None)
+    """
+    save = save or (lambda: update_gallery_with_images(gallery_id, image_data_list, extra_fields, stats))
+    completion = pipeline_executor.submit(save)
+    try:
+        return completion, completion.result(timeout=GALLERY_COMPLETE_WAIT_SECONDS)
+    except FuturesTimeout:
+        print(f"⚠️ Gallery {gallery_id} still saving after {GALLERY_COMPLETE_WAIT_SECONDS}s, returning result first")
+        return completion, None
+    except Exception as e:
+        print(f"⚠️ Supabase update failed (non-blocking): {e}")
+        return completion, []
+
+def create_gallery_variant(source_gallery, image_data_list, extra_fields=None):
+    """기존 결과에서 파생된 새 gallery 레코드 생성 (재합성 등 FAL 호출 없는 변형 저장용) - 새 gallery_id 반환
+
+    공유 링크만 있으면 누구나 변형을 만들 수 있으므로 변형은 항상 비공개로 저장
+    """
+    extra_fields = dict(extra_fields or {})
+    if source_gallery.get('cut_urls'):
+        extra_fields.setdefault('cut_urls', source_gallery['cut_urls'])
+
+    gallery_id = create_gallery_placeholder(
+        source_gallery.get('layout'),
+        source_gallery.get('style'),
+        extra_fields.get('color_mode', source_gallery.get('color_mode'))
+    )
+    if gallery_id:
+        finish_gallery(gallery_id, image_data_list, extra_fields)
+    return gallery_id
+
+def fetch_gallery(gallery_id):
+    """gallery 레코드 조회 (없거나 오류 시 None)"""
+    if not storage_backend or not gallery_id:
+        return None
+
+    try:
+        return storage_backend.get_gallery(gallery_id)
+    except Exception as e:
+        print(f"❌ Gallery fetch error: {e}")
+        return None
+
+def mark_gallery_failed(gallery_id):
+    """webhook 작업 실패 시 gallery 레코드에 실패 상태 기록"""
+    if not storage_backend or not gallery_id:
+        return
+
+    try:
+        storage_backend.update_gallery(gallery_id, {'status': 'failed'})
+        print(f"⚠️ Gallery marked as failed: {gallery_id}")
+    except Exception as e:
+        print(f"❌ Gallery status update error: {e}")
+
+def generate_footprint():
+    """generate 요청의 예상 메모리 - 업로드 + 결과 이미지 (합성 모드 최대 컷 수 또는 기본 2장)"""
+    result_count = max([2] + [compositor.cut_count(layout) for layout in compositor.LAYOUTS])
+    return memory_budget.upload_footprint(request.content_length) + memory_budget.result_footprint(result_count)
+
+def parse_batch_variants():
+    """generate/batch 의 variants JSON 문자열 파싱 (형식이 틀리면 None)"""
+    import json
+
+    try:
+        return json.loads(request.form.get('variants', '[]'))
+    except ValueError:
+        return None
+
+def batch_footprint():
+    """generate/batch 요청의 예상 메모리 - 업로드 + 실제 요청한 변형마다 결과 1장 (잘못된 요청은 1장으로 계산)"""
+    variants = parse_batch_variants()
+    variant_count = min(len(variants), generation.BATCH_MAX_VARIANTS) if isinstance(variants, list) and variants else 1
+    return memory_budget.upload_footprint(request.content_length) + memory_budget.result_footprint(variant_count)
+
+def build_stats(layout, style, color_mode, is_duo, image_count):
+    """generations 테이블에 기록할 생성 통계 행"""
+    return {
+        'layout': layout,
+        'style': style,
+        'color_mode': color_mode,
+        'is_duo': is_duo,
+        'image_count': image_count
+    }
+
 def save_stats_to_supabase(layout, style, color_mode, is_duo, image_count):
-    """Supabase에 생성 통계 기록 (요청당 1회)"""
-    if not supabase_client:
+    """저장소에 생성 통계 기록 (요청당 1회, gallery 업데이트가 있으면 update_gallery_with_images(stats=...) 사용)"""
+    if not storage_backend:
         return
 
     try:
-        stats_data = {
-            'layout': layout,
-            'style': style,
-            'color_mode': color_mode,
-            'is_duo': is_duo,
-            'image_count': image_count
-        }
-        supabase_client.table('generations').insert(stats_data).execute()
+        stats_data = build_stats(layout, style, color_mode, is_duo, image_count)
+        storage_backend.insert_stats(stats_data)
         print(f"✅ Stats recorded: {stats_data}")
     except Exception as e:
         print(f"❌ Supabase stats error: {e}")
 
-# AI4컷 생성 프롬프트 생성 함수 (날짜, 프레임 색상, 레이아웃, 색상모드, 스타일, 듀오 모드 동적 생성)
-def get_ai_4_cut_prompt(frame_color='black', layout='1x4', color_mode='color', style='default', is_duo=False):
-    from datetime import datetime
-    current_date = datetime.now().strftime('%Y.%m.%d')
-
-    # 프레임 색상 (hex 코드 또는 기본 색상 이름)
-    if frame_color.startswith('#'):
-        frame_instruction = f"color {frame_color}"
-    else:
-        color_map = {
-            'black': 'color #000000',
-            'gray': 'color #808080',
-            'white': 'color #FFFFFF'
-        }
-        frame_instruction = color_map.get(frame_color, 'color #000000')
-
-    # 색상 모드 설정
-    color_mode_instructions = {
-        'bw': "All photos must be in BLACK AND WHITE (grayscale/monochrome). No color in the photos.",
-        'cool': "Apply COOL TONE styling: The person's skin should have a fair, pinkish-rosy undertone typical of cool skin tones. Add subtle blue-ish tint to the overall image. Skin looks best with silver/blue-based tones.",
-        'warm': "Apply SUBTLE WARM TONE styling: Add a very gentle, natural warm glow. Slightly enhance skin's healthy peachy-pink tones. Keep skin looking natural and healthy, NOT yellow or orange. Just a hint of warmth.",
-        'color': ""
-    }
-    color_instruction = color_mode_instructions.get(color_mode, "")
-
-    # 스타일 설정
-    style_instructions = {
-        'default': "",
-        'animation': "IMPORTANT STYLE: Transform the person into 2D ANIME/ANIMATION style artwork. Convert to Japanese anime art style with cel-shading, big expressive eyes, and stylized features typical of anime characters.",
-        'realistic': "IMPORTANT STYLE: If the input image is an animated character or non-real person, transform them into REALISTIC PHOTOREALISTIC style. Make them look like a real human cosplaying the character, with realistic skin texture, lighting, and human features. If the character's nationality is not clearly identifiable, default to Korean person appearance.",
-        'disney': "IMPORTANT STYLE: Transform the person into DISNEY/PIXAR 3D animation style. Apply the characteristic Disney look with big expressive eyes, smooth skin, stylized proportions, and the magical quality typical of Disney and Pixar animated movies.",
-        'ghibli': "IMPORTANT STYLE: Apply STUDIO GHIBLI art style to the person. Convert to 2D hand-drawn animation style like Ghibli films. Keep the same person, pose and expression but render in Ghibli's distinctive drawing style with soft lines and gentle colors.",
-        'baby': "IMPORTANT STYLE: Apply CHILD transformation filter. Transform the person to look like a young child version of themselves (age 5-6 years old). Keep the same facial features and identity but make them look like an adorable child with rounder cheeks, bigger eyes relative to face, softer skin, and childlike proportions. Similar to Snapchat baby filter effect.",
-        'old': "IMPORTANT STYLE: Apply AGING transformation filter. Transform the person to look like a middle-aged to older version of themselves (age 50-60 years old). Keep the same facial features and identity but add subtle aging effects: some wrinkles, slight graying hair, and mature facial features. Similar to Snapchat old age filter effect.",
-        'studio': "IMPORTANT STYLE: Place the person in a clean, professional STUDIO SETTING. Use a simple, clean background (white, light gray, or soft gradient). Apply professional studio lighting with soft shadows. The photo should look like it was taken in a professional photo studio with proper lighting setup.",
-        'iphone': "IMPORTANT STYLE: Make the photo look like a casual SNAPSHOT taken with an old iPhone. Apply slight motion blur for a candid feel. No clear composition or framing - looks spontaneous and unplanned. Add soft ambient lighting with light diffusion/bloom effect. The photo should feel like an authentic, unposed moment captured casually."
-    }
-    style_instruction = style_instructions.get(style, "")
-
-    # 듀오 모드 (두 명) 프롬프트
-    duo_instruction = ""
-    if is_duo:
-        duo_instruction = "IMPORTANT: Two images are provided. First, determine if they are the SAME person or TWO DIFFERENT people. If SAME PERSON: use both images as reference for that one person's appearance from different angles, generate photos of that SINGLE person only. If TWO DIFFERENT PEOPLE: generate photos featuring BOTH people together naturally in each frame as friends, couple, or companions interacting with each other."
-
-    # 레이아웃별 프롬프트 생성
-    if layout == '1x1':
-        layout_instruction = "IMPORTANT: Single large image layout (1x1). One big portrait photo taking up most of the frame."
-        layout_structure = "[narrow top margin] → [large single image] → [bottom section with logo, date, QR]."
-        image_count_text = "1 image"
-        aspect_ratio = "3:4 aspect ratio (portrait orientation)"
-        frame_size = "2120x3187 pixels"
-    elif layout == '1x3':
-        layout_instruction = "IMPORTANT: 3 images arranged in SINGLE COLUMN vertically (1x3 layout). NOT 2x2, NOT any other layout. Only vertical single column with 3 images."
-        layout_structure = "[narrow top margin] → [image 1] → [image 2] → [image 3] → [bottom section with logo, date, QR]."
-        image_count_text = "3 images"
-        aspect_ratio = "1:1 aspect ratio (square)"
-        frame_size = "1060x3187 pixels"
-    elif layout == '2x2':
-        layout_instruction = "IMPORTANT: 4 images arranged in 2x2 grid layout. Two images in first row, two images in second row."
-        layout_structure = "[narrow top margin] → [Row 1: image 1 | image 2] → [Row 2: image 3 | image 4] → [bottom section with logo, date, QR]."
-        image_count_text = "4 images"
-        aspect_ratio = "3:4 aspect ratio (portrait orientation)"
-        frame_size = "2120x3187 pixels"
-    else:  # 1x4 (default)
-        layout_instruction = "IMPORTANT: 4 images arranged in SINGLE COLUMN vertically (1x4 layout). NOT 2x2, NOT 2x3, NOT 2x4. Only vertical single column layout."
-        layout_structure = "[narrow top margin] → [image 1] → [image 2] → [image 3] → [image 4] → [bottom section with logo, date, QR]."
-        image_count_text = "4 images"
-        aspect_ratio = "4:3 aspect ratio"
-        frame_size = "1060x3187 pixels"
-
-    # 실제 인물 미묘한 보정
-    beauty_instruction = "SUBTLE ENHANCEMENT: If the input is a real person, apply very subtle and unnoticeable facial enhancement. The enhancement should be imperceptible: slightly improved skin clarity and natural glow, very slightly refined facial contour/jawline, and subtly enlarged eyes. All changes must be extremely subtle and NOT obvious or detectable."
-
-    return f"""Create an AI-4-cut photo strip. Full frame size {frame_size}.
-{layout_instruction}
-{duo_instruction}
-{image_count_text}, each with {aspect_ratio} with different natural poses and expressions.
-{style_instruction}
-{color_instruction}
-{beauty_instruction}
-All frame with {frame_instruction}. No text on top of frame. Top margin should be narrow, similar to side margins, with images positioned accordingly.
-Layout structure: {layout_structure}
-At the bottom of the frame, add 'MIRAI' (use logo.png) and '{current_date}' in vertical center alignment.
-Date should be 10% of logo size, small. Do not include 'AI4컷' text.
-QR code should be inserted small and naturally at the bottom right corner of the frame (to the right of the date),
-half the size of the logo, as small as possible while maintaining QR functionality."""
+def read_uploaded_images():
+    """요청의 image(필수), image2(선택) 파일 읽기 - (이미지 bytes 목록, 에러 메시지) 반환"""
+    uploaded_file = request.files.get('image')
+    if not uploaded_file or not uploaded_file.filename:
+        return None, '이미지를 업로드해주세요.'
+
+    uploaded_file.seek(0, 0)
+    image_data = uploaded_file.read()
+    info, error = validation.inspect_image(image_data)
+    if error:
+        return None, error
+    print(f"Image 1 size: {len(image_data)} bytes, {info.mime_type} {info.width}x{info.height}, filename: {uploaded_file.filename}")
+
+    image_data_list = [image_data]
+    uploaded_file2 = request.files.get('image2')
+    if uploaded_file2 and uploaded_file2.filename:
+        uploaded_file2.seek(0, 0)
+        image_data2 = uploaded_file2.read()
+        info2, error = validation.inspect_image(image_data2)
+        if error:
+            return None, f'두 번째 사진: {error}'
+        image_data_list.append(image_data2)
+        print(f"Image 2 size: {len(image_data2)} bytes, {info2.mime_type} {info2.width}x{info2.height}, filename: {uploaded_file2.filename}")
+
+    return image_data_list, None
+
+def get_request_images():
+    """generate 요청의 입력 이미지 - upload_token 이 있으면 스테이징된 data URI, 없으면 검증된 업로드 bytes
+
+    스테이징은 인스턴스 메모리에 있으므로 다른 인스턴스로 온 요청은 토큰을 찾지 못한다.
+    이때 요청에 사진 파일도 함께 있으면 그 파일을 쓰고, 없으면 410 upload_expired (클라이언트가 사진을 직접 실어 재요청).
+    (이미지 목록, 에러 응답) 반환 - data URI 인코딩은 encode_request_images 에서
+    """
+    upload_token = request.form.get('upload_token')
+    if upload_token:
+        user_image_uris = staging.get_staged_images(upload_token)
+        if user_image_uris:
+            print(f"Using staged upload: {len(user_image_uris)} images")
+            return user_image_uris, None
+        if not request.files.get('image'):
+            return None, (jsonify({'error': '업로드한 사진이 만료되었습니다. 다시 시도해주세요.', 'code': 'upload_expired'}), 410)
+        print("Staged upload not found on this instance, using attached images")
+
+    image_data_list, error = read_uploaded_images()
+    if error:
+        return None, (jsonify({'error': error}), 400)
+    return image_data_list, None
+
+def encode_request_images(images):
+    """get_request_images 결과를 data URI 목록으로 변환 (스테이징된 URI 는 그대로 사용)"""
+    user_image_uris = [image if isinstance(image, str) else generation.encode_image_data_uri(image) for image in images]
+    print(f"User images prepared: {len(user_image_uris)}")
+    return user_image_uris
+
+def get_request_image_uris():
+    """generate 요청의 입력 이미지 URI 목록 - (이미지 URI 목록, 에러 응답) 반환"""
+    images, error_response = get_request_images()
+    if error_response:
+        return None, error_response
+    return encode_request_images(images), None
 
 @app.route('/')
 def index():
-    return render_template('index.html')
+    return page_cache.static_response(request, static_pages['index'])
 
 @app.route('/result')
 def result():
-    return render_template('result.html', saved_image=None)
+    return page_cache.static_response(request, static_pages['result'])
 
 @app.route('/r/<gallery_id>')
 def result_by_id(gallery_id):
-    """저장된 결과 이미지 조회 페이지 (24시간 만료)"""
+    """저장된 결과 이미지 조회 페이지 (24시간 만료, 완료된 결과는 렌더링 결과를 캐시하고 ETag/304 응답)"""
     from flask import redirect, url_for
-    from datetime import datetime, timedelta, timezone
 
-    if not supabase_client:
+    if not storage_backend:
         return redirect(url_for('index'))
 
+    # 완료된 결과는 렌더링된 HTML 재사용 (If-None-Match 가 맞으면 본문 없이 304)
+    cached = page_cache.get_result_page(gallery_id)
+    if cached:
+        etag, body, expires_at = cached
+        return page_cache.html_response(request, body, etag, expires_at)
+
     try:
         # 갤러리에서 이미지 조회
-        result = supabase_client.table('gallery').select('*').eq('id', gallery_id).single().execute()
-        if result.data:
-            # 24시간 만료 체크
-            created_at_str = result.data.get('created_at')
-            if created_at_str:
-                created_at = datetime.fromisoformat(created_at_str.replace('Z', '+00:00'))
-                now = datetime.now(timezone.utc)
-                if now - created_at > timedelta(hours=24):
-                    print(f"⏰ Gallery {gallery_id} expired (created: {created_at})")
-                    return redirect(url_for('index'))
-
-            return render_template('result.html', saved_image=result.data)
-        else:
+        gallery = storage_backend.get_gallery(gallery_id)
+        if not gallery:
             return redirect(url_for('index'))
+
+        # 24시간 만료 체크 (Supabase는 UTC 시간 반환)
+        expires_at = page_cache.expires_at(gallery)
+        if expires_at and expires_at <= time.time():
+            print(f"⏰ Gallery {gallery_id} expired (created: {gallery.get('created_at')})")
+            return redirect(url_for('index'))
+
+        etag = page_cache.gallery_etag(gallery)
+        body = render_template('result.html', saved_image=gallery)
+        settled = page_cache.is_settled(gallery)
+        if settled:
+            page_cache.put_result_page(gallery_id, etag, body, expires_at)
+        return page_cache.html_response(request, body, etag, expires_at, cacheable=settled)
     except Exception as e:
         print(f"Gallery fetch error: {e}")
         return redirect(url_for('index'))
 
+@app.route('/media/<path:filename>')
+def media(filename):
+    """로컬 저장소 결과 이미지 서빙 (Range 요청/조건부 요청 지원, 파일명이 고유하므로 장기 캐시)"""
+    from flask import send_from_directory, abort
+    if not isinstance(storage_backend, storage.LocalStorage):
+        abort(404)
+    response = send_from_directory(storage_backend.media_dir, filename, conditional=True, max_age=86400)
+    response.headers['Cache-Control'] = 'public, max-age=86400, immutable'
+    return response
+
+@app.route('/media/thumbs/<int:width>/<filename>')
+def media_thumbnail(width, filename):
+    """로컬 저장소 결과 썸네일 (WebP, 첫 요청 시 생성 후 디스크에 보관)"""
+    from flask import send_from_directory, abort
+    if not isinstance(storage_backend, storage.LocalStorage) or width not in feed.THUMB_WIDTHS:
+        abort(404)
+    thumb_dir = storage_backend.ensure_thumbnail(width, filename)
+    if not thumb_dir:
+        abort(404)
+    response = send_from_directory(thumb_dir, filename, conditional=True, max_age=86400)
+    response.headers['Cache-Control'] = 'public, max-age=86400, immutable'
+    return response
+
+@app.route('/api/feed')
+def public_feed():
+    """공개 결과 피드 (최근 24시간, cursor 로 다음 페이지 조회, 원본 대신 썸네일 URL 제공)"""
+    if not storage_backend:
+        return jsonify({'items': [], 'next_cursor': None})
+
+    limit = min(max(request.args.get('limit', feed.FEED_PAGE_SIZE, type=int), 1), feed.FEED_MAX_PAGE_SIZE)
+    try:
+        page = feed.get_feed(storage_backend, limit, request.args.get('cursor'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        print(f"❌ Feed error: {e}")
+        return jsonify({'error': '피드를 불러올 수 없습니다.'}), 500
+
+    response = jsonify(page)
+    response.headers['Cache-Control'] = f"public, max-age={feed.FEED_CACHE_TTL}"
+    return response
+
 @app.route('/og-image.png')
 def og_image():
     from flask import send_file
@@ -277,34 +442,447 @@ def ads_txt():
     ads_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'static', 'ads.txt')
     return send_file(ads_path, mimetype='text/plain')
 
-@app.route('/generate', methods=['POST'])
-def generate_image():
-    """동기 방식으로 AI4컷 생성 - Vercel serverless 환경에서 작동"""
+@app.route('/fal/webhook', methods=['POST'])
+def fal_webhook_receiver():
+    """FAL 완료 콜백 수신 - 결과 다운로드 후 gallery 업데이트 (중복 콜백은 한 번만 처리)"""
+    gallery_id = request.args.get('gallery_id')
+    is_duo = request.args.get('duo') == '1'
+    if not fal_webhook.verify_webhook(gallery_id, is_duo, request.args.get('token')):
+        print(f"❌ Invalid FAL webhook signature: {gallery_id}")
+        return jsonify({'error': 'invalid webhook signature'}), 401
+
+    payload = request.get_json(silent=True) or {}
+    print(f"📩 FAL webhook received: {gallery_id} (request_id: {payload.get('request_id')}, status: {payload.get('status')})")
+
+    if not fal_webhook.claim_job(gallery_id):
+        print(f"↩️ Duplicate FAL webhook ignored: {gallery_id}")
+        return jsonify({'success': True, 'duplicate': True})
+
+    # 다른 인스턴스에서 이미 처리된 콜백인지 확인
+    gallery = fetch_gallery(gallery_id)
+    if not gallery:
+        fal_webhook.release_job(gallery_id)
+        return jsonify({'error': 'gallery not found'}), 404
+    if gallery.get('image_urls') or gallery.get('image_url'):
+        print(f"↩️ Gallery already completed, webhook ignored: {gallery_id}")
+        return jsonify({'success': True, 'duplicate': True})
+
+    ok, result_data, error = fal_webhook.parse_callback(payload)
+    if not ok:
+        print(f"❌ FAL job failed: {gallery_id} ({error})")
+        mark_gallery_failed(gallery_id)
+        return jsonify({'success': True, 'status': 'failed'})
+
+    result_urls = generation.extract_result_urls(result_data)
+    result_data_uris = generation.download_result_images(result_urls)
+    if not result_data_uris:
+        mark_gallery_failed(gallery_id)
+        return jsonify({'success': True, 'status': 'failed'})
+
+    stats = build_stats(gallery.get('layout'), gallery.get('style'), gallery.get('color_mode'), is_duo, len(result_data_uris))
+    image_urls = update_gallery_with_images(gallery_id, result_data_uris, stats=stats)
+    if not image_urls:
+        # 저장 실패 시 FAL 재시도 콜백이 다시 처리하도록 권한 반환
+        fal_webhook.release_job(gallery_id)
+        return jsonify({'error': 'gallery update failed'}), 500
+
+    print(f"✅ FAL webhook job completed: {gallery_id} ({len(image_urls)} images)")
+    return jsonify({'success': True, 'status': 'done', 'image_count': len(image_urls)})
+
+@app.route('/jobs/<gallery_id>')
+def job_status(gallery_id):
+    """webhook 모드 생성 작업 상태 조회 (클라이언트 폴링용)"""
+    gallery = fetch_gallery(gallery_id)
+    if not gallery:
+        return jsonify({'error': '작업을 찾을 수 없습니다.'}), 404
+
+    image_urls = gallery.get('image_urls') or ([gallery['image_url']] if gallery.get('image_url') else [])
+    if image_urls:
+        return jsonify({
+            'status': 'done',
+            'result_ready': True,
+            'result_urls': image_urls,
+            'share_urls': [f"/r/{gallery_id}"]
+        })
+    if gallery.get('status') == 'failed':
+        return jsonify({'status': 'failed', 'error': 'AI 이미지 생성에 실패했습니다.'})
+    return jsonify({'status': 'pending', 'result_ready': False})
+
+@app.route('/metrics')
+def metrics():
+    """운영 지표 (프로바이더별 p50/p95 지연시간, 에러율, FAL 키별 사용률, 메모리 예산 예약량, 저장소 왕복 수/회로 차단기 상태)"""
+    return jsonify({
+        'providers': generation_router.snapshot(),
+        'fal_keys': fal_keys.get_pool().snapshot(),
+        'memory_budget': memory_budget.budget.snapshot(),
+        'chunked_uploads': chunked_upload.store.snapshot(),
+        'storage': {
+            'backend': storage_backend.name if storage_backend else None,
+            'round_trips': getattr(storage_backend, 'round_trips', None),
+            'breaker': storage_backend.breaker.snapshot() if hasattr(storage_backend, 'breaker') else None
+        }
+    })
+
+@app.route('/uploads/stage', methods=['POST'])
+@memory_budget.limit(lambda: memory_budget.upload_footprint(request.content_length))
+def stage_upload():
+    """사진을 한 번만 업로드하고 generate 요청에서 재사용할 토큰 발급"""
+    image_data_list, error = read_uploaded_images()
+    if error:
+        return jsonify({'error': error}), 400
+
     try:
-        # 첫 번째 이미지 파일 읽기 (필수)
-        uploaded_file = request.files.get('image')
+        token = staging.stage_images(image_data_list)
+    except Exception as e:
+        print(f"❌ Upload staging error: {e}")
+        return jsonify({'error': f'오류가 발생했습니다: {str(e)}'}), 500
 
-        if not uploaded_file or not uploaded_file.filename:
-            return jsonify({'error': '이미지를 업로드해주세요.'}), 400
+    return jsonify({
+        'success': True,
+        'upload_token': token,
+        'image_count': len(image_data_list),
+        'expires_in': staging.STAGING_TTL_SECONDS
+    })
+
+def upload_error_response(error):
+    """분할 업로드 오류 JSON 응답"""
+    body = {'error': str(error)}
+    if error.code:
+        body['code'] = error.code
+    return jsonify(body), error.status
+
+@app.route('/uploads/sessions', methods=['POST'])
+def create_upload_session():
+    """분할 업로드 세션 시작 - {"size": 바이트 수} (사진 1장당 1개)"""
+    payload = request.get_json(silent=True) or {}
+    try:
+        session = chunked_upload.store.create(payload.get('size'))
+    except chunked_upload.UploadError as e:
+        return upload_error_response(e)
+    return jsonify(session.status()), 201
+
+@app.route('/uploads/sessions/<session_id>', methods=['GET', 'PUT'])
+def upload_session(session_id):
+    """GET: 받지 못한 조각 offset 목록, PUT ?offset=K: 조각 1개 저장 (본문은 조각 bytes)"""
+    try:
+        if request.method == 'GET':
+            return jsonify(chunked_upload.store.get(session_id).status())
+
+        offset = request.args.get('offset', type=int)
+        if offset is None:
+            return jsonify({'error': 'offset 이 필요합니다.'}), 400
+        # Content-Length 가 없는 chunked 전송도 조각 크기 + 1 바이트까지만 읽어 메모리 사용을 묶음
+        chunk = request.stream.read(chunked_upload.store.chunk_size + 1)
+        if len(chunk) > chunked_upload.store.chunk_size:
+            return jsonify({'error': '조각 크기가 너무 큽니다.'}), 413
+        session = chunked_upload.store.write_chunk(session_id, offset, chunk)
+    except chunked_upload.UploadError as e:
+        return upload_error_response(e)
+    return jsonify({'received': len(session.received), 'chunk_count': session.chunk_count})
+
+@app.route('/uploads/complete', methods=['POST'])
+@memory_budget.limit(lambda: memory_budget.upload_footprint(
+    chunked_upload.store.total_size((request.get_json(silent=True) or {}).get('session_ids') or [])))
+def complete_upload():
+    """분할 업로드 완료 - {"session_ids": [사진1, 사진2(선택)]} 를 검증하고 generate 용 upload_token 발급"""
+    session_ids = (request.get_json(silent=True) or {}).get('session_ids')
+    if not isinstance(session_ids, list) or not 1 <= len(session_ids) <= 2 or \
+            not all(isinstance(session_id, str) for session_id in session_ids):
+        return jsonify({'error': '사진을 1~2장 업로드해주세요.'}), 400
+
+    try:
+        image_data_list = chunked_upload.store.complete(session_ids)
+    except chunked_upload.UploadError as e:
+        return upload_error_response(e)
 
-        uploaded_file.seek(0, 0)
-        image_data = uploaded_file.read()
+    for index, image_data in enumerate(image_data_list):
+        info, error = validation.inspect_image(image_data)
+        if error:
+            return jsonify({'error': f'두 번째 사진: {error}' if index else error}), 400
+        print(f"Image {index + 1} assembled: {info.size} bytes, {info.mime_type} {info.width}x{info.height}")
 
-        if not image_data or len(image_data) < 100:
-            return jsonify({'error': '이미지 데이터를 읽을 수 없습니다.'}), 400
+    try:
+        token = staging.stage_images(image_data_list)
+    except Exception as e:
+        print(f"❌ Upload staging error: {e}")
+        return jsonify({'error': f'오류가 발생했습니다: {str(e)}'}), 500
 
-        print(f"Image 1 size: {len(image_data)} bytes, filename: {uploaded_file.filename}")
+    return jsonify({
+        'success': True,
+        'upload_token': token,
+        'image_count': len(image_data_list),
+        'expires_in': staging.STAGING_TTL_SECONDS
+    })
 
-        # 두 번째 이미지 파일 읽기 (선택)
-        image_data2 = None
-        uploaded_file2 = request.files.get('image2')
-        if uploaded_file2 and uploaded_file2.filename:
-            uploaded_file2.seek(0, 0)
-            image_data2 = uploaded_file2.read()
-            if image_data2 and len(image_data2) >= 100:
-                print(f"Image 2 size: {len(image_data2)} bytes, filename: {uploaded_file2.filename}")
-            else:
-                image_data2 = None
+@app.route('/generate/batch', methods=['POST'])
+@memory_budget.limit(batch_footprint)
+def generate_batch():
+    """사진 1회 업로드로 여러 스타일/레이아웃 변형을 동시에 생성 (하나의 gallery 레코드에 저장)
+
+    variants: [{"style": "disney", "layout": "1x4", "frame_color": "#000000"}, ...] JSON 문자열
+    stream=1 이면 변형이 완료되는 순서대로 NDJSON 한 줄씩 전송
+    """
+    import json
+    from flask import Response, stream_with_context
+
+    try:
+        # 업로드 인코딩과 logo/QR 은 배치 전체에서 한 번만 준비
+        user_image_uris, error_response = get_request_image_uris()
+        if error_response:
+            return error_response
+
+        variants = parse_batch_variants()
+        if variants is None:
+            return jsonify({'error': 'variants 형식이 올바르지 않습니다.'}), 400
+        if not isinstance(variants, list) or not variants or not all(isinstance(v, dict) for v in variants):
+            return jsonify({'error': '생성할 옵션을 1개 이상 지정해주세요.'}), 400
+        if len(variants) > generation.BATCH_MAX_VARIANTS:
+            return jsonify({'error': f'한 번에 최대 {generation.BATCH_MAX_VARIANTS}개까지 생성할 수 있습니다.'}), 400
+
+        is_duo = len(user_image_uris) > 1
+        options = []
+        for variant in variants:
+            style, color_mode = generation.split_style_color_mode(variant.get('style', 'default'))
+            options.append({
+                'frame_color': variant.get('frame_color', 'black'),
+                'layout': variant.get('layout', '1x4'),
+                'style': style,
+                'color_mode': color_mode
+            })
+        print(f"=== STARTING BATCH AI-4-CUT GENERATION ({len(options)} variants, {'DUO' if is_duo else 'SOLO'}) ===")
+
+        image_urls = generation.build_input_image_urls(user_image_uris)
+
+        gallery_id = create_gallery_placeholder(options[0]['layout'], options[0]['style'], options[0]['color_mode'],
+                                                wants_public_feed())
+        share_url = f"/r/{gallery_id}" if gallery_id else None
+
+        def run_variant(option):
+            prompt = prompts.get_ai_4_cut_prompt(option['frame_color'], option['layout'], option['color_mode'], option['style'], is_duo)
+            result_data_uris, _ = generation_router.generate({
+                "prompt": prompt,
+                "image_urls": image_urls,
+                "num_images": 1
+            })
+            return result_data_uris
+
+        def iter_results():
+            all_images, variant_stats = [], []
+            for index, result_data_uris, error in generation.run_batch(options, run_variant):
+                item = dict(options[index], index=index, result_urls=result_data_uris or [])
+                if error or not result_data_uris:
+                    item['error'] = error or '결과 이미지를 다운로드할 수 없습니다.'
+                else:
+                    all_images.extend(result_data_uris)
+                    variant_stats.append(build_stats(item['layout'], item['style'], item['color_mode'], is_duo, len(result_data_uris)))
+                print(f"Batch variant {index} finished ({len(item['result_urls'])} images)")
+                yield item
+
+            # 모든 변형의 이미지와 통계를 gallery 완료 RPC 1회로 기록 (응답은 저장을 오래 기다리지 않음)
+            if all_images:
+                finish_gallery(gallery_id, all_images, stats=variant_stats)
+            print(f"✅ Batch generation completed ({len(all_images)} images)")
+
+        if request.form.get('stream') == '1':
+            def generate_stream():
+                yield json.dumps({'gallery_id': gallery_id, 'share_urls': [share_url] if share_url else [], 'variant_count': len(options)}) + '\n'
+                for item in iter_results():
+                    yield json.dumps({'variant': item}) + '\n'
+            return Response(stream_with_context(generate_stream()), mimetype='application/x-ndjson')
+
+        results = sorted(iter_results(), key=lambda item: item['index'])
+        if not any(item['result_urls'] for item in results):
+            return jsonify({'error': 'AI 이미지 생성에 실패했습니다.', 'variants': results}), 500
+
+        return jsonify({
+            'success': True,
+            'result_ready': True,
+            'variants': results,
+            'share_urls': [share_url] if share_url else []
+        })
+
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({'error': f'오류가 발생했습니다: {str(e)}'}), 500
+
+def generate_composite(user_image_uris, frame_color, layout, color_mode, style, is_duo, placeholder):
+    """합성 모드 - FAL 은 개별 인물 컷만 생성하고 스트립(프레임, 로고, 날짜, QR)은 로컬에서 조립"""
+    cut_count = compositor.cut_count(layout)
+    print(f"Generating {cut_count} portrait cuts (composite mode)...")
+    cut_data_uris, provider_name = generation_router.generate({
+        "prompt": prompts.get_portrait_cut_prompt(layout, color_mode, style, is_duo),
+        "image_urls": list(user_image_uris),
+        "num_images": cut_count,
+        "aspect_ratio": compositor.cut_aspect_ratio(layout)
+    })
+    if not cut_data_uris:
+        return jsonify({'error': 'AI 응답에서 이미지를 찾을 수 없습니다.'}), 500
+
+    strip_uri = compositor.to_data_uri(compositor.compose_strip(cut_data_uris, layout, frame_color))
+    print(f"✅ AI-4-cut composited locally ({len(cut_data_uris)} cuts via {provider_name})")
+
+    gallery_id = join_gallery_placeholder(placeholder)
+    share_url = f"/r/{gallery_id}" if gallery_id else None
+    stats = build_stats(layout, style, color_mode, is_duo, 1)
+
+    def save_composite():
+        if not gallery_id:
+            return save_stats_to_supabase(**stats)
+        cut_urls = upload_images_to_storage(cut_data_uris)
+        return update_gallery_with_images(gallery_id, [strip_uri], {'cut_urls': cut_urls, 'frame_color': frame_color}, stats)
+
+    finish_gallery(gallery_id, [strip_uri], save=save_composite)
+
+    return jsonify({
+        'success': True,
+        'result_ready': True,
+        'result_urls': [strip_uri],
+        'result_url': strip_uri,
+        'result_filename': 'ai_4_cut.png',
+        'share_urls': [share_url] if share_url else []
+    })
+
+def generate_fanout(arguments, fanout, layout, style, color_mode, is_duo, placeholder):
+    """fan-out 모드 - 이미지 1장짜리 작업 N개를 동시에 실행하고 가장 먼저 끝난 결과를 반환
+
+    남은 작업은 백그라운드에서 끝나는 대로 gallery 에 추가되고 (클라이언트는 /jobs/<id> 폴링),
+    FANOUT_DEADLINE_SECONDS 가 지나면 취소된다.
+    """
+    single_arguments = dict(arguments, num_images=1)
+    gallery_image_urls = []
+    gallery_id = None
+    first_completion = None
+    lock = threading.Lock()
+
+    def run_single(cancel_event):
+        result_data_uris, _ = generation_router.generate(single_arguments, cancel_event)
+        return result_data_uris
+
+    def on_late_result(result_data_uris):
+        with lock:  # 첫 결과 저장 (placeholder join 포함) 이 끝난 뒤 gallery_id 확인
+            if not (storage_backend and gallery_id):
+                return
+        image_urls = upload_images_to_storage(result_data_uris)
+        # 첫 결과 저장(백그라운드)이 끝난 뒤 이어 붙임
+        first_completion.result()
+        with lock:
+            gallery_image_urls.extend(image_urls)
+            storage_backend.update_gallery(gallery_id, {
+                'image_url': gallery_image_urls[0],
+                'image_urls': list(gallery_image_urls)
+            })
+        page_cache.invalidate_result_page(gallery_id)
+        print(f"✅ Fan-out late result added to gallery {gallery_id} ({len(gallery_image_urls)} images)")
+
+    print(f"Fan-out: {fanout} single-image jobs...")
+    # 첫 결과가 gallery 에 먼저 저장되도록 늦게 끝난 작업의 업데이트는 lock 으로 대기
+    with lock:
+        result_data_uris, pending_count = generation.run_fanout(run_single, fanout, on_late_result)
+        print(f"✅ Fan-out first result ready ({pending_count} jobs still running)")
+        gallery_id = join_gallery_placeholder(placeholder)
+        stats = build_stats(layout, style, color_mode, is_duo, len(result_data_uris))
+
+        # 늦게 끝난 작업은 first_completion 을 기다린 뒤에 gallery_image_urls 를 읽으므로 lock 불필요
+        # (이 함수가 lock 을 잡으면 lock 을 쥔 채 저장을 기다리는 요청 스레드와 교착)
+        def save_first():
+            gallery_image_urls[:0] = update_gallery_with_images(gallery_id, result_data_uris, stats=stats)
+            return gallery_image_urls
+
+        first_completion, _ = finish_gallery(gallery_id, result_data_uris, save=save_first)
+
+    return jsonify({
+        'success': True,
+        'result_ready': True,
+        'result_urls': result_data_uris,
+        'result_url': result_data_uris[0],
+        'result_filename': 'ai_4_cut.png',
+        'share_urls': [f"/r/{gallery_id}"] if gallery_id else [],
+        'pending_count': pending_count if gallery_id else 0,
+        'status_url': f"/jobs/{gallery_id}" if gallery_id else None
+    })
+
+@app.route('/r/<gallery_id>/reframe', methods=['POST'])
+@memory_budget.limit(generate_footprint)
+def reframe_result(gallery_id):
+    """합성 모드 결과의 프레임 색상만 바꿔 새 변형 생성 (저장된 컷 재사용, FAL 호출 없음)"""
+    payload = request.get_json(silent=True) or request.form
+    frame_color = payload.get('frame_color', 'black')
+
+    gallery = fetch_gallery(gallery_id)
+    if not gallery or not gallery.get('cut_urls'):
+        return jsonify({'error': '프레임 색상을 바꿀 수 없는 결과입니다.'}), 404
+
+    try:
+        cuts = [storage_backend.read_image(url) for url in gallery['cut_urls']]
+        strip_uri = compositor.to_data_uri(compositor.compose_strip(cuts, gallery.get('layout'), frame_color))
+        new_gallery_id = create_gallery_variant(gallery, [strip_uri], {'frame_color': frame_color})
+    except Exception as e:
+        print(f"❌ Reframe error: {e}")
+        return jsonify({'error': f'오류가 발생했습니다: {str(e)}'}), 500
+
+    print(f"✅ Gallery {gallery_id} reframed with {frame_color}: {new_gallery_id}")
+    return jsonify({
+        'success': True,
+        'result_ready': True,
+        'result_urls': [strip_uri],
+        'result_url': strip_uri,
+        'share_urls': [f"/r/{new_gallery_id}"] if new_gallery_id else []
+    })
+
+@app.route('/r/<gallery_id>/retone', methods=['POST'])
+@memory_budget.limit(generate_footprint)
+def retone_result(gallery_id):
+    """완성된 결과의 색감(bw, cool, warm)만 바꿔 새 변형 생성 (NumPy 후처리, FAL 호출 없음)"""
+    payload = request.get_json(silent=True) or request.form
+    tone = payload.get('tone') if isinstance(payload, dict) else None
+    # JSON 으로 리스트/객체가 오면 TONES 조회에서 TypeError 가 나므로 문자열인지 먼저 확인
+    if not isinstance(tone, str) or tone not in retone.TONES:
+        return jsonify({'error': f"tone 은 {', '.join(retone.TONES)} 중 하나여야 합니다."}), 400
+
+    gallery = fetch_gallery(gallery_id)
+    if not gallery or not (gallery.get('cut_urls') or gallery.get('image_urls') or gallery.get('image_url')):
+        return jsonify({'error': '색감을 바꿀 수 없는 결과입니다.'}), 404
+
+    try:
+        started = time.time()
+        extra_fields = {'color_mode': tone}
+        if gallery.get('cut_urls'):
+            # 합성 모드: 컷에만 톤을 적용하고 프레임/로고는 원래 색으로 다시 조립
+            cuts = [retone.apply_tone(compositor.load_image(storage_backend.read_image(url)), tone)
+                    for url in gallery['cut_urls']]
+            frame_color = gallery.get('frame_color') or 'black'
+            result_uris = [compositor.to_data_uri(compositor.compose_strip(cuts, gallery.get('layout'), frame_color))]
+            extra_fields['cut_urls'] = upload_images_to_storage([compositor.to_data_uri(cut) for cut in cuts])
+            extra_fields['frame_color'] = frame_color
+        else:
+            image_urls = gallery.get('image_urls') or [gallery['image_url']]
+            result_uris = [compositor.to_data_uri(retone.apply_tone(compositor.load_image(storage_backend.read_image(url)), tone))
+                           for url in image_urls]
+        new_gallery_id = create_gallery_variant(gallery, result_uris, extra_fields)
+    except Exception as e:
+        print(f"❌ Retone error: {e}")
+        return jsonify({'error': f'오류가 발생했습니다: {str(e)}'}), 500
+
+    print(f"✅ Gallery {gallery_id} retoned to {tone} in {time.time() - started:.2f}s: {new_gallery_id}")
+    return jsonify({
+        'success': True,
+        'result_ready': True,
+        'result_urls': result_uris,
+        'result_url': result_uris[0],
+        'share_urls': [f"/r/{new_gallery_id}"] if new_gallery_id else []
+    })
+
+@app.route('/generate', methods=['POST'])
+@memory_budget.limit(generate_footprint)
+def generate_image():
+    """동기 방식으로 AI4컷 생성 - Vercel serverless 환경에서 작동"""
+    try:
+        # 사용자 이미지 (스테이징 토큰 또는 직접 업로드) - 여기서는 검증만, 인코딩은 placeholder 생성과 동시에
+        images, error_response = get_request_images()
+        if error_response:
+            return error_response
 
         # 프레임 색상 가져오기
         frame_color = request.form.get('frame_color', 'black')
@@ -318,148 +896,80 @@ def generate_image():
         style = request.form.get('style', 'default')
 
         # 스타일에서 색상 모드 분리 (bw, cool, warm은 color_mode로 처리)
-        color_mode = 'color'
-        if style in ['bw', 'cool', 'warm']:
-            color_mode = style
-            style = 'default'
+        style, color_mode = generation.split_style_color_mode(style)
 
         print(f"Style: {style}, Color mode: {color_mode}")
 
-        is_duo = image_data2 is not None
+        is_duo = len(images) > 1
         color_mode_names = {'color': 'Color', 'bw': 'B&W', 'cool': 'Cool Tone', 'warm': 'Warm Tone'}
         style_names = {'default': 'Default', 'animation': 'Animation', 'realistic': 'Realistic', 'disney': 'Disney', 'ghibli': 'Ghibli'}
         print(f"=== STARTING {'DUO' if is_duo else 'SOLO'} AI-4-CUT GENERATION (frame: {frame_color}, layout: {layout}, color: {color_mode_names.get(color_mode, 'Color')}, style: {style_names.get(style, 'Default')}) ===")
 
-        # 미리 gallery placeholder 생성 (1개 - 모든 이미지를 하나의 레코드에 저장)
-        gallery_id = create_gallery_placeholder(layout, style, color_mode)
-        share_url = f"/r/{gallery_id}" if gallery_id else None
-        print(f"✅ Gallery placeholder created: {gallery_id}")
+        # gallery placeholder (1개 - 모든 이미지를 하나의 레코드에 저장) 는 백그라운드에서 생성
+        # 입력 인코딩, FAL 제출/생성과 동시에 진행하고 gallery_id 가 필요한 곳(결과 저장, 공유 URL)에서만 join
+        placeholder = start_gallery_placeholder(layout, style, color_mode, wants_public_feed())
+        user_image_uris = encode_request_images(images)
+
+        # 합성 모드: 인물 컷만 생성하고 스트립은 로컬에서 조립
+        if request.form.get('render_mode') == 'composite':
+            return generate_composite(user_image_uris, frame_color, layout, color_mode, style, is_duo, placeholder)
 
-        # 1. 첫 번째 사용자 이미지 base64 변환
-        mime_type = 'image/jpeg'
-        if image_data[:4] == b'\x89PNG':
-            mime_type = 'image/png'
-
-        user_image_base64 = base64.b64encode(image_data).decode('utf-8')
-        user_image_uri = f"data:{mime_type};base64,{user_image_base64}"
-        print(f"User image 1 prepared: {len(image_data)} bytes")
-
-        # 이미지 URL 리스트
-        image_urls = [user_image_uri]
-
-        # 2. 두 번째 사용자 이미지 (있는 경우)
-        if image_data2:
-            mime_type2 = 'image/jpeg'
-            if image_data2[:4] == b'\x89PNG':
-                mime_type2 = 'image/png'
-
-            user_image2_base64 = base64.b64encode(image_data2).decode('utf-8')
-            user_image2_uri = f"data:{mime_type2};base64,{user_image2_base64}"
-            image_urls.append(user_image2_uri)
-            print(f"User image 2 prepared: {len(image_data2)} bytes")
-
-        # 3. logo.png 읽기 및 base64 변환
-        logo_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'static_image', 'logo.png')
-        with open(logo_path, 'rb') as f:
-            logo_data = f.read()
-        logo_base64 = base64.b64encode(logo_data).decode('utf-8')
-        logo_uri = f"data:image/png;base64,{logo_base64}"
-        image_urls.append(logo_uri)
-        print(f"Logo image loaded: {len(logo_data)} bytes")
-
-        # 4. QR.png 읽기 및 base64 변환
-        qr_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'static_image', 'QR.png')
-        with open(qr_path, 'rb') as f:
-            qr_data = f.read()
-        qr_base64 = base64.b64encode(qr_data).decode('utf-8')
-        qr_uri = f"data:image/png;base64,{qr_base64}"
-        image_urls.append(qr_uri)
-        print(f"QR image loaded: {len(qr_data)} bytes")
+        # 사용자 이미지 + logo.png, QR.png (프로세스당 1회만 읽어서 캐시)
+        image_urls = generation.build_input_image_urls(user_image_uris)
 
         print(f"Calling FAL AI with {len(image_urls)} images and prompt...")
 
         # 프롬프트 생성 (색상 모드, 스타일, 듀오 모드 포함)
-        prompt = get_ai_4_cut_prompt(frame_color, layout, color_mode, style, is_duo)
+        prompt = prompts.get_ai_4_cut_prompt(frame_color, layout, color_mode, style, is_duo)
 
-        # FAL AI nano-banana-pro/edit 호출 (동기 방식)
-        handler = fal_client.submit(
-            "fal-ai/nano-banana-pro/edit",
-            arguments={
-                "prompt": prompt,
-                "image_urls": image_urls,
-                "num_images": 2
-            }
-        )
-
-        print(f"Waiting for FAL AI response...")
-        result = handler.get()
-        print(f"FAL AI response received: {result}")
-
-        # 결과 처리
-        if result:
-            result_data = result
-
-            # 이미지 URL 추출
-            result_urls = []
-
-            if 'images' in result_data and len(result_data['images']) > 0:
-                for img in result_data['images']:
-                    if isinstance(img, dict) and 'url' in img:
-                        result_urls.append(img['url'])
-                    elif isinstance(img, str):
-                        result_urls.append(img)
-            elif 'image' in result_data:
-                if isinstance(result_data['image'], dict) and 'url' in result_data['image']:
-                    result_urls.append(result_data['image']['url'])
-                elif isinstance(result_data['image'], str):
-                    result_urls.append(result_data['image'])
-            elif 'url' in result_data:
-                result_urls.append(result_data['url'])
-
-            if result_urls:
-                print(f"AI-4-cut generated: {len(result_urls)} images")
-
-                # 모든 이미지를 base64로 변환하여 직접 반환
-                result_data_uris = []
-                for i, url in enumerate(result_urls):
-                    response = requests.get(url)
-                    if response.status_code == 200:
-                        result_base64 = base64.b64encode(response.content).decode('utf-8')
-                        data_uri_result = f"data:image/png;base64,{result_base64}"
-                        result_data_uris.append(data_uri_result)
-                        print(f"Image {i+1} downloaded successfully")
-                    else:
-                        print(f"Failed to download image {i+1}: {response.status_code}")
-
-                if result_data_uris:
-                    print(f"✅ AI-4-cut generation completed successfully ({len(result_data_uris)} images)")
-
-                    # Supabase에 이미지 업데이트
-                    try:
-                        # 통계는 요청당 1회만 기록
-                        save_stats_to_supabase(layout, style, color_mode, is_duo, len(result_data_uris))
-
-                        # 미리 생성한 gallery에 모든 이미지 업데이트
-                        if gallery_id:
-                            update_gallery_with_images(gallery_id, result_data_uris)
-                    except Exception as e:
-                        print(f"⚠️ Supabase update failed (non-blocking): {e}")
-
-                    # 결과를 직접 반환 (share_url 포함)
-                    return jsonify({
-                        'success': True,
-                        'result_ready': True,
-                        'result_urls': result_data_uris,
-                        'result_url': result_data_uris[0],
-                        'result_filename': 'ai_4_cut.png',
-                        'share_urls': [share_url] if share_url else []
-                    })
-                else:
-                    return jsonify({'error': '결과 이미지를 다운로드할 수 없습니다.'}), 500
-            else:
-                return jsonify({'error': 'AI 응답에서 이미지를 찾을 수 없습니다.'}), 500
-        else:
-            return jsonify({'error': 'AI 서버에서 유효하지 않은 응답을 받았습니다.'}), 500
+        arguments = {
+            "prompt": prompt,
+            "image_urls": image_urls,
+            "num_images": 2
+        }
+
+        # webhook 모드: 결과를 기다리지 않고 FAL 완료 콜백(/fal/webhook)에서 gallery 업데이트
+        # (콜백이 갱신할 레코드가 먼저 있어야 하므로 join - 저장소가 느리거나 실패하면 동기 방식으로 진행)
+        gallery_id = join_gallery_placeholder(placeholder) if fal_webhook.is_enabled() else None
+        if gallery_id:
+            share_url = f"/r/{gallery_id}"
+            webhook_url = fal_webhook.build_webhook_url(gallery_id, is_duo)
+            generation.submit_with_webhook(arguments, webhook_url, fal_key=fal_keys.get_pool().pick_key())
+            return jsonify({
+                'success': True,
+                'result_ready': False,
+                'job_id': gallery_id,
+                'status_url': f"/jobs/{gallery_id}",
+                'share_urls': [share_url]
+            })
+
+        # fan-out 모드: 이미지 1장짜리 작업 N개를 동시에 실행해 가장 먼저 끝난 결과를 바로 반환
+        if generation.GENERATION_FANOUT > 1:
+            return generate_fanout(arguments, generation.GENERATION_FANOUT, layout, style, color_mode, is_duo, placeholder)
+
+        # 가장 빠른 정상 프로바이더로 생성 (실패 시 다음 프로바이더로 자동 전환, 동기 방식)
+        print("Waiting for generation response...")
+        result_data_uris, provider_name = generation_router.generate(arguments)
+        print(f"✅ AI-4-cut generation completed successfully via {provider_name} ({len(result_data_uris)} images)")
+
+        # 생성 중에 끝난 placeholder 와 합류
+        gallery_id = join_gallery_placeholder(placeholder)
+        share_url = f"/r/{gallery_id}" if gallery_id else None
+
+        # 미리 생성한 gallery에 모든 이미지 업데이트 (통계는 요청당 1회, 같은 RPC 로 기록)
+        # 저장소가 느리면 결과를 먼저 반환하고 저장은 백그라운드에서 마무리
+        stats = build_stats(layout, style, color_mode, is_duo, len(result_data_uris))
+        finish_gallery(gallery_id, result_data_uris, stats=stats)
+
+        # 결과를 직접 반환 (share_url 포함)
+        return jsonify({
+            'success': True,
+            'result_ready': True,
+            'result_urls': result_data_uris,
+            'result_url': result_data_uris[0],
+            'result_filename': 'ai_4_cut.png',
+            'share_urls': [share_url] if share_url else []
+        })
 
     except Exception as e:
         print(f"Error: {str(e)}")
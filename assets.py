@@ -0,0 +1,124 @@
+"""스타일 미리보기/샘플 갤러리 이미지의 반응형 압축본 (WebP/AVIF) 빌드 및 manifest 조회
+
+빌드: python assets.py
+  static/style, static/pics 의 PNG 를 폭별로 리사이즈해 static/dist 에
+  콘텐츠 해시 파일명(<이름>-<폭>.<해시>.webp)으로 저장하고 manifest.json 을 생성한다.
+템플릿에서는 asset_srcset(), asset_url() 로 manifest 를 참조한다 (manifest 가 없으면 원본 PNG 사용).
+"""
+import functools
+import hashlib
+import io
+import json
+import os
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+STATIC_DIR = os.path.join(BASE_DIR, 'static')
+DIST_DIR = os.path.join(STATIC_DIR, 'dist')
+MANIFEST_PATH = os.path.join(DIST_DIR, 'manifest.json')
+
+# 폴더별 생성할 폭 (px) - 스타일 버튼은 그리드 1/4 폭, 샘플 스트립은 300px 높이 + 모달 확대용
+ASSET_GROUPS = {
+    'style': [160, 320, 592],
+    'pics': [200, 400, 592],
+}
+
+# 출력 포맷 (mime, Pillow 포맷, 확장자, 저장 옵션)
+OUTPUT_FORMATS = [
+    ('image/avif', 'AVIF', 'avif', {'quality': 55, 'speed': 6}),
+    ('image/webp', 'WEBP', 'webp', {'quality': 80, 'method': 6}),
+]
+
+
+@functools.lru_cache(maxsize=1)
+def load_manifest():
+    """빌드된 manifest 읽기 (없으면 빈 dict)"""
+    try:
+        with open(MANIFEST_PATH, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def srcset(path, mime_type):
+    """원본 경로(예: 'style/default.png')의 해당 포맷 srcset 문자열 (없으면 빈 문자열)"""
+    entry = load_manifest().get(path)
+    if not entry:
+        return ''
+    return ', '.join(f"/static/{source['file']} {source['width']}w" for source in entry['sources'].get(mime_type, []))
+
+
+def url(path):
+    """img src 용 URL - 가장 큰 WebP 변형, manifest 가 없으면 원본"""
+    entry = load_manifest().get(path)
+    if entry and entry['sources'].get('image/webp'):
+        return f"/static/{entry['sources']['image/webp'][-1]['file']}"
+    return f"/static/{path}"
+
+
+def size(path):
+    """원본 이미지 크기 (width, height) - manifest 가 없으면 None"""
+    entry = load_manifest().get(path)
+    return (entry['width'], entry['height']) if entry else None
+
+
+def build_assets():
+    """static/style, static/pics 의 반응형 압축본과 manifest 생성"""
+    from PIL import Image, features
+
+    os.makedirs(DIST_DIR, exist_ok=True)
+    manifest = {}
+    written = set()
+    total_before = total_after = 0
+
+    for group, widths in ASSET_GROUPS.items():
+        group_dir = os.path.join(STATIC_DIR, group)
+        for name in sorted(os.listdir(group_dir)):
+            if not name.lower().endswith('.png'):
+                continue
+            src_path = os.path.join(group_dir, name)
+            total_before += os.path.getsize(src_path)
+            stem = os.path.splitext(name)[0].replace(' ', '_').replace('(', '').replace(')', '')
+
+            with Image.open(src_path) as image:
+                image.load()
+                entry = {'width': image.width, 'height': image.height, 'sources': {}}
+                for mime_type, fmt, ext, options in OUTPUT_FORMATS:
+                    if fmt == 'AVIF' and not features.check('avif'):
+                        print("⚠️ Pillow AVIF support not available, skipping AVIF")
+                        continue
+                    sources = []
+                    for width in widths:
+                        width = min(width, image.width)
+                        height = round(image.height * width / image.width)
+                        resized = image if width == image.width else image.resize((width, height), Image.LANCZOS)
+                        buffer = io.BytesIO()
+                        resized.save(buffer, format=fmt, **options)
+                        data = buffer.getvalue()
+                        digest = hashlib.sha256(data).hexdigest()[:10]
+                        filename = f"{group}/{stem}-{width}.{digest}.{ext}"
+                        out_path = os.path.join(DIST_DIR, filename)
+                        os.makedirs(os.path.dirname(out_path), exist_ok=True)
+                        with open(out_path, 'wb') as f:
+                            f.write(data)
+                        written.add(os.path.normpath(out_path))
+                        total_after += len(data)
+                        sources.append({'file': f"dist/{filename}", 'width': width})
+                    entry['sources'][mime_type] = sources
+            manifest[f"{group}/{name}"] = entry
+            print(f"✅ {group}/{name}: {len(entry['sources'])} formats x {len(widths)} widths")
+
+    # 이전 빌드의 해시 파일 정리
+    for root, _, files in os.walk(DIST_DIR):
+        for name in files:
+            path = os.path.normpath(os.path.join(root, name))
+            if path != os.path.normpath(MANIFEST_PATH) and path not in written:
+                os.remove(path)
+
+    with open(MANIFEST_PATH, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2, sort_keys=True)
+    load_manifest.cache_clear()
+    print(f"Assets built: {total_before / 1024 / 1024:.1f}MB originals -> {total_after / 1024 / 1024:.1f}MB variants (all formats/widths)")
+
+
+if __name__ == '__main__':
+    build_assets()
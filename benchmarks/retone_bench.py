@@ -0,0 +1,65 @@
+"""retone.py 처리량 벤치마크 - 2120x3187 전체 프레임 기준
+
+Usage:
+    python benchmarks/retone_bench.py [--size 2120x3187] [--repeat 10]
+
+톤 적용 자체와 재톤 엔드포인트의 실제 경로 (PNG 디코드 -> 톤 -> PNG 인코드) 를 나눠서 측정한다.
+"""
+import argparse
+import io
+import os
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import compositor  # noqa: E402
+import retone  # noqa: E402
+
+
+def best_ms(func, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def make_frame(width, height):
+    """사진과 비슷하게 압축되도록 그라디언트 + 노이즈 이미지 생성"""
+    rng = np.random.default_rng(0)
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    base = np.stack([x + 0 * y, y + 0 * x, (x + y) / 2], axis=2)
+    return np.clip(base + rng.normal(0, 8, base.shape), 0, 255).astype(np.uint8)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='retone throughput benchmark')
+    parser.add_argument('--size', default='2120x3187')
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+    width, height = (int(value) for value in args.size.split('x'))
+
+    pixels = make_frame(width, height)
+    megapixels = width * height / 1e6
+    png_bytes = compositor.to_png_bytes(Image.fromarray(pixels))
+    print(f"frame {width}x{height} ({megapixels:.1f} MP), best of {args.repeat}\n")
+
+    decode_ms = best_ms(lambda: Image.open(io.BytesIO(png_bytes)).convert('RGB').load(), args.repeat)
+    print(f"{'png decode':<14} {decode_ms:8.1f} ms")
+
+    for tone in retone.TONES:
+        tone_ms = best_ms(lambda: retone.apply_tone_array(pixels, tone), args.repeat)
+        toned = Image.fromarray(retone.apply_tone_array(pixels, tone))
+        encode_ms = best_ms(lambda: compositor.to_png_bytes(toned), max(1, args.repeat // 3))
+        print(f"{'tone ' + tone:<14} {tone_ms:8.1f} ms  ({megapixels / tone_ms * 1000:6.0f} MP/s)"
+              f"  + png encode {encode_ms:6.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
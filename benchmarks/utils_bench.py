@@ -0,0 +1,153 @@
+"""Microbenchmark for the Part/image helpers in blob_utils.py (used by utils.py).
+
+Usage:
+  python benchmarks/utils_bench.py [--size 2120x3187] [--files 4] [--repeat 5]
+
+Compares the previous behaviour (mimetypes + full read per call, PNG at the
+default compress level, eager PIL decode, serial reads) with the cached, fast
+and lazy paths. Only Pillow and NumPy are required; Parts are built with
+google-genai when it is installed and as plain tuples otherwise.
+"""
+
+import argparse
+import io
+import mimetypes
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import blob_utils  # pylint: disable=g-import-not-at-top
+
+try:
+  from google.genai import types  # pylint: disable=g-import-not-at-top
+
+  def _build_part(data, mime_type):
+    return types.Part.from_bytes(data=data, mime_type=mime_type)
+except ImportError:
+
+  def _build_part(data, mime_type):
+    return (mime_type, data)
+
+
+def _timeit(func, repeat):
+  """Returns the best wall time of func() in milliseconds."""
+  best = float("inf")
+  for _ in range(repeat):
+    start = time.perf_counter()
+    func()
+    best = min(best, time.perf_counter() - start)
+  return best * 1000
+
+
+def _make_image(width, height):
+  """A noisy gradient, closer to a photo than a flat colour for encoders."""
+  rng = np.random.default_rng(0)
+  x = np.linspace(0, 255, width, dtype=np.float32)
+  y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+  base = np.stack([x + 0 * y, y + 0 * x, (x + y) / 2], axis=2)
+  noise = rng.normal(0, 12, base.shape)
+  return Image.fromarray(np.clip(base + noise, 0, 255).astype(np.uint8), "RGB")
+
+
+def _old_part_from_file(file):
+  mime_type = mimetypes.guess_type(file)[0]
+  with open(file, "rb") as f:
+    return _build_part(f.read(), mime_type)
+
+
+def _report(name, baseline_ms, new_ms):
+  print(f"{name:<34} {baseline_ms:9.2f} ms -> {new_ms:9.2f} ms"
+        f"  ({baseline_ms / max(new_ms, 1e-6):5.1f}x)")
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument("--size", default="2120x3187")
+  parser.add_argument("--files", type=int, default=4)
+  parser.add_argument("--repeat", type=int, default=5)
+  args = parser.parse_args()
+  width, height = (int(v) for v in args.size.split("x"))
+
+  image = _make_image(width, height)
+  parts = blob_utils.PartCache(_build_part)
+  png_bytes = blob_utils.get_bytes_from_image(image, "PNG", compress_level=6)
+
+  with tempfile.TemporaryDirectory() as tmp:
+    files = []
+    for i in range(args.files):
+      path = os.path.join(tmp, f"input_{i}.png")
+      with open(path, "wb") as f:
+        f.write(png_bytes + bytes([i]))  # distinct content per file
+      files.append(path)
+
+    print(f"image {width}x{height}, {len(png_bytes) / 1e6:.1f} MB PNG,"
+          f" {args.files} files, best of {args.repeat}\n")
+
+    # Part construction: uncached read vs content-addressed cache.
+    parts.clear()
+    parts.from_file(files[0])
+    _report(
+        "get_part_from_file (warm cache)",
+        _timeit(lambda: _old_part_from_file(files[0]), args.repeat),
+        _timeit(lambda: parts.from_file(files[0]), args.repeat),
+    )
+
+    # MIME detection.
+    _report(
+        "mime: guess_type vs sniff",
+        _timeit(lambda: [mimetypes.guess_type(f) for f in files * 1000],
+                args.repeat),
+        _timeit(lambda: [blob_utils.sniff_mime_type(png_bytes[:16], f)
+                         for f in files * 1000], args.repeat),
+    )
+
+    # Multi-file message: serial vs parallel reads (cold cache each time).
+    def serial_cold():
+      parts.clear()
+      return [parts.from_file(f) for f in files]
+
+    def parallel_cold():
+      parts.clear()
+      return blob_utils.read_parallel(parts.from_file, files)
+
+    _report(
+        f"{args.files} files, cold (serial vs parallel)",
+        _timeit(serial_cold, args.repeat),
+        _timeit(parallel_cold, args.repeat),
+    )
+
+    # Encoders.
+    png_default = lambda: image.save(io.BytesIO(), format="PNG")
+    _report("encode PNG (level 6 -> 1)",
+            _timeit(png_default, args.repeat),
+            _timeit(lambda: blob_utils.get_bytes_from_image(image, "PNG"),
+                    args.repeat))
+    _report("encode PNG (level 6 -> WEBP)",
+            _timeit(png_default, args.repeat),
+            _timeit(lambda: blob_utils.get_bytes_from_image(image, "WEBP"),
+                    args.repeat))
+    _report("encode PNG (level 6 -> JPEG)",
+            _timeit(png_default, args.repeat),
+            _timeit(lambda: blob_utils.get_bytes_from_image(image, "JPEG"),
+                    args.repeat))
+
+    # Decoding: eager PIL decode vs bytes-only access.
+    def eager():
+      decoded = Image.open(io.BytesIO(png_bytes))
+      decoded.load()
+      return decoded
+
+    _report("blob -> image (eager vs lazy)",
+            _timeit(eager, args.repeat),
+            _timeit(lambda: blob_utils.LazyImage(png_bytes, "image/png").to_file(tmp),
+                    args.repeat))
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,241 @@
+"""Dependency-free helpers behind utils.py.
+
+MIME sniffing, fast image encoding, the content-addressed Part cache,
+parallel file reads and lazy image decoding. They only need Pillow, so they
+can be used and tested without gradio or google-genai installed.
+"""
+
+import collections
+import concurrent.futures
+import hashlib
+import io
+import mimetypes
+import os
+import tempfile
+import threading
+import typing
+
+from PIL import Image
+
+# Magic-byte signatures checked by sniff_mime_type(), as (offset, bytes, type).
+_MIME_SIGNATURES = (
+    (0, b"\x89PNG\r\n\x1a\n", "image/png"),
+    (0, b"\xff\xd8\xff", "image/jpeg"),
+    (0, b"GIF87a", "image/gif"),
+    (0, b"GIF89a", "image/gif"),
+    (8, b"WEBP", "image/webp"),
+    (4, b"ftypavif", "image/avif"),
+    (4, b"ftypheic", "image/heic"),
+    (4, b"ftypmif1", "image/heif"),
+    (0, b"BM", "image/bmp"),
+    (0, b"%PDF-", "application/pdf"),
+    (0, b"ID3", "audio/mpeg"),
+    (4, b"ftypisom", "video/mp4"),
+    (4, b"ftypmp42", "video/mp4"),
+)
+
+# Encoder settings used by get_bytes_from_image(), keyed by PIL format name.
+# PNG compress_level 1 is several times faster than PIL's default of 6 for
+# photos, at the cost of slightly larger output.
+IMAGE_ENCODE_OPTIONS = {
+    "PNG": {"compress_level": 1},
+    "WEBP": {"quality": 90, "method": 0},
+    "JPEG": {"quality": 90, "optimize": False},
+}
+
+# Maximum number of Parts kept by a PartCache.
+PART_CACHE_MAX_ITEMS = 128
+
+# Maximum number of threads used by read_parallel().
+MAX_READ_WORKERS = 8
+
+# Where LazyImage.to_file() writes by default, and how many files it keeps
+# there. Older files are removed once the directory grows past the limit.
+LAZY_BLOB_DIR = os.path.join(tempfile.gettempdir(), "genai-blobs")
+LAZY_BLOB_MAX_FILES = 256
+
+
+def sniff_mime_type(data: bytes, filename: typing.Optional[str] = None) -> str:
+  """Detects the MIME type from the leading bytes of the data.
+
+  Args:
+    data: The file contents, or at least their first 16 bytes.
+    filename: Optional file name used when the signature is unknown.
+
+  Returns:
+    The MIME type, falling back to the file extension and then to
+    "application/octet-stream".
+  """
+  for offset, signature, mime_type in _MIME_SIGNATURES:
+    if data[offset:offset + len(signature)] == signature:
+      return mime_type
+  if filename:
+    guessed_type, _ = mimetypes.guess_type(filename)
+    if guessed_type:
+      return guessed_type
+  return "application/octet-stream"
+
+
+class PartCache:
+  """LRU of built Parts keyed by (SHA-256 of the content, MIME type).
+
+  build(data, mime_type) makes a Part on a miss. A file whose path, mtime and
+  size are unchanged since the last from_file() call is not read again.
+  """
+
+  def __init__(self, build, max_items: int = PART_CACHE_MAX_ITEMS):
+    self._build = build
+    self.max_items = max_items
+    self._parts = collections.OrderedDict()  # (digest, mime_type) -> Part
+    self._path_keys = {}  # (path, mtime_ns, size) -> (digest, mime_type)
+    self._lock = threading.Lock()
+
+  def __len__(self):
+    with self._lock:
+      return len(self._parts)
+
+  def _lookup(self, key):
+    with self._lock:
+      part = self._parts.get(key)
+      if part is not None:
+        self._parts.move_to_end(key)
+      return part
+
+  def _store(self, key, part):
+    with self._lock:
+      self._parts[key] = part
+      self._parts.move_to_end(key)
+      while len(self._parts) > self.max_items:
+        self._parts.popitem(last=False)
+    return part
+
+  def _get_or_build(self, data, mime_type):
+    key = (hashlib.sha256(data).hexdigest(), mime_type)
+    part = self._lookup(key)
+    if part is None:
+      part = self._store(key, self._build(data, mime_type))
+    return key, part
+
+  def from_bytes(self, data: bytes, mime_type: typing.Optional[str] = None):
+    """Returns the Part for data, sniffing the MIME type if not given."""
+    return self._get_or_build(data, mime_type or sniff_mime_type(data))[1]
+
+  def from_file(self, file):
+    """Returns the Part for a file's contents."""
+    stat = os.stat(file)
+    path_key = (os.fspath(file), stat.st_mtime_ns, stat.st_size)
+    with self._lock:
+      key = self._path_keys.get(path_key)
+    part = self._lookup(key) if key else None
+    if part is not None:
+      return part
+
+    with open(file, "rb") as f:
+      data = f.read()
+    key, part = self._get_or_build(data, sniff_mime_type(data, file))
+    with self._lock:
+      if len(self._path_keys) >= self.max_items * 4:
+        self._path_keys.clear()
+      self._path_keys[path_key] = key
+    return part
+
+  def clear(self):
+    """Drops all cached Parts."""
+    with self._lock:
+      self._parts.clear()
+      self._path_keys.clear()
+
+
+def read_parallel(read, files, max_workers: int = MAX_READ_WORKERS) -> list:
+  """Returns [read(file) for file in files], on a thread pool for 2+ files."""
+  files = list(files)
+  if len(files) <= 1:
+    return [read(file) for file in files]
+  with concurrent.futures.ThreadPoolExecutor(
+      max_workers=min(max_workers, len(files))
+  ) as executor:
+    return list(executor.map(read, files))
+
+
+def get_bytes_from_image(
+    image: Image.Image, mime_type: str = "PNG", **encode_options
+) -> bytes:
+  """Converts a PIL Image object to bytes in the specified format.
+
+  Args:
+      image: The PIL Image object.
+      mime_type: The image format to save as (e.g., 'PNG', 'JPEG', 'WEBP',
+        or a MIME type such as 'image/png'). Defaults to 'PNG'.
+      **encode_options: Encoder options overriding IMAGE_ENCODE_OPTIONS
+        (e.g. compress_level=6 or quality=80).
+
+  Returns:
+      A bytes object representing the image in the specified format.
+  """
+  image_format = mime_type.split("/")[-1].upper()
+  if image_format == "JPG":
+    image_format = "JPEG"
+  options = dict(IMAGE_ENCODE_OPTIONS.get(image_format, {}), **encode_options)
+  if image_format == "JPEG" and image.mode not in ("RGB", "L"):
+    image = image.convert("RGB")
+  img_byte_arr = io.BytesIO()
+  image.save(img_byte_arr, format=image_format, **options)
+  img_byte_arr = img_byte_arr.getvalue()
+  return img_byte_arr
+
+
+def _prune_directory(directory: str, max_files: int, keep: str):
+  """Removes the oldest files other than keep so at most max_files remain."""
+  entries = []
+  for entry in os.scandir(directory):
+    try:
+      if entry.is_file() and entry.path != keep:
+        entries.append((entry.stat().st_mtime_ns, entry.path))
+    except FileNotFoundError:
+      continue
+  entries.sort()
+  for _, path in entries[:max(0, len(entries) + 1 - max_files)]:
+    try:
+      os.remove(path)
+    except FileNotFoundError:
+      pass
+
+
+class LazyImage:
+  """Image bytes that are only decoded with PIL when .image is accessed."""
+
+  def __init__(self, data: bytes, mime_type: typing.Optional[str] = None):
+    self.data = data
+    self.mime_type = mime_type or sniff_mime_type(data)
+    self._image = None
+
+  @property
+  def image(self) -> Image.Image:
+    if self._image is None:
+      self._image = Image.open(io.BytesIO(self.data))
+      self._image.load()
+    return self._image
+
+  def to_file(
+      self,
+      directory: typing.Optional[str] = None,
+      max_files: int = LAZY_BLOB_MAX_FILES,
+  ) -> str:
+    """Writes the bytes to a content-addressed file and returns its path.
+
+    The directory keeps at most max_files files; the oldest are removed
+    after each new write.
+    """
+    directory = directory or LAZY_BLOB_DIR
+    os.makedirs(directory, exist_ok=True)
+    extension = mimetypes.guess_extension(self.mime_type) or ".bin"
+    path = os.path.join(
+        directory, hashlib.sha256(self.data).hexdigest() + extension
+    )
+    if os.path.exists(path):
+      os.utime(path)
+      return path
+    with open(path, "wb") as f:
+      f.write(self.data)
+    _prune_directory(directory, max_files, keep=path)
+    return path
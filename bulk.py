@@ -0,0 +1,242 @@
+"""행사용 대량 오프라인 생성 - 사진 폴더나 manifest 를 받아 AI4컷 스트립을 한꺼번에 만든다
+
+  python bulk.py photos/ --out strips/ --style ghibli --concurrency 4
+  python bulk.py event.jsonl --out strips/          # 한 줄에 {"image": ..., "image2": ..., "style": ...}
+  python bulk.py photos/ --out strips/ --local      # 로컬 FAL 대역으로 전체 흐름 확인 (네트워크/키 불필요)
+
+- 프롬프트는 웹과 같은 prompts.get_ai_4_cut_prompt(), 생성은 FAL 키 풀(FalProvider) 을 그대로 사용
+- FAL 동시 제출 수는 --concurrency 로 제한
+- 결과는 끝나는 대로 <out>/<id>-<n>.png 로 바로 쓰고 <out>/journal.jsonl 에 한 줄씩 기록
+  (중단 후 같은 명령을 다시 실행하면 완료된 항목은 건너뜀, 실패 항목은 다시 시도)
+- 마지막에 처리량 리포트를 출력하고 <out>/report.json 으로 저장
+"""
+import argparse
+import base64
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from dotenv import load_dotenv
+
+# .env 로드 후 공용 모듈 import (환경변수를 import 시점에 읽음)
+load_dotenv()
+
+import fal_keys
+import fal_local
+import generation
+import prompts
+import providers
+import validation
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.webp')
+JOURNAL_NAME = 'journal.jsonl'
+REPORT_NAME = 'report.json'
+
+
+def load_items(source, defaults):
+    """입력 폴더(사진 1장 = 항목 1개) 또는 manifest(.jsonl) 를 항목 목록으로 변환"""
+    items = []
+    if os.path.isdir(source):
+        for root, _, filenames in os.walk(source):
+            for filename in filenames:
+                if filename.lower().endswith(IMAGE_EXTENSIONS):
+                    path = os.path.join(root, filename)
+                    item_id = os.path.splitext(os.path.relpath(path, source))[0].replace(os.sep, '__')
+                    items.append(dict(defaults, id=item_id, images=[path]))
+        items.sort(key=lambda item: item['id'])
+    else:
+        base_dir = os.path.dirname(os.path.abspath(source))
+        with open(source, encoding='utf-8') as f:
+            for line_number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                images = [os.path.join(base_dir, entry[key]) for key in ('image', 'image2') if entry.get(key)]
+                if not images:
+                    raise SystemExit(f"{source}:{line_number}: image 가 없습니다.")
+                item_id = str(entry.get('id') or os.path.splitext(os.path.basename(images[0]))[0])
+                options = {key: entry[key] for key in defaults if entry.get(key)}
+                items.append(dict(defaults, **options, id=item_id, images=images))
+
+    seen = set()
+    for item in items:
+        if item['id'] in seen:
+            raise SystemExit(f"항목 ID 가 중복됩니다: {item['id']}")
+        seen.add(item['id'])
+    return items
+
+
+def load_journal(path):
+    """완료 기록 {id: entry} (마지막 기록 우선, 중단으로 잘린 줄은 무시)"""
+    entries = {}
+    if not os.path.exists(path):
+        return entries
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            entries[entry['id']] = entry
+    return entries
+
+
+def is_finished(entry, out_dir):
+    return bool(entry and entry.get('status') == 'done' and
+                all(os.path.exists(os.path.join(out_dir, name)) for name in entry.get('outputs', [])))
+
+
+def generate_item(item, provider):
+    """항목 1개 생성 - 입력 검증/인코딩 후 FAL 호출, 결과 data URI 목록 반환"""
+    user_image_uris = []
+    for path in item['images']:
+        with open(path, 'rb') as f:
+            data = f.read()
+        _, error = validation.inspect_image(data)
+        if error:
+            raise ValueError(f"{os.path.basename(path)}: {error}")
+        user_image_uris.append(generation.encode_image_data_uri(data))
+
+    style, color_mode = generation.split_style_color_mode(item['style'])
+    is_duo = len(user_image_uris) > 1
+    arguments = {
+        'prompt': prompts.get_ai_4_cut_prompt(item['frame_color'], item['layout'], color_mode, style, is_duo),
+        'image_urls': generation.build_input_image_urls(user_image_uris),
+        'num_images': item['num_images']
+    }
+    result_data_uris = provider.generate(arguments)
+    if not result_data_uris:
+        raise RuntimeError('AI 응답에서 이미지를 찾을 수 없습니다.')
+    return result_data_uris
+
+
+def write_atomic(path, data):
+    """임시 파일에 쓴 뒤 rename (중단돼도 반쯤 쓰인 결과 파일이 남지 않음)"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def write_results(item, result_data_uris, out_dir):
+    """결과 이미지를 파일로 저장하고 (파일명 목록, 바이트 수) 반환"""
+    outputs, total_bytes = [], 0
+    for index, data_uri in enumerate(result_data_uris, 1):
+        data = base64.b64decode(data_uri.split(',', 1)[1])
+        name = f"{item['id']}-{index}.png"
+        write_atomic(os.path.join(out_dir, name), data)
+        outputs.append(name)
+        total_bytes += len(data)
+    return outputs, total_bytes
+
+
+def _percentile(values, percent):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(round(percent / 100 * (len(ordered) - 1))))], 2)
+
+
+def build_report(total, skipped, done, failed, latencies, images, written_bytes, elapsed):
+    return {
+        'items': total,
+        'skipped': skipped,
+        'done': done,
+        'failed': failed,
+        'images': images,
+        'bytes_written': written_bytes,
+        'elapsed_seconds': round(elapsed, 2),
+        'items_per_minute': round(done / elapsed * 60, 2) if elapsed > 0 else None,
+        'item_seconds_p50': _percentile(latencies, 50),
+        'item_seconds_p95': _percentile(latencies, 95)
+    }
+
+
+def run(items, provider, out_dir, concurrency):
+    """항목을 concurrency 개씩 동시에 생성하고 끝나는 대로 파일/저널에 기록 - 리포트 dict 반환"""
+    os.makedirs(out_dir, exist_ok=True)
+    journal_path = os.path.join(out_dir, JOURNAL_NAME)
+    journal = load_journal(journal_path)
+    pending = [item for item in items if not is_finished(journal.get(item['id']), out_dir)]
+    skipped = len(items) - len(pending)
+    print(f"=== BULK GENERATION: {len(pending)} items ({skipped} already done), concurrency {concurrency} ===")
+
+    done, failed, images, written_bytes, latencies = 0, 0, 0, 0, []
+    started = time.perf_counter()
+
+    def timed(item):
+        item_started = time.perf_counter()
+        return generate_item(item, provider), time.perf_counter() - item_started
+
+    executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='bulk')
+    try:
+        with open(journal_path, 'a', encoding='utf-8') as journal_file:
+            futures = {executor.submit(timed, item): item for item in pending}
+            for future in as_completed(futures):
+                item = futures[future]
+                try:
+                    result_data_uris, seconds = future.result()
+                    outputs, size = write_results(item, result_data_uris, out_dir)
+                    entry = {'id': item['id'], 'status': 'done', 'outputs': outputs, 'seconds': round(seconds, 2)}
+                    done, images, written_bytes = done + 1, images + len(outputs), written_bytes + size
+                    latencies.append(seconds)
+                    print(f"✅ [{done + failed}/{len(pending)}] {item['id']} -> {', '.join(outputs)} ({seconds:.1f}s)")
+                except Exception as e:
+                    entry = {'id': item['id'], 'status': 'failed', 'error': str(e)}
+                    failed += 1
+                    print(f"❌ [{done + failed}/{len(pending)}] {item['id']}: {e}")
+                journal_file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+                journal_file.flush()
+    except KeyboardInterrupt:
+        print("⚠️ Interrupted - finished items are in the journal, run again to resume")
+        executor.shutdown(wait=False, cancel_futures=True)
+    else:
+        executor.shutdown()
+
+    report = build_report(len(items), skipped, done, failed, latencies, images, written_bytes,
+                          time.perf_counter() - started)
+    with open(os.path.join(out_dir, REPORT_NAME), 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    return report
+
+
+def local_provider(latency, concurrency):
+    """로컬 FAL 대역 - 실제 FalProvider/키 풀 경로를 타고, 첫 입력 사진을 결과로 돌려줌"""
+    def echo(arguments):
+        return {'images': [{'url': arguments['image_urls'][0]}] * arguments.get('num_images', 1)}
+
+    pool = fal_keys.KeyPool(['local'], max_concurrency=concurrency,
+                            client_factory=lambda key: fal_local.LocalFalClient(key, concurrency, latency, echo))
+    return providers.FalProvider(key_pool=pool)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='AI4컷 대량 오프라인 생성')
+    parser.add_argument('source', help='사진 폴더 또는 manifest(.jsonl)')
+    parser.add_argument('--out', required=True, help='결과 폴더 (journal.jsonl, report.json 포함)')
+    parser.add_argument('--layout', default='1x4')
+    parser.add_argument('--style', default='default', help='스타일 또는 bw/cool/warm')
+    parser.add_argument('--frame-color', default='black')
+    parser.add_argument('--num-images', type=int, default=1, help='항목당 결과 이미지 수')
+    parser.add_argument('--concurrency', type=int, default=(fal_keys.FAL_KEY_CONCURRENCY or 2) * len(fal_keys.keys_from_env()),
+                        help='동시 FAL 제출 수 (기본: 키 수 x FAL_KEY_CONCURRENCY, 미지정 시 키당 2)')
+    parser.add_argument('--limit', type=int, help='앞에서부터 N개만 처리')
+    parser.add_argument('--local', action='store_true', help='FAL 대신 로컬 대역 사용')
+    parser.add_argument('--local-latency', type=float, default=0.5, help='로컬 대역의 작업당 지연시간(초)')
+    args = parser.parse_args(argv)
+
+    defaults = {'layout': args.layout, 'style': args.style, 'frame_color': args.frame_color, 'num_images': args.num_images}
+    items = load_items(args.source, defaults)[:args.limit]
+    if not items:
+        raise SystemExit('처리할 사진이 없습니다.')
+
+    provider = local_provider(args.local_latency, args.concurrency) if args.local else providers.FalProvider()
+    report = run(items, provider, args.out, max(1, args.concurrency))
+    print(f"=== BULK REPORT === {json.dumps(report, ensure_ascii=False)}")
+    return 1 if report['failed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,66 @@
+"""만료 시간(TTL)과 크기 제한이 있는 스레드 안전 메모리 캐시"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """항목별 만료 시간 + 최대 개수/총 바이트 제한 (초과 시 가장 오래 사용되지 않은 항목부터 제거)"""
+
+    def __init__(self, ttl, max_items=1024, max_bytes=None):
+        self.ttl = ttl
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self._data = OrderedDict()  # key -> (expires_at, value, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.time():
+                self._remove(key)
+                return None
+            self._data.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value, size=0, ttl=None):
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (time.time() + (ttl if ttl is not None else self.ttl), value, size)
+            self._bytes += size
+            self._evict()
+
+    def pop(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            self._remove(key)
+            return entry[1] if entry[0] > time.time() else None
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    @property
+    def total_bytes(self):
+        return self._bytes
+
+    def __len__(self):
+        return len(self._data)
+
+    def _remove(self, key):
+        _, _, size = self._data.pop(key)
+        self._bytes -= size
+
+    def _evict(self):
+        now = time.time()
+        for key in [key for key, entry in self._data.items() if entry[0] <= now]:
+            self._remove(key)
+        while self._data and (len(self._data) > self.max_items or (self.max_bytes is not None and self._bytes > self.max_bytes)):
+            self._remove(next(iter(self._data)))
@@ -0,0 +1,178 @@
+"""이어 올리기 가능한 분할 업로드 - 느린 모바일 망에서 끊겨도 빠진 조각만 다시 보냄
+
+1. POST /uploads/sessions {"size": N}          -> session_id, chunk_size (사진 1장당 세션 1개)
+2. PUT  /uploads/sessions/<id>?offset=K         -> 조각 저장 (K 는 chunk_size 배수, 여러 조각 동시 전송 가능)
+   GET  /uploads/sessions/<id>                  -> 아직 받지 못한 offset 목록 (끊긴 뒤 이어 올리기용)
+3. POST /uploads/complete {"session_ids": [...]} -> 검증 후 staging 에 넣고 upload_token 발급
+
+조각은 CHUNKED_UPLOAD_DIR 의 세션별 임시 파일에 offset 위치로 바로 쓰고, 열린 세션 크기 합은
+CHUNKED_UPLOAD_MAX_BYTES 를 넘지 않는다. CHUNKED_UPLOAD_TTL_SECONDS 동안 조각이 오지 않은 세션은
+다음 요청 때 정리된다. 세션 정보는 프로세스 메모리에 있으므로 같은 인스턴스로 요청해야 한다.
+그래서 결과 페이지는 큰 사진에만 분할 업로드를 쓰고, 세션을 찾지 못하면(404 upload_expired)
+사진을 generate 요청에 직접 첨부한다.
+"""
+import os
+import secrets
+import tempfile
+import threading
+import time
+
+import validation
+
+CHUNKED_UPLOAD_DIR = os.getenv('CHUNKED_UPLOAD_DIR', os.path.join(tempfile.gettempdir(), 'ai4cut-uploads'))
+CHUNKED_UPLOAD_CHUNK_BYTES = int(os.getenv('CHUNKED_UPLOAD_CHUNK_BYTES', str(256 * 1024)))
+CHUNKED_UPLOAD_TTL_SECONDS = int(os.getenv('CHUNKED_UPLOAD_TTL_SECONDS', '900'))
+CHUNKED_UPLOAD_MAX_BYTES = int(os.getenv('CHUNKED_UPLOAD_MAX_BYTES', str(256 * 1024 * 1024)))
+
+
+class UploadError(ValueError):
+    """분할 업로드 요청 오류 (status 는 HTTP 상태 코드)"""
+
+    def __init__(self, message, status=400, code=None):
+        super().__init__(message)
+        self.status = status
+        self.code = code
+
+
+class UploadSession:
+    """업로드 1건 - 받은 조각 번호와 임시 파일 경로"""
+
+    def __init__(self, session_id, size, chunk_size, path):
+        self.id = session_id
+        self.size = size
+        self.chunk_size = chunk_size
+        self.path = path
+        self.received = set()
+        self.touched_at = time.time()
+
+    @property
+    def chunk_count(self):
+        return max(1, -(-self.size // self.chunk_size))
+
+    def missing_offsets(self):
+        return [index * self.chunk_size for index in range(self.chunk_count) if index not in self.received]
+
+    def status(self):
+        return {
+            'session_id': self.id,
+            'size': self.size,
+            'chunk_size': self.chunk_size,
+            'chunk_count': self.chunk_count,
+            'received': len(self.received),
+            'missing_offsets': self.missing_offsets(),
+            'expires_in': CHUNKED_UPLOAD_TTL_SECONDS
+        }
+
+
+class UploadStore:
+    """분할 업로드 세션 저장소 (임시 파일 + 메모리 메타데이터, 총 크기 제한과 만료 정리)"""
+
+    def __init__(self, directory=CHUNKED_UPLOAD_DIR, chunk_size=CHUNKED_UPLOAD_CHUNK_BYTES,
+                 ttl=CHUNKED_UPLOAD_TTL_SECONDS, max_bytes=CHUNKED_UPLOAD_MAX_BYTES):
+        self.directory = directory
+        self.chunk_size = chunk_size
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.sessions = {}
+        self.reserved_bytes = 0
+        self.expired = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _remove(self, session):
+        if self.sessions.pop(session.id, None) is None:
+            return
+        self.reserved_bytes -= session.size
+        try:
+            os.remove(session.path)
+        except FileNotFoundError:
+            pass
+
+    def expire(self):
+        """TTL 동안 조각이 오지 않은 세션 정리"""
+        now = time.time()
+        with self._lock:
+            for session in [s for s in self.sessions.values() if now - s.touched_at > self.ttl]:
+                self._remove(session)
+                self.expired += 1
+
+    def create(self, size):
+        # bool 은 int 의 하위 클래스이므로 따로 거절 (size=true 가 1바이트 세션이 되지 않도록)
+        if isinstance(size, bool) or not isinstance(size, int) or size <= 0:
+            raise UploadError('업로드 크기가 올바르지 않습니다.')
+        if size > validation.UPLOAD_MAX_BYTES:
+            raise UploadError(f'이미지 크기는 {validation.UPLOAD_MAX_BYTES // (1024 * 1024)}MB 이하여야 합니다.', 413)
+
+        self.expire()
+        session_id = secrets.token_urlsafe(16)
+        session = UploadSession(session_id, size, self.chunk_size, os.path.join(self.directory, f"{session_id}.part"))
+        with self._lock:
+            if self.reserved_bytes + size > self.max_bytes:
+                raise UploadError('업로드가 많아 잠시 후 다시 시도해주세요.', 503, 'overloaded')
+            self.reserved_bytes += size
+            self.sessions[session_id] = session
+        # 전체 크기의 빈 파일을 만들어 두고 조각은 offset 위치에 바로 씀
+        with open(session.path, 'wb') as f:
+            f.truncate(size)
+        return session
+
+    def get(self, session_id):
+        self.expire()
+        with self._lock:
+            session = self.sessions.get(session_id)
+        if session is None:
+            raise UploadError('업로드가 만료되었습니다. 다시 시도해주세요.', 404, 'upload_expired')
+        return session
+
+    def write_chunk(self, session_id, offset, data):
+        """offset 위치에 조각 저장 (같은 조각 재전송은 덮어씀)"""
+        session = self.get(session_id)
+        if offset < 0 or offset >= session.size or offset % session.chunk_size:
+            raise UploadError('조각 위치가 올바르지 않습니다.')
+        expected = min(session.chunk_size, session.size - offset)
+        if len(data) != expected:
+            raise UploadError(f'조각 크기가 올바르지 않습니다. ({len(data)} != {expected})')
+
+        try:
+            with open(session.path, 'r+b') as f:
+                f.seek(offset)
+                f.write(data)
+        except FileNotFoundError:  # 쓰는 도중 만료/완료로 정리됨
+            raise UploadError('업로드가 만료되었습니다. 다시 시도해주세요.', 404, 'upload_expired')
+        with self._lock:
+            session.received.add(offset // session.chunk_size)
+            session.touched_at = time.time()
+        return session
+
+    def total_size(self, session_ids):
+        with self._lock:
+            return sum(self.sessions[session_id].size for session_id in session_ids
+                       if isinstance(session_id, str) and session_id in self.sessions)
+
+    def complete(self, session_ids):
+        """모든 조각이 도착한 세션들의 파일 내용을 순서대로 반환하고 세션 정리"""
+        sessions = [self.get(session_id) for session_id in session_ids]
+        for session in sessions:
+            if session.missing_offsets():
+                raise UploadError('아직 업로드되지 않은 조각이 있습니다.', 409, 'upload_incomplete')
+
+        contents = []
+        for session in sessions:
+            with open(session.path, 'rb') as f:
+                contents.append(f.read())
+        with self._lock:
+            for session in sessions:
+                self._remove(session)
+        return contents
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'sessions': len(self.sessions),
+                'reserved_bytes': self.reserved_bytes,
+                'max_bytes': self.max_bytes,
+                'expired': self.expired
+            }
+
+
+store = UploadStore()
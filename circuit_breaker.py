@@ -0,0 +1,83 @@
+"""외부 서비스 회로 차단기 - 연속 실패/지연이 쌓이면 일정 시간 호출 자체를 건너뜀
+
+closed: 정상 호출. 실패(예외 또는 slow_call_seconds 초과)가 failure_threshold 번 연속되면 open.
+open: reset_seconds 동안 호출하지 않고 바로 CircuitOpenError (지연 없음).
+half_open: reset_seconds 가 지나면 시험 호출 1건만 통과시켜 성공하면 closed, 실패하면 다시 open.
+"""
+import threading
+import time
+
+
+class CircuitOpenError(RuntimeError):
+    """회로가 열려 있어 호출을 건너뜀"""
+
+
+class CircuitBreaker:
+    """스레드 안전 회로 차단기 - call(func, ...) 로 감싸서 호출"""
+
+    def __init__(self, name, failure_threshold=3, reset_seconds=30.0, slow_call_seconds=5.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.slow_call_seconds = slow_call_seconds
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = 0.0
+        self.opened_count = 0
+        self.rejected = 0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """지금 호출해도 되는지 (half_open 에서는 시험 호출 1건만 허용)"""
+        with self._lock:
+            if self.state == 'open' and time.time() - self.opened_at >= self.reset_seconds:
+                self.state = 'half_open'
+                self._probing = False
+            if self.state == 'closed':
+                return True
+            if self.state == 'half_open' and not self._probing:
+                self._probing = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record(self, ok, duration=0.0):
+        """호출 결과 기록 - 성공했어도 slow_call_seconds 를 넘기면 실패로 취급"""
+        failed = not ok or duration > self.slow_call_seconds
+        with self._lock:
+            self._probing = False
+            if not failed:
+                self.state = 'closed'
+                self.failures = 0
+                return
+            self.failures += 1
+            if self.state == 'half_open' or self.failures >= self.failure_threshold:
+                if self.state != 'open':
+                    self.opened_count += 1
+                    print(f"⚠️ {self.name} circuit open for {self.reset_seconds:.0f}s "
+                          f"({self.failures} failed or slow calls)")
+                self.state = 'open'
+                self.opened_at = time.time()
+
+    def call(self, func, *args, **kwargs):
+        if not self.allow():
+            raise CircuitOpenError(f"{self.name} 회로가 열려 있어 호출을 건너뜁니다.")
+        started = time.perf_counter()
+        try:
+            result = func(*args, **kwargs)
+        except Exception:
+            self.record(False, time.perf_counter() - started)
+            raise
+        self.record(True, time.perf_counter() - started)
+        return result
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'name': self.name,
+                'state': self.state,
+                'consecutive_failures': self.failures,
+                'opened_count': self.opened_count,
+                'rejected': self.rejected
+            }
@@ -0,0 +1,188 @@
+"""AI4컷 로컬 합성 엔진 - 개별 인물 컷을 프레임/로고/날짜/QR 과 함께 스트립으로 조립
+
+합성 모드에서는 FAL 이 인물 컷만 생성하고 프레임 색상, 레이아웃, MIRAI 로고, 날짜, QR 은
+여기서 그린다. 레이아웃/색상/날짜별 프레임 템플릿을 캐시하므로 프레임 색상만 바꾼 재합성은
+FAL 호출 없이 수십 ms 안에 끝난다.
+"""
+import base64
+import functools
+import io
+import os
+from datetime import datetime
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont, ImageOps
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# 레이아웃별 (프레임 크기, 열, 행, 컷 비율 w/h, FAL aspect_ratio) - get_ai_4_cut_prompt() 와 동일한 규격
+LAYOUTS = {
+    '1x1': ((2120, 3187), 1, 1, 3 / 4, '3:4'),
+    '1x3': ((1060, 3187), 1, 3, 1 / 1, '1:1'),
+    '2x2': ((2120, 3187), 2, 2, 3 / 4, '3:4'),
+    '1x4': ((1060, 3187), 1, 4, 4 / 3, '4:3'),
+}
+
+# 프레임 색상 이름 (get_ai_4_cut_prompt() 의 color_map 과 동일)
+FRAME_COLORS = {
+    'black': '#000000',
+    'gray': '#808080',
+    'white': '#FFFFFF',
+}
+
+MARGIN_RATIO = 0.03       # 여백/간격 = 프레임 폭의 3%
+MIN_BOTTOM_RATIO = 0.06   # 하단 로고 영역 최소 높이 = 프레임 높이의 6%
+
+
+def _layout(layout):
+    return LAYOUTS.get(layout, LAYOUTS['1x4'])
+
+
+def cut_count(layout):
+    """레이아웃의 인물 컷 수"""
+    _, cols, rows, _, _ = _layout(layout)
+    return cols * rows
+
+
+def cut_aspect_ratio(layout):
+    """FAL 요청용 컷 비율 문자열 (예: '4:3')"""
+    return _layout(layout)[4]
+
+
+@functools.lru_cache(maxsize=256)
+def parse_frame_color(frame_color):
+    """'#RRGGBB' 또는 색상 이름을 RGB 튜플로 변환 (알 수 없으면 검정)"""
+    value = FRAME_COLORS.get(frame_color, frame_color or '#000000').lstrip('#')
+    try:
+        return tuple(int(value[i:i + 2], 16) for i in (0, 2, 4)) if len(value) == 6 else (0, 0, 0)
+    except ValueError:
+        return (0, 0, 0)
+
+
+def _contrast_color(rgb):
+    """프레임 색상 위에 보이는 텍스트 색상 (밝은 프레임이면 검정, 어두우면 흰색)"""
+    luminance = 0.299 * rgb[0] + 0.587 * rgb[1] + 0.114 * rgb[2]
+    return (17, 17, 17) if luminance > 150 else (255, 255, 255)
+
+
+def cell_boxes(layout):
+    """레이아웃의 컷 배치 영역 [(left, top, width, height), ...] 과 하단 영역 시작 y"""
+    (width, height), cols, rows, aspect, _ = _layout(layout)
+    margin = round(width * MARGIN_RATIO)
+    min_bottom = round(height * MIN_BOTTOM_RATIO)
+
+    cell_w = (width - 2 * margin - (cols - 1) * margin) / cols
+    cell_h = cell_w / aspect
+    if margin + rows * cell_h + (rows - 1) * margin + min_bottom > height:
+        cell_h = (height - margin - min_bottom - (rows - 1) * margin) / rows
+        cell_w = cell_h * aspect
+    cell_w, cell_h = int(cell_w), int(cell_h)
+
+    grid_w = cols * cell_w + (cols - 1) * margin
+    left0 = (width - grid_w) // 2
+    boxes = []
+    for row in range(rows):
+        for col in range(cols):
+            boxes.append((left0 + col * (cell_w + margin), margin + row * (cell_h + margin), cell_w, cell_h))
+    bottom_top = margin + rows * cell_h + (rows - 1) * margin
+    return boxes, bottom_top
+
+
+@functools.lru_cache(maxsize=4)
+def _logo_image(text_rgb):
+    """logo.png 의 어두운 배경을 투명 처리하고 흰 글자를 text_rgb 로 바꾼 로고 (색상별 캐시)"""
+    logo = Image.open(os.path.join(BASE_DIR, 'static_image', 'logo.png')).convert('RGB')
+    pixels = np.asarray(logo).astype(np.int16)
+    background = pixels[0, 0]
+    distance = np.abs(pixels - background).max(axis=2)
+    alpha = np.clip(distance * 4, 0, 255).astype(np.uint8)
+
+    rgb = pixels.astype(np.uint8).copy()
+    whiteish = pixels.min(axis=2) > 200
+    rgb[whiteish] = text_rgb
+
+    result = Image.fromarray(np.dstack([rgb, alpha]), 'RGBA')
+    return result.crop(result.getbbox())
+
+
+@functools.lru_cache(maxsize=1)
+def _qr_image():
+    return Image.open(os.path.join(BASE_DIR, 'static_image', 'QR.png')).convert('RGBA')
+
+
+def _font(size):
+    try:
+        return ImageFont.load_default(size=size)
+    except TypeError:
+        return ImageFont.load_default()
+
+
+@functools.lru_cache(maxsize=32)
+def frame_template(layout, frame_rgb, date_text):
+    """레이아웃/프레임 색상/날짜별 빈 프레임 (로고, 날짜, QR 포함) - 컷만 붙이면 완성"""
+    (width, height), _, _, _, _ = _layout(layout)
+    boxes, bottom_top = cell_boxes(layout)
+    margin = round(width * MARGIN_RATIO)
+    text_rgb = _contrast_color(frame_rgb)
+
+    frame = Image.new('RGB', (width, height), frame_rgb)
+    bottom_h = height - bottom_top
+
+    # 로고 (하단 영역 중앙, 날짜와 함께 세로 중앙 정렬)
+    logo = _logo_image(text_rgb)
+    logo_h = int(bottom_h * 0.4)
+    logo_w = int(logo.width * logo_h / logo.height)
+    max_logo_w = int(width * 0.5)
+    if logo_w > max_logo_w:
+        logo_w, logo_h = max_logo_w, int(logo.height * max_logo_w / logo.width)
+    logo = logo.resize((logo_w, logo_h), Image.LANCZOS)
+
+    font = _font(max(12, int(logo_h * 0.22)))
+    draw = ImageDraw.Draw(frame)
+    text_box = draw.textbbox((0, 0), date_text, font=font)
+    text_w, text_h = text_box[2] - text_box[0], text_box[3] - text_box[1]
+    gap = int(logo_h * 0.12)
+    block_top = bottom_top + (bottom_h - (logo_h + gap + text_h)) // 2
+
+    frame.paste(logo, ((width - logo_w) // 2, block_top), logo)
+    draw.text(((width - text_w) // 2 - text_box[0], block_top + logo_h + gap - text_box[1]), date_text, fill=text_rgb, font=font)
+
+    # QR (오른쪽 아래, 로고 높이의 절반)
+    qr_size = max(48, logo_h // 2)
+    qr = _qr_image().resize((qr_size, qr_size), Image.NEAREST)
+    frame.paste(qr, (width - margin - qr_size, bottom_top + (bottom_h - qr_size) // 2), qr)
+
+    return frame
+
+
+def load_image(data):
+    """bytes 또는 data URI 를 RGB 이미지로 디코드"""
+    if isinstance(data, str):
+        data = base64.b64decode(data.split(',', 1)[1] if data.startswith('data:') else data)
+    return Image.open(io.BytesIO(data)).convert('RGB')
+
+
+def compose_strip(cuts, layout, frame_color, date_text=None):
+    """인물 컷들을 레이아웃에 맞춰 프레임에 배치한 스트립 이미지 (컷이 모자라면 앞의 컷을 반복)"""
+    if not cuts:
+        raise ValueError('합성할 컷이 없습니다.')
+    date_text = date_text or datetime.now().strftime('%Y.%m.%d')
+    strip = frame_template(layout, parse_frame_color(frame_color), date_text).copy()
+
+    boxes, _ = cell_boxes(layout)
+    images = [cut if isinstance(cut, Image.Image) else load_image(cut) for cut in cuts]
+    for index, (left, top, cell_w, cell_h) in enumerate(boxes):
+        cut = ImageOps.fit(images[index % len(images)], (cell_w, cell_h), Image.LANCZOS)
+        strip.paste(cut, (left, top))
+    return strip
+
+
+def to_png_bytes(image, compress_level=3):
+    """PNG 인코딩 (기본 압축 6 대비 훨씬 빠름)"""
+    buffer = io.BytesIO()
+    image.save(buffer, format='PNG', compress_level=compress_level)
+    return buffer.getvalue()
+
+
+def to_data_uri(image):
+    return f"data:image/png;base64,{base64.b64encode(to_png_bytes(image)).decode('utf-8')}"
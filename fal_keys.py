@@ -0,0 +1,162 @@
+"""FAL API 키 풀 - 키별 동시 실행 제한, 가장 한가한 키 우선 배정, 스로틀된 키 일시 제외
+
+FAL_KEYS=key1,key2,... 로 여러 키를 지정한다 (없으면 FAL_KEY 하나로 동작).
+키마다 fal_client.SyncClient(key=...) 를 만들어 쓰므로 전역 FAL_KEY 환경변수를 바꾸지 않는다.
+FAL_KEY_CONCURRENCY 를 지정하지 않으면(0) 키별 동시 실행 수를 제한하지 않고 한가한 키 배정과 스로틀 쿨다운만 한다.
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import fal_client
+
+# 키별 동시 실행 상한 (0 또는 미설정이면 제한 없음 - 계정 한도를 알 때만 지정)
+FAL_KEY_CONCURRENCY = int(os.getenv('FAL_KEY_CONCURRENCY', '0')) or None
+FAL_KEY_COOLDOWN_SECONDS = float(os.getenv('FAL_KEY_COOLDOWN_SECONDS', '30'))
+FAL_KEY_ACQUIRE_TIMEOUT = float(os.getenv('FAL_KEY_ACQUIRE_TIMEOUT', '60'))
+
+
+class FalThrottledError(RuntimeError):
+    """키가 rate limit / 동시 실행 제한에 걸림 (HTTP 429)"""
+
+
+def is_throttle_error(error):
+    """FAL 응답이 스로틀(HTTP 429) 인지 판별 - 메시지 문자열은 보지 않음"""
+    if isinstance(error, FalThrottledError):
+        return True
+    # fal_client 는 httpx 의 raise_for_status() 를 그대로 올리므로 응답 상태 코드로만 판단
+    response = getattr(error, 'response', None)
+    return getattr(response, 'status_code', None) == 429
+
+
+class KeySlot:
+    """키 1개의 상태 (진행 중 작업 수, 쿨다운, 누적 통계)"""
+
+    def __init__(self, key, client, limit):
+        self.key = key
+        self.client = client
+        self.limit = limit
+        self.in_flight = 0
+        self.cooldown_until = 0.0
+        self.completed = 0
+        self.throttled = 0
+
+    @property
+    def label(self):
+        """로그/지표용 마스킹된 키 이름"""
+        return f"{self.key[:6]}…" if self.key else 'default'
+
+    @property
+    def load(self):
+        """한가한 키 비교용 부하 (제한이 없으면 진행 중 작업 수)"""
+        return self.in_flight / self.limit if self.limit else self.in_flight
+
+    def available(self, now):
+        return (self.limit is None or self.in_flight < self.limit) and self.cooldown_until <= now
+
+
+class KeyPool:
+    """FAL 키 풀 - acquire() 로 키를 빌리고 run() 으로 스로틀 시 다른 키로 재시도"""
+
+    def __init__(self, keys, max_concurrency=FAL_KEY_CONCURRENCY, cooldown_seconds=FAL_KEY_COOLDOWN_SECONDS,
+                 acquire_timeout=FAL_KEY_ACQUIRE_TIMEOUT, client_factory=None):
+        client_factory = client_factory or (lambda key: fal_client.SyncClient(key=key))
+        self.slots = [KeySlot(key, client_factory(key), max_concurrency) for key in keys]
+        self.cooldown_seconds = cooldown_seconds
+        self.acquire_timeout = acquire_timeout
+        self._condition = threading.Condition()
+
+    def _least_loaded(self, now):
+        candidates = [slot for slot in self.slots if slot.available(now)]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda slot: slot.load)
+
+    @contextmanager
+    def acquire(self, timeout=None):
+        """가장 한가한 키를 빌려옴 (모두 사용 중/쿨다운이면 timeout 까지 대기)"""
+        deadline = time.time() + (self.acquire_timeout if timeout is None else timeout)
+        with self._condition:
+            while True:
+                now = time.time()
+                slot = self._least_loaded(now)
+                if slot:
+                    slot.in_flight += 1
+                    break
+                if now >= deadline:
+                    raise RuntimeError('사용 가능한 FAL 키가 없습니다. (모두 사용 중 또는 쿨다운)')
+                # 쿨다운이 먼저 끝나면 그때 다시 확인
+                cooldowns = [s.cooldown_until for s in self.slots if s.cooldown_until > now]
+                wake_at = min([deadline] + cooldowns)
+                self._condition.wait(max(0.01, wake_at - now))
+        try:
+            yield slot
+        finally:
+            with self._condition:
+                slot.in_flight -= 1
+                self._condition.notify_all()
+
+    def mark_throttled(self, slot):
+        with self._condition:
+            slot.throttled += 1
+            slot.cooldown_until = time.time() + self.cooldown_seconds
+            self._condition.notify_all()
+        print(f"⚠️ FAL key {slot.label} throttled, cooling down {self.cooldown_seconds:.0f}s")
+
+    def run(self, func):
+        """func(client) 실행 - 스로틀되면 해당 키를 쿨다운시키고 다른 키로 재시도"""
+        last_error = None
+        for _ in range(len(self.slots)):
+            with self.acquire() as slot:
+                try:
+                    result = func(slot.client)
+                except Exception as e:
+                    if not is_throttle_error(e):
+                        raise
+                    self.mark_throttled(slot)
+                    last_error = e
+                    continue
+                with self._condition:
+                    slot.completed += 1
+                return result
+        raise last_error
+
+    def pick_key(self):
+        """대기 없이 지금 가장 한가한 키 반환 (webhook 제출처럼 결과를 기다리지 않는 경우용)"""
+        with self._condition:
+            now = time.time()
+            slot = self._least_loaded(now) or min(self.slots, key=lambda s: s.cooldown_until)
+            return slot.key
+
+    def snapshot(self):
+        now = time.time()
+        with self._condition:
+            return [{
+                'key': slot.label,
+                'in_flight': slot.in_flight,
+                'limit': slot.limit,
+                'utilization': round(slot.load, 3) if slot.limit else None,
+                'cooling_down': slot.cooldown_until > now,
+                'completed': slot.completed,
+                'throttled': slot.throttled
+            } for slot in self.slots]
+
+
+def keys_from_env():
+    keys = [key.strip() for key in os.getenv('FAL_KEYS', '').split(',') if key.strip()]
+    return keys or [os.getenv('FAL_KEY')]
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """프로세스 전역 키 풀 (첫 사용 시 환경변수로 생성)"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = KeyPool(keys_from_env())
+            print(f"✅ FAL key pool: {len(_pool.slots)} keys x {FAL_KEY_CONCURRENCY or 'unlimited'} concurrent")
+        return _pool
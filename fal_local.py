@@ -0,0 +1,106 @@
+"""로컬 FAL 대역 - 네트워크/키 없이 fal_client.SyncClient 자리에 끼워 키 풀/프로바이더 경로를 그대로 확인
+
+bulk.py --local 과 tests/ 에서 fal_keys.KeyPool(client_factory=lambda key: LocalFalClient(key, ...)) 로 사용한다.
+"""
+import threading
+import time
+
+import fal_client
+
+import fal_keys
+
+
+class _LocalResponse:
+    """LocalFalClient.put() 응답 (raise_for_status 만 흉내)"""
+
+    def __init__(self, status_code, url):
+        self.status_code = status_code
+        self.url = url
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(f"{self.status_code} for url {self.url}")
+
+
+class LocalFalHandle:
+    """LocalFalClient 작업 핸들 - SyncRequestHandle 처럼 request_id, cancel_url, client,
+    status()/iter_events()/get() 을 제공 (latency 초 뒤 완료, 취소되면 get() 에서 에러)
+    """
+
+    def __init__(self, client, request_id, arguments):
+        self.client = client
+        self.request_id = request_id
+        self.cancel_url = f"local://{client.key}/requests/{request_id}/cancel"
+        self.arguments = arguments
+        self.done_at = time.time() + client.latency
+        self.cancelled = False
+
+    def status(self):
+        if time.time() >= self.done_at:
+            return fal_client.Completed(logs=None, metrics={})
+        return fal_client.InProgress(logs=None)
+
+    def iter_events(self, interval=0.1):
+        """완료될 때까지 interval 마다 상태를 yield (마지막은 Completed)"""
+        while True:
+            status = self.status()
+            yield status
+            if isinstance(status, fal_client.Completed):
+                return
+            time.sleep(max(0.0, min(interval, self.done_at - time.time())))
+
+    def get(self):
+        try:
+            time.sleep(max(0.0, self.done_at - time.time()))
+            if self.cancelled:
+                raise RuntimeError(f"FAL request {self.request_id} was cancelled")
+            return self.client.result(self.arguments) if callable(self.client.result) else self.client.result
+        finally:
+            self.client._finish(self)
+
+
+class LocalFalClient:
+    """FAL 대역 클라이언트 - 키별 동시 실행 제한(limit)을 넘겨 제출하면 FalThrottledError
+
+    result 는 고정 응답 dict 또는 arguments 를 받아 응답을 만드는 함수.
+    핸들의 client 가 자기 자신이므로 generation.cancel_fal_request() 의 put(cancel_url) 도 여기서 처리된다.
+    """
+
+    def __init__(self, key, limit=fal_keys.FAL_KEY_CONCURRENCY, latency=0.0, result=None):
+        self.key = key
+        self.limit = limit
+        self.latency = latency
+        self.result = result or {'images': [{'url': 'data:image/png;base64,'}]}
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.submitted = 0
+        self.cancelled = []
+        self._handles = {}
+        self._lock = threading.Lock()
+
+    def submit(self, application, arguments):
+        with self._lock:
+            if self.limit is not None and self.in_flight >= self.limit:
+                raise fal_keys.FalThrottledError(f"429 Too Many Requests ({self.key})")
+            self.submitted += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            handle = LocalFalHandle(self, f"local-{self.submitted}", arguments)
+            self._handles[handle.cancel_url] = handle
+        return handle
+
+    def _finish(self, handle):
+        with self._lock:
+            if self._handles.pop(handle.cancel_url, None) is not None:
+                self.in_flight -= 1
+
+    def put(self, url):
+        """cancel_url 로 작업 취소 (이미 끝난 작업이면 400)"""
+        with self._lock:
+            handle = self._handles.get(url)
+            if handle is None:
+                return _LocalResponse(400, url)
+            handle.cancelled = True
+            self.cancelled.append(handle.request_id)
+        self._finish(handle)
+        return _LocalResponse(202, url)
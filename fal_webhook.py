@@ -0,0 +1,121 @@
+"""FAL 완료 webhook 서명/검증 헬퍼 및 로컬 콜백 시뮬레이터
+
+handler.get() 으로 결과를 기다리는 대신 FAL 큐에 webhook URL 을 넘겨 제출하고,
+완료 콜백이 오면 /fal/webhook 라우트에서 결과를 다운로드해 gallery 를 업데이트한다.
+"""
+import hashlib
+import hmac
+import os
+import threading
+import time
+from urllib.parse import urlencode
+
+import requests
+
+# 외부에서 접근 가능한 서비스 주소 (예: https://ai4cut.example.com) 와 콜백 서명용 비밀키
+PUBLIC_BASE_URL = os.getenv('PUBLIC_BASE_URL')
+WEBHOOK_SECRET = os.getenv('FAL_WEBHOOK_SECRET')
+
+# 같은 작업에 대한 중복 콜백 무시 (프로세스 내, 1시간 보관)
+CLAIM_TTL_SECONDS = 3600
+_claimed_jobs = {}
+_claimed_lock = threading.Lock()
+
+
+def is_enabled():
+    """webhook 모드 사용 가능 여부 (공개 주소와 비밀키가 모두 설정된 경우)"""
+    return bool(PUBLIC_BASE_URL and WEBHOOK_SECRET)
+
+
+def _sign(gallery_id, is_duo):
+    message = f"{gallery_id}:{1 if is_duo else 0}".encode('utf-8')
+    return hmac.new(WEBHOOK_SECRET.encode('utf-8'), message, hashlib.sha256).hexdigest()
+
+
+def build_webhook_url(gallery_id, is_duo, base_url=None):
+    """gallery_id 에 서명된 토큰을 붙인 콜백 URL 생성"""
+    query = urlencode({
+        'gallery_id': gallery_id,
+        'duo': 1 if is_duo else 0,
+        'token': _sign(gallery_id, is_duo)
+    })
+    return f"{(base_url or PUBLIC_BASE_URL).rstrip('/')}/fal/webhook?{query}"
+
+
+def verify_webhook(gallery_id, is_duo, token):
+    """콜백 URL 의 토큰 검증"""
+    if not WEBHOOK_SECRET or not gallery_id or not token:
+        return False
+    return hmac.compare_digest(_sign(gallery_id, is_duo), token)
+
+
+def claim_job(gallery_id):
+    """작업 처리 권한 획득 - 이미 처리 중이거나 처리된 작업이면 False"""
+    now = time.time()
+    with _claimed_lock:
+        for key, claimed_at in list(_claimed_jobs.items()):
+            if now - claimed_at > CLAIM_TTL_SECONDS:
+                del _claimed_jobs[key]
+        if gallery_id in _claimed_jobs:
+            return False
+        _claimed_jobs[gallery_id] = now
+        return True
+
+
+def release_job(gallery_id):
+    """처리 실패 시 권한 반환 (FAL 재시도 콜백이 다시 처리할 수 있도록)"""
+    with _claimed_lock:
+        _claimed_jobs.pop(gallery_id, None)
+
+
+def parse_callback(payload):
+    """FAL 콜백 본문 파싱 - (성공 여부, 결과 payload, 에러 메시지) 반환"""
+    if payload.get('status') == 'OK' and payload.get('payload'):
+        return True, payload['payload'], None
+    error = payload.get('error') or payload.get('payload_error') or 'FAL job failed'
+    return False, None, error
+
+
+def callback_body(gallery_id, image_urls, status='OK', request_id=None):
+    """FAL 완료 콜백과 같은 형식의 본문 (시뮬레이터/테스트용)"""
+    request_id = request_id or f"sim-{gallery_id}"
+    return {
+        'request_id': request_id,
+        'gateway_request_id': request_id,
+        'status': status,
+        'payload': {'images': [{'url': url} for url in image_urls]} if status == 'OK' else None,
+        'error': None if status == 'OK' else 'Simulated failure'
+    }
+
+
+def simulate_callback(base_url, gallery_id, image_urls, is_duo=False, status='OK', request_id=None):
+    """로컬 테스트용 - FAL 과 같은 형식의 완료 콜백을 보냄"""
+    body = callback_body(gallery_id, image_urls, status, request_id)
+    request_id = body['request_id']
+    response = requests.post(build_webhook_url(gallery_id, is_duo, base_url), json=body, timeout=120)
+    print(f"Callback {request_id} -> {response.status_code}: {response.text}")
+    return response
+
+
+if __name__ == '__main__':
+    import argparse
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    WEBHOOK_SECRET = os.getenv('FAL_WEBHOOK_SECRET')
+
+    parser = argparse.ArgumentParser(description='FAL 완료 콜백 시뮬레이터')
+    parser.add_argument('gallery_id')
+    parser.add_argument('--base-url', default='http://localhost:5002')
+    parser.add_argument('--image-url', action='append', default=[], help='결과 이미지 URL (여러 번 지정 가능)')
+    parser.add_argument('--duo', action='store_true')
+    parser.add_argument('--fail', action='store_true', help='실패 콜백 전송')
+    parser.add_argument('--repeat', type=int, default=1, help='중복 콜백 테스트용 반복 횟수')
+    args = parser.parse_args()
+
+    if not WEBHOOK_SECRET:
+        raise SystemExit('FAL_WEBHOOK_SECRET 환경변수가 필요합니다.')
+
+    for _ in range(args.repeat):
+        simulate_callback(args.base_url, args.gallery_id, args.image_url, args.duo,
+                          status='ERROR' if args.fail else 'OK')
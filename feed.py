@@ -0,0 +1,65 @@
+"""공개 결과 피드 - 최근 24시간 공개 결과를 (created_at, id) keyset 페이지네이션으로 제공
+
+OFFSET 없이 마지막 항목의 (created_at, id) 를 커서로 넘겨 다음 페이지를 인덱스 범위 스캔으로 읽는다.
+자주 조회되는 첫 페이지들은 짧은 TTL 로 메모리에 캐시한다.
+"""
+import base64
+import json
+import os
+from datetime import datetime, timedelta, timezone
+
+from cache import TTLCache
+
+FEED_PAGE_SIZE = 24
+FEED_MAX_PAGE_SIZE = 60
+FEED_MAX_AGE_HOURS = 24
+FEED_CACHE_TTL = int(os.getenv('FEED_CACHE_TTL', '15'))
+FEED_THUMB_WIDTH = 320
+# 로컬 저장소 썸네일 라우트에서 허용하는 폭
+THUMB_WIDTHS = (160, 320, 640)
+
+_feed_cache = TTLCache(ttl=FEED_CACHE_TTL, max_items=256)
+
+
+def encode_cursor(row):
+    raw = json.dumps([row['created_at'], row['id']], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """커서 문자열을 (created_at, id) 로 변환 (형식이 잘못되면 ValueError)"""
+    try:
+        created_at, gallery_id = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except Exception:
+        raise ValueError('잘못된 cursor 입니다.')
+    if not isinstance(created_at, str) or not isinstance(gallery_id, str):
+        raise ValueError('잘못된 cursor 입니다.')
+    return created_at, gallery_id
+
+
+def get_feed(backend, limit=FEED_PAGE_SIZE, cursor=None):
+    """피드 한 페이지 {'items': [...], 'next_cursor': str|None} (limit 1개를 더 읽어 다음 페이지 유무 판단)"""
+    cache_key = (backend.name, limit, cursor)
+    page = _feed_cache.get(cache_key)
+    if page is not None:
+        return page
+
+    before = decode_cursor(cursor) if cursor else None
+    since = (datetime.now(timezone.utc) - timedelta(hours=FEED_MAX_AGE_HOURS)).isoformat()
+    rows = backend.list_public_galleries(limit + 1, since, before)
+
+    items = [{
+        'id': row['id'],
+        'share_url': f"/r/{row['id']}",
+        'thumbnail_url': backend.thumbnail_url(row['image_url'], FEED_THUMB_WIDTH),
+        'layout': row.get('layout'),
+        'style': row.get('style'),
+        'color_mode': row.get('color_mode'),
+        'created_at': row['created_at']
+    } for row in rows[:limit]]
+    page = {
+        'items': items,
+        'next_cursor': encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    }
+    _feed_cache.set(cache_key, page)
+    return page
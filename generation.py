@@ -0,0 +1,222 @@
+"""AI4컷 생성 파이프라인 공용 헬퍼 (app.py / api/index.py 에서 함께 사용)"""
+import base64
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import quote
+
+import fal_client
+import requests
+
+import validation
+
+FAL_MODEL = "fal-ai/nano-banana-pro/edit"
+FAL_QUEUE_URL = "https://queue.fal.run/"
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# 결과 이미지 다운로드 timeout (초)
+RESULT_DOWNLOAD_TIMEOUT_SECONDS = float(os.getenv('RESULT_DOWNLOAD_TIMEOUT_SECONDS', '30'))
+
+# 배치 생성 제한 (요청당 변형 수 / 동시 FAL 제출 수)
+BATCH_MAX_VARIANTS = int(os.getenv('BATCH_MAX_VARIANTS', '6'))
+BATCH_MAX_CONCURRENCY = int(os.getenv('BATCH_MAX_CONCURRENCY', '3'))
+
+# fan-out 생성 (이미지 1장짜리 작업 N개를 동시에 돌려 가장 먼저 끝난 결과를 바로 반환)
+# 요청당 FAL 비용이 N배가 되므로 서버 설정으로만 켬 (클라이언트 값은 받지 않음)
+FANOUT_MAX_JOBS = int(os.getenv('FANOUT_MAX_JOBS', '4'))
+GENERATION_FANOUT = min(int(os.getenv('GENERATION_FANOUT', '0')), FANOUT_MAX_JOBS)
+# 첫 결과 이후 남은 작업을 기다리는 최대 시간 (초과 시 FAL 작업 취소)
+FANOUT_DEADLINE_SECONDS = float(os.getenv('FANOUT_DEADLINE_SECONDS', '180'))
+
+# 첫 결과를 반환한 뒤에도 남은 작업이 백그라운드에서 계속 돌 수 있도록 요청과 분리된 스레드 풀 사용
+_fanout_executor = ThreadPoolExecutor(max_workers=int(os.getenv('FANOUT_MAX_WORKERS', '16')), thread_name_prefix='fanout')
+
+
+class JobCancelled(RuntimeError):
+    """fan-out 마감 시간이 지나 취소된 작업"""
+
+
+def split_style_color_mode(style):
+    """스타일 값에서 색상 모드 분리 (bw, cool, warm은 color_mode로 처리)"""
+    if style in ['bw', 'cool', 'warm']:
+        return 'default', style
+    return style, 'color'
+
+
+def detect_mime_type(image_data):
+    """업로드 이미지의 MIME 타입 (매직 바이트로 PNG/JPEG/WebP 판별, 알 수 없으면 JPEG 으로 간주)"""
+    return validation.sniff_image_type(image_data) or 'image/jpeg'
+
+
+def encode_image_data_uri(image_data):
+    """업로드 이미지를 base64 data URI 로 변환"""
+    mime_type = detect_mime_type(image_data)
+    return f"data:{mime_type};base64,{base64.b64encode(image_data).decode('utf-8')}"
+
+
+@functools.lru_cache(maxsize=None)
+def load_static_image_uri(filename):
+    """static_image 폴더의 이미지(logo.png, QR.png)를 data URI 로 읽기 (프로세스당 1회)"""
+    with open(os.path.join(BASE_DIR, 'static_image', filename), 'rb') as f:
+        data = f.read()
+    print(f"Static image loaded: {filename} ({len(data)} bytes)")
+    return f"data:image/png;base64,{base64.b64encode(data).decode('utf-8')}"
+
+
+def build_input_image_urls(user_image_uris):
+    """FAL 입력 이미지 목록 구성 (사용자 이미지 + logo + QR)"""
+    return list(user_image_uris) + [load_static_image_uri('logo.png'), load_static_image_uri('QR.png')]
+
+
+def extract_result_urls(result_data):
+    """FAL 응답에서 결과 이미지 URL 목록 추출"""
+    result_urls = []
+    if not result_data:
+        return result_urls
+
+    if 'images' in result_data and len(result_data['images']) > 0:
+        for img in result_data['images']:
+            if isinstance(img, dict) and 'url' in img:
+                result_urls.append(img['url'])
+            elif isinstance(img, str):
+                result_urls.append(img)
+    elif 'image' in result_data:
+        if isinstance(result_data['image'], dict) and 'url' in result_data['image']:
+            result_urls.append(result_data['image']['url'])
+        elif isinstance(result_data['image'], str):
+            result_urls.append(result_data['image'])
+    elif 'url' in result_data:
+        result_urls.append(result_data['url'])
+
+    return result_urls
+
+
+def download_result_images(result_urls):
+    """결과 이미지를 다운로드하여 base64 data URI 목록으로 반환 (이미 data URI 인 결과는 그대로 사용)"""
+    result_data_uris = []
+    for i, url in enumerate(result_urls):
+        if url.startswith('data:'):
+            result_data_uris.append(url)
+            continue
+        # webhook 핸들러 안에서도 호출되므로 응답 없는 URL 에 묶이지 않도록 timeout 지정
+        try:
+            response = requests.get(url, timeout=RESULT_DOWNLOAD_TIMEOUT_SECONDS)
+        except requests.RequestException as e:
+            print(f"Failed to download image {i+1}: {e}")
+            continue
+        if response.status_code == 200:
+            result_base64 = base64.b64encode(response.content).decode('utf-8')
+            result_data_uris.append(f"data:image/png;base64,{result_base64}")
+            print(f"Image {i+1} downloaded successfully")
+        else:
+            print(f"Failed to download image {i+1}: {response.status_code}")
+    return result_data_uris
+
+
+def submit_with_webhook(arguments, webhook_url, application=FAL_MODEL, fal_key=None):
+    """FAL 큐에 작업을 제출하고 완료 시 webhook_url 로 콜백 받기 (결과를 기다리지 않음)
+
+    fal-client 0.4.0 의 submit()은 webhook 파라미터를 지원하지 않아 큐 API를 직접 호출한다.
+    """
+    fal_key = fal_key or os.getenv('FAL_KEY')
+    if not fal_key:
+        raise RuntimeError("FAL_KEY not found in environment")
+
+    url = f"{FAL_QUEUE_URL}{application}?fal_webhook={quote(webhook_url, safe='')}"
+    response = requests.post(
+        url,
+        json=arguments,
+        headers={'Authorization': f"Key {fal_key}"},
+        timeout=30
+    )
+    response.raise_for_status()
+    request_id = response.json().get('request_id')
+    print(f"✅ FAL job submitted with webhook: {request_id}")
+    return request_id
+
+
+def cancel_fal_request(handler):
+    """진행 중인 FAL 큐 작업 취소 (cancel_url 호출, 실패해도 무시)"""
+    try:
+        handler.client.put(handler.cancel_url).raise_for_status()
+        print(f"🛑 FAL job cancelled: {handler.request_id}")
+    except Exception as e:
+        print(f"⚠️ FAL job cancel failed ({handler.request_id}): {e}")
+
+
+def run_fal_job(arguments, application=FAL_MODEL, client=fal_client, cancel_event=None):
+    """FAL 작업을 제출하고 결과 이미지를 data URI 목록으로 반환 (동기, client 는 키별 SyncClient)
+
+    cancel_event 가 set 되면 FAL 작업을 취소하고 JobCancelled 발생
+    """
+    handler = client.submit(application, arguments=arguments)
+    if cancel_event is not None:
+        for _ in handler.iter_events(interval=0.5):
+            if cancel_event.is_set():
+                cancel_fal_request(handler)
+                raise JobCancelled(handler.request_id)
+    result = handler.get()
+    return download_result_images(extract_result_urls(result))
+
+
+def run_batch(variants, worker, max_concurrency=BATCH_MAX_CONCURRENCY):
+    """여러 변형을 동시에 처리하고 완료되는 순서대로 (index, 결과, 에러) 를 yield"""
+    with ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(variants)))) as executor:
+        futures = {executor.submit(worker, variant): index for index, variant in enumerate(variants)}
+        for future in as_completed(futures):
+            index = futures[future]
+            try:
+                yield index, future.result(), None
+            except Exception as e:
+                print(f"❌ Batch variant {index} failed: {e}")
+                yield index, None, str(e)
+
+
+def run_fanout(job, count, on_late_result=None, deadline=FANOUT_DEADLINE_SECONDS):
+    """job(cancel_event) 을 count 개 동시에 실행하고 가장 먼저 성공한 결과를 반환
+
+    나머지 작업은 백그라운드에서 계속 실행되어 끝날 때마다 on_late_result(결과) 로 전달되고,
+    deadline 초가 지나면 cancel_event 가 set 되어 남은 작업이 취소된다. 모두 실패하면 마지막 에러 발생.
+    """
+    cancel_event = threading.Event()
+    futures = [_fanout_executor.submit(job, cancel_event) for _ in range(count)]
+
+    first_result, last_error = None, None
+    pending = set(futures)
+    for future in as_completed(futures):
+        pending.discard(future)
+        try:
+            first_result = future.result()
+            break
+        except Exception as e:
+            print(f"❌ Fan-out job failed: {e}")
+            last_error = e
+    if first_result is None:
+        raise last_error or RuntimeError('fan-out 작업이 모두 실패했습니다.')
+
+    if pending:
+        timer = threading.Timer(deadline, cancel_event.set)
+        timer.daemon = True
+        timer.start()
+        remaining = [len(pending)]
+        lock = threading.Lock()
+
+        def on_done(future):
+            try:
+                if not future.cancelled() and future.exception() is None and on_late_result:
+                    on_late_result(future.result())
+            except Exception as e:
+                print(f"❌ Fan-out late result failed: {e}")
+            finally:
+                with lock:
+                    remaining[0] -= 1
+                    if remaining[0] == 0:
+                        timer.cancel()
+
+        # 이미 끝난 작업의 콜백이 호출자 스레드(첫 결과를 저장하는 동안 lock 을 잡고 있음)에서 실행되지 않도록 executor 로 넘김
+        for future in pending:
+            future.add_done_callback(lambda done: _fanout_executor.submit(on_done, done))
+
+    return first_result, len(pending)
@@ -0,0 +1,124 @@
+"""프로세스 전역 메모리 예산 - 요청이 업로드를 읽거나 결과를 받기 전에 예상 바이트를 예약
+
+generate 요청 1건은 업로드 원본과 base64 사본, 결과 PNG 와 그 base64 사본을 동시에 들고 있어 수십 MB 가 된다.
+예약 합계가 MEMORY_BUDGET_MB 를 넘으면 새 요청은 MEMORY_BUDGET_WAIT_SECONDS 까지 기다리고,
+그래도 자리가 없거나 대기열이 MEMORY_BUDGET_MAX_WAITERS 를 넘으면 503 으로 거절한다.
+"""
+import functools
+import os
+import threading
+import time
+
+from flask import jsonify, make_response
+
+MB = 1024 * 1024
+MEMORY_BUDGET_BYTES = int(float(os.getenv('MEMORY_BUDGET_MB', '512')) * MB)
+MEMORY_BUDGET_WAIT_SECONDS = float(os.getenv('MEMORY_BUDGET_WAIT_SECONDS', '15'))
+MEMORY_BUDGET_MAX_WAITERS = int(os.getenv('MEMORY_BUDGET_MAX_WAITERS', '32'))
+# 결과 이미지 1장의 예상 크기 (FAL PNG 기준)
+RESULT_IMAGE_BYTES = int(float(os.getenv('RESULT_IMAGE_MB', '3')) * MB)
+
+BASE64_RATIO = 4 / 3
+
+
+class BudgetExceeded(RuntimeError):
+    """대기 시간 안에 예산을 확보하지 못함"""
+
+
+class ByteBudget:
+    """바이트 단위 세마포어 - acquire(n) 으로 예약하고 release(n) 으로 반환"""
+
+    def __init__(self, capacity, wait_seconds=MEMORY_BUDGET_WAIT_SECONDS, max_waiters=MEMORY_BUDGET_MAX_WAITERS):
+        self.capacity = capacity
+        self.wait_seconds = wait_seconds
+        self.max_waiters = max_waiters
+        self.reserved = 0
+        self.peak = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.shed = 0
+        self._condition = threading.Condition()
+
+    def acquire(self, nbytes, timeout=None):
+        """nbytes 예약 후 실제 예약량 반환 (예산보다 큰 요청은 예산 전체로 잘라 단독 실행)"""
+        nbytes = min(max(0, int(nbytes)), self.capacity)
+        deadline = time.time() + (self.wait_seconds if timeout is None else timeout)
+        with self._condition:
+            if self.reserved + nbytes > self.capacity and self.waiting >= self.max_waiters:
+                self.shed += 1
+                raise BudgetExceeded('메모리 예산 대기열이 가득 찼습니다.')
+            self.waiting += 1
+            try:
+                while self.reserved + nbytes > self.capacity:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        self.shed += 1
+                        raise BudgetExceeded(f'{self.wait_seconds:g}초 안에 메모리 예산을 확보하지 못했습니다.')
+                    self._condition.wait(remaining)
+            finally:
+                self.waiting -= 1
+            self.reserved += nbytes
+            self.peak = max(self.peak, self.reserved)
+            self.admitted += 1
+        return nbytes
+
+    def release(self, nbytes):
+        with self._condition:
+            self.reserved -= nbytes
+            self._condition.notify_all()
+
+    def snapshot(self):
+        with self._condition:
+            return {
+                'capacity_bytes': self.capacity,
+                'reserved_bytes': self.reserved,
+                'peak_bytes': self.peak,
+                'utilization': round(self.reserved / self.capacity, 3) if self.capacity else None,
+                'waiting': self.waiting,
+                'admitted': self.admitted,
+                'shed': self.shed
+            }
+
+
+budget = ByteBudget(MEMORY_BUDGET_BYTES)
+
+
+def upload_footprint(content_length):
+    """업로드 원본 + data URI(base64) 사본"""
+    return int((content_length or 0) * (1 + BASE64_RATIO))
+
+
+def result_footprint(image_count):
+    """결과 PNG 다운로드 + data URI 사본 + 저장소 업로드용 디코드 사본"""
+    return int(image_count * RESULT_IMAGE_BYTES * (2 + BASE64_RATIO))
+
+
+def limit(estimate):
+    """Flask 뷰 데코레이터 - estimate() 바이트를 예약한 뒤 실행하고, 확보하지 못하면 503
+
+    스트리밍 응답은 전송이 끝날 때 예약을 반환한다.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            try:
+                reserved = budget.acquire(estimate())
+            except BudgetExceeded as e:
+                print(f"⚠️ Request shed: {e} ({budget.reserved / MB:.0f}MB reserved)")
+                response = jsonify({'error': '요청이 많아 처리할 수 없습니다. 잠시 후 다시 시도해주세요.', 'code': 'overloaded'})
+                response.status_code = 503
+                response.headers['Retry-After'] = str(int(budget.wait_seconds) or 1)
+                return response
+
+            try:
+                response = make_response(view(*args, **kwargs))
+            except BaseException:
+                budget.release(reserved)
+                raise
+            if response.is_streamed:
+                response.call_on_close(lambda: budget.release(reserved))
+            else:
+                budget.release(reserved)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,127 @@
+"""렌더링된 HTML 페이지 캐시 + ETag / Cache-Control / 304 응답
+
+완료된 gallery 레코드는 (fan-out 추가 결과가 모두 들어온 뒤에는) 바뀌지 않으므로 /r/<id> 결과 페이지를
+한 번만 렌더링해 메모리에 두고, 레코드 내용으로 만든 ETag 로 조건부 요청에 304 를 돌려준다.
+
+요청마다 내용이 같은 정적 페이지(/, /result)는 시작 시 한 번 렌더링하고 gzip / brotli 로 미리 압축해 두었다가
+Accept-Encoding 에 맞는 본문을 그대로 돌려준다. (템플릿을 고치면 프로세스를 재시작해야 반영됨)
+"""
+import gzip
+import hashlib
+import json
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+from flask import Response, render_template
+
+try:
+    import brotli
+except ImportError:  # brotli 가 없으면 gzip / identity 만 제공
+    brotli = None
+
+import generation
+from cache import TTLCache
+
+RESULT_LIFETIME = timedelta(hours=24)
+# 생성 후 이 시간이 지난 레코드만 캐시 (fan-out 남은 작업이 gallery 를 갱신하는 동안은 매번 렌더링)
+RESULT_PAGE_SETTLE_SECONDS = int(os.getenv('RESULT_PAGE_SETTLE_SECONDS', str(int(generation.FANOUT_DEADLINE_SECONDS) + 120)))
+RESULT_PAGE_CACHE_BYTES = int(os.getenv('RESULT_PAGE_CACHE_BYTES', str(64 * 1024 * 1024)))
+
+# 같은 품질이면 앞쪽 인코딩 우선
+STATIC_ENCODINGS = ('br', 'gzip', 'identity')
+
+# gallery_id -> (etag, body, expires_at)
+_result_pages = TTLCache(ttl=RESULT_LIFETIME.total_seconds(), max_items=4096, max_bytes=RESULT_PAGE_CACHE_BYTES)
+
+
+def parse_created_at(gallery):
+    created_at = gallery.get('created_at')
+    if not created_at:
+        return None
+    return datetime.fromisoformat(created_at.replace('Z', '+00:00'))
+
+
+def expires_at(gallery):
+    """결과 만료 시각 (unix time, created_at 이 없으면 None)"""
+    created_at = parse_created_at(gallery)
+    return (created_at + RESULT_LIFETIME).timestamp() if created_at else None
+
+
+def is_settled(gallery):
+    """완료 후 더 이상 바뀌지 않는 레코드인지 (이미지 있음 + 생성 후 RESULT_PAGE_SETTLE_SECONDS 경과)"""
+    created_at = parse_created_at(gallery)
+    if not created_at or not (gallery.get('image_urls') or gallery.get('image_url')):
+        return False
+    return datetime.now(timezone.utc) - created_at > timedelta(seconds=RESULT_PAGE_SETTLE_SECONDS)
+
+
+def gallery_etag(gallery):
+    """레코드 내용 기반 ETag (내용이 바뀌면 달라짐)"""
+    raw = json.dumps(gallery, sort_keys=True, default=str).encode('utf-8')
+    return hashlib.sha1(raw).hexdigest()
+
+
+def html_response(request, body, etag, expires_at=None, cacheable=True):
+    """ETag 와 Cache-Control 을 붙인 HTML 응답 (If-None-Match 가 맞으면 304)"""
+    response = Response(body, mimetype='text/html')
+    response.set_etag(etag)
+    if cacheable and expires_at:
+        response.cache_control.public = True
+        response.cache_control.max_age = max(0, int(expires_at - time.time()))
+    else:
+        response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+
+def get_result_page(gallery_id):
+    """캐시된 결과 페이지 (etag, body, expires_at) - 없거나 만료되면 None"""
+    entry = _result_pages.get(gallery_id)
+    if entry and entry[2] > time.time():
+        return entry
+    return None
+
+
+def put_result_page(gallery_id, etag, body, expires_at):
+    ttl = expires_at - time.time()
+    if ttl > 0:
+        _result_pages.set(gallery_id, (etag, body, expires_at), size=len(body), ttl=ttl)
+
+
+def invalidate_result_page(gallery_id):
+    _result_pages.pop(gallery_id)
+
+
+class StaticPage:
+    """미리 렌더링한 정적 페이지 - 인코딩별 본문과 ETag"""
+
+    def __init__(self, body):
+        raw = body.encode('utf-8')
+        self.etag = hashlib.sha1(raw).hexdigest()
+        self.bodies = {'identity': raw, 'gzip': gzip.compress(raw, compresslevel=9, mtime=0)}
+        if brotli:
+            self.bodies['br'] = brotli.compress(raw, mode=brotli.MODE_TEXT, quality=11)
+
+    def sizes(self):
+        return {encoding: len(body) for encoding, body in self.bodies.items()}
+
+
+def prerender(app, template, **context):
+    """템플릿을 요청 없이 한 번 렌더링해 StaticPage 로 반환"""
+    with app.test_request_context('/'):
+        return StaticPage(render_template(template, **context))
+
+
+def static_response(request, page):
+    """Accept-Encoding 에 맞는 미리 압축된 본문으로 응답 (If-None-Match 가 맞으면 304)"""
+    offered = [encoding for encoding in STATIC_ENCODINGS if encoding in page.bodies]
+    encoding = request.accept_encodings.best_match(offered, default='identity')
+
+    response = Response(page.bodies[encoding], mimetype='text/html')
+    if encoding != 'identity':
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    # 인코딩마다 바이트가 다르므로 strong ETag 도 인코딩별로 구분
+    response.set_etag(page.etag if encoding == 'identity' else f"{page.etag}-{encoding}")
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
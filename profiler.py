@@ -0,0 +1,243 @@
+"""요청 단위 샘플링 프로파일러 (opt-in)
+
+- PROFILE_TOKEN 을 설정하고 요청에 X-Profile-Token 헤더를 보내거나
+- PROFILE_SAMPLE_RATE (0~1) 비율로 무작위 요청을
+요청 스레드의 스택을 PROFILE_INTERVAL_MS 간격으로 샘플링해 collapsed stack(.collapsed) 과
+speedscope(.speedscope.json) 파일로 남긴다. wall 프로파일에는 FAL 대기 같은 I/O 시간도 포함되고,
+cpu 프로파일에는 샘플 사이에 스레드 CPU 시간이 실제로 증가한 샘플만 들어간다.
+
+둘 다 설정하지 않으면 init_app() 이 훅과 라우트를 등록하지 않으므로 오버헤드가 없다.
+/_profiles (X-Profile-Token 필요) 에서 최근 프로파일 목록과 파일을 받을 수 있다.
+"""
+import hmac
+import json
+import os
+import random
+import re
+import secrets
+import sys
+import tempfile
+import threading
+import time
+
+PROFILE_TOKEN = os.getenv('PROFILE_TOKEN')
+PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', '0'))
+PROFILE_INTERVAL_MS = float(os.getenv('PROFILE_INTERVAL_MS', '5'))
+PROFILE_DIR = os.getenv('PROFILE_DIR', os.path.join(tempfile.gettempdir(), 'ai4cut-profiles'))
+PROFILE_KEEP = int(os.getenv('PROFILE_KEEP', '50'))
+PROFILE_HEADER = 'X-Profile-Token'
+
+SPEEDSCOPE_SCHEMA = 'https://www.speedscope.app/file-format-schema.json'
+
+
+def is_enabled():
+    return bool(PROFILE_TOKEN) or PROFILE_SAMPLE_RATE > 0
+
+
+def _thread_cpu_clock(thread_id):
+    """다른 스레드의 CPU 시간 시계 (Linux 등 pthread_getcpuclockid 지원 시, 아니면 None)"""
+    try:
+        return time.pthread_getcpuclockid(thread_id)
+    except (AttributeError, OSError):
+        return None
+
+
+class Sampler:
+    """대상 스레드의 스택을 백그라운드 스레드에서 주기적으로 샘플링"""
+
+    def __init__(self, thread_id, interval=PROFILE_INTERVAL_MS / 1000):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = []  # (스택 튜플 root -> leaf, wall 초, cpu 초 또는 None)
+        self._stop = threading.Event()
+        self._clock = _thread_cpu_clock(thread_id)
+        self._thread = threading.Thread(target=self._run, name='profiler', daemon=True)
+        self.started_at = None
+        self.duration = 0.0
+
+    def start(self):
+        self.started_at = time.perf_counter()
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if not self._stop.is_set():
+            self._stop.set()
+            self._thread.join()
+            self.duration = time.perf_counter() - self.started_at
+
+    def _cpu_time(self):
+        try:
+            return time.clock_gettime(self._clock) if self._clock is not None else None
+        except OSError:
+            return None
+
+    def _run(self):
+        last_wall, last_cpu = time.perf_counter(), self._cpu_time()
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                break
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append((code.co_name, code.co_filename, frame.f_lineno))
+                frame = frame.f_back
+            now_wall, now_cpu = time.perf_counter(), self._cpu_time()
+            cpu = now_cpu - last_cpu if now_cpu is not None and last_cpu is not None else None
+            self.samples.append((tuple(reversed(stack)), now_wall - last_wall, cpu))
+            last_wall, last_cpu = now_wall, now_cpu
+
+
+def _frame_name(frame):
+    name, filename, _ = frame
+    return f"{name} ({os.path.relpath(filename) if not filename.startswith('<') else filename})"
+
+
+def to_collapsed(samples):
+    """collapsed stack 형식 ('a;b;c <샘플 수>' 한 줄씩, flamegraph.pl / speedscope 호환)"""
+    counts = {}
+    for stack, _, _ in samples:
+        key = ';'.join(_frame_name(frame) for frame in stack)
+        counts[key] = counts.get(key, 0) + 1
+    return ''.join(f"{stack} {count}\n" for stack, count in sorted(counts.items()))
+
+
+def to_speedscope(samples, name):
+    """speedscope 'sampled' 형식 - wall / cpu 프로파일 2개 (ms 단위 가중치)"""
+    frames, frame_index = [], {}
+    wall_samples, wall_weights, cpu_samples, cpu_weights = [], [], [], []
+    for stack, wall, cpu in samples:
+        indexes = []
+        for frame in stack:
+            key = (frame[0], frame[1])
+            if key not in frame_index:
+                frame_index[key] = len(frames)
+                frames.append({'name': frame[0], 'file': frame[1], 'line': frame[2]})
+            indexes.append(frame_index[key])
+        wall_samples.append(indexes)
+        wall_weights.append(round(wall * 1000, 3))
+        if cpu:
+            cpu_samples.append(indexes)
+            cpu_weights.append(round(cpu * 1000, 3))
+
+    def profile(kind, profile_samples, weights):
+        return {
+            'type': 'sampled', 'name': f"{name} ({kind})", 'unit': 'milliseconds',
+            'startValue': 0, 'endValue': round(sum(weights), 3),
+            'samples': profile_samples, 'weights': weights
+        }
+
+    return {
+        '$schema': SPEEDSCOPE_SCHEMA,
+        'name': name,
+        'exporter': 'ai4cut-profiler',
+        'shared': {'frames': frames},
+        'profiles': [profile('wall', wall_samples, wall_weights), profile('cpu', cpu_samples, cpu_weights)]
+    }
+
+
+def write_profile(sampler, method, path, directory=PROFILE_DIR):
+    """프로파일 파일 저장 후 프로파일 ID 반환 (최근 PROFILE_KEEP 개만 유지)"""
+    os.makedirs(directory, exist_ok=True)
+    slug = re.sub(r'[^A-Za-z0-9]+', '-', path).strip('-') or 'root'
+    profile_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{method.lower()}-{slug[:40]}-{secrets.token_hex(3)}"
+    name = f"{method} {path}"
+
+    with open(os.path.join(directory, f"{profile_id}.collapsed"), 'w') as f:
+        f.write(to_collapsed(sampler.samples))
+    with open(os.path.join(directory, f"{profile_id}.speedscope.json"), 'w') as f:
+        json.dump(to_speedscope(sampler.samples, name), f)
+    with open(os.path.join(directory, f"{profile_id}.meta.json"), 'w') as f:
+        json.dump({
+            'id': profile_id,
+            'method': method,
+            'path': path,
+            'duration_ms': round(sampler.duration * 1000, 1),
+            'samples': len(sampler.samples),
+            'cpu_ms': round(sum(cpu or 0 for _, _, cpu in sampler.samples) * 1000, 1),
+            'created_at': time.time()
+        }, f)
+
+    _prune(directory)
+    return profile_id
+
+
+def _prune(directory):
+    metas = sorted(name for name in os.listdir(directory) if name.endswith('.meta.json'))
+    for meta in metas[:-PROFILE_KEEP] if len(metas) > PROFILE_KEEP else []:
+        profile_id = meta[:-len('.meta.json')]
+        for suffix in ('.collapsed', '.speedscope.json', '.meta.json'):
+            try:
+                os.remove(os.path.join(directory, profile_id + suffix))
+            except FileNotFoundError:
+                pass
+
+
+def list_profiles(directory=PROFILE_DIR):
+    """최근 프로파일 메타데이터 목록 (최신순)"""
+    if not os.path.isdir(directory):
+        return []
+    profiles = []
+    for name in sorted(os.listdir(directory), reverse=True):
+        if name.endswith('.meta.json'):
+            with open(os.path.join(directory, name)) as f:
+                profiles.append(json.load(f))
+    return profiles
+
+
+def _has_token(request):
+    token = request.headers.get(PROFILE_HEADER) or request.args.get('profile_token')
+    return bool(PROFILE_TOKEN and token and hmac.compare_digest(token, PROFILE_TOKEN))
+
+
+def init_app(app):
+    """프로파일링 훅과 /_profiles 라우트 등록 (비활성화 시 아무것도 등록하지 않음)"""
+    if not is_enabled():
+        return
+
+    from flask import g, jsonify, request, send_from_directory, abort
+
+    @app.before_request
+    def start_profiling():
+        if request.path.startswith('/_profiles') or request.path.startswith('/static'):
+            return
+        if _has_token(request) or (PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE):
+            g.profiler = Sampler(threading.get_ident()).start()
+
+    @app.after_request
+    def finish_profiling(response):
+        sampler = g.pop('profiler', None)
+        if sampler:
+            sampler.stop()
+            try:
+                profile_id = write_profile(sampler, request.method, request.path)
+                response.headers['X-Profile-Id'] = profile_id
+                print(f"🔬 Profile written: {profile_id} ({len(sampler.samples)} samples, {sampler.duration * 1000:.0f}ms)")
+            except OSError as e:
+                print(f"⚠️ Profile write failed: {e}")
+        return response
+
+    @app.teardown_request
+    def stop_profiling(exc):
+        sampler = g.pop('profiler', None)
+        if sampler:
+            sampler.stop()
+
+    @app.route('/_profiles')
+    def profile_index():
+        """최근 프로파일 목록 (X-Profile-Token 필요)"""
+        if not _has_token(request):
+            abort(404)
+        return jsonify({'profiles': [dict(meta, files={
+            'collapsed': f"/_profiles/{meta['id']}.collapsed",
+            'speedscope': f"/_profiles/{meta['id']}.speedscope.json"
+        }) for meta in list_profiles()]})
+
+    @app.route('/_profiles/<path:filename>')
+    def profile_file(filename):
+        if not _has_token(request) or not filename.endswith(('.collapsed', '.speedscope.json')):
+            abort(404)
+        return send_from_directory(PROFILE_DIR, filename, as_attachment=True)
+
+    print(f"🔬 Request profiler enabled (sample rate {PROFILE_SAMPLE_RATE}, dir {PROFILE_DIR})")
@@ -0,0 +1,115 @@
+"""FAL 생성 프롬프트 - 웹(app.py, api/index.py) 과 대량 생성 CLI(bulk.py) 공용
+
+Flask 앱이나 저장소 클라이언트에 의존하지 않으므로 CLI 가 앱 전체를 import 하지 않아도 된다.
+"""
+from datetime import datetime
+
+import compositor
+
+
+# 색상 모드/스타일/듀오/보정 지시문 (4컷 프롬프트와 합성 모드 컷 프롬프트 공용)
+def get_person_instructions(color_mode='color', style='default', is_duo=False):
+    # 색상 모드 설정
+    color_mode_instructions = {
+        'bw': "All photos must be in BLACK AND WHITE (grayscale/monochrome). No color in the photos.",
+        'cool': "Apply COOL TONE styling: The person's skin should have a fair, pinkish-rosy undertone typical of cool skin tones. Add subtle blue-ish tint to the overall image. Skin looks best with silver/blue-based tones.",
+        'warm': "Apply SUBTLE WARM TONE styling: Add a very gentle, natural warm glow. Slightly enhance skin's healthy peachy-pink tones. Keep skin looking natural and healthy, NOT yellow or orange. Just a hint of warmth.",
+        'color': ""
+    }
+    color_instruction = color_mode_instructions.get(color_mode, "")
+
+    # 스타일 설정
+    style_instructions = {
+        'default': "",
+        'animation': "IMPORTANT STYLE: Transform the person into 2D ANIME/ANIMATION style artwork. Convert to Japanese anime art style with cel-shading, big expressive eyes, and stylized features typical of anime characters.",
+        'realistic': "IMPORTANT STYLE: If the input image is an animated character or non-real person, transform them into REALISTIC PHOTOREALISTIC style. Make them look like a real human cosplaying the character, with realistic skin texture, lighting, and human features. If the character's nationality is not clearly identifiable, default to Korean person appearance.",
+        'disney': "IMPORTANT STYLE: Transform the person into DISNEY/PIXAR 3D animation style. Apply the characteristic Disney look with big expressive eyes, smooth skin, stylized proportions, and the magical quality typical of Disney and Pixar animated movies.",
+        'ghibli': "IMPORTANT STYLE: Apply STUDIO GHIBLI art style to the person. Convert to 2D hand-drawn animation style like Ghibli films. Keep the same person, pose and expression but render in Ghibli's distinctive drawing style with soft lines and gentle colors.",
+        'baby': "IMPORTANT STYLE: Apply CHILD transformation filter. Transform the person to look like a young child version of themselves (age 5-6 years old). Keep the same facial features and identity but make them look like an adorable child with rounder cheeks, bigger eyes relative to face, softer skin, and childlike proportions. Similar to Snapchat baby filter effect.",
+        'old': "IMPORTANT STYLE: Apply AGING transformation filter. Transform the person to look like a middle-aged to older version of themselves (age 50-60 years old). Keep the same facial features and identity but add subtle aging effects: some wrinkles, slight graying hair, and mature facial features. Similar to Snapchat old age filter effect.",
+        'studio': "IMPORTANT STYLE: Place the person in a clean, professional STUDIO SETTING. Use a simple, clean background (white, light gray, or soft gradient). Apply professional studio lighting with soft shadows. The photo should look like it was taken in a professional photo studio with proper lighting setup.",
+        'iphone': "IMPORTANT STYLE: Make the photo look like a casual SNAPSHOT taken with an old iPhone. Apply slight motion blur for a candid feel. No clear composition or framing - looks spontaneous and unplanned. Add soft ambient lighting with light diffusion/bloom effect. The photo should feel like an authentic, unposed moment captured casually."
+    }
+    style_instruction = style_instructions.get(style, "")
+
+    # 듀오 모드 (두 명) 프롬프트
+    duo_instruction = ""
+    if is_duo:
+        duo_instruction = "IMPORTANT: Two images are provided. First, determine if they are the SAME person or TWO DIFFERENT people. If SAME PERSON: use both images as reference for that one person's appearance from different angles, generate photos of that SINGLE person only. If TWO DIFFERENT PEOPLE: generate photos featuring BOTH people together naturally in each frame as friends, couple, or companions interacting with each other."
+
+    # 실제 인물 미묘한 보정
+    beauty_instruction = "SUBTLE ENHANCEMENT: If the input is a real person, apply very subtle and unnoticeable facial enhancement. The enhancement should be imperceptible: slightly improved skin clarity and natural glow, very slightly refined facial contour/jawline, and subtly enlarged eyes. All changes must be extremely subtle and NOT obvious or detectable."
+
+    return style_instruction, color_instruction, duo_instruction, beauty_instruction
+
+
+# 합성 모드용 개별 인물 컷 프롬프트 (프레임/로고/날짜/QR 은 compositor 가 로컬에서 그림)
+def get_portrait_cut_prompt(layout='1x4', color_mode='color', style='default', is_duo=False):
+    style_instruction, color_instruction, duo_instruction, beauty_instruction = get_person_instructions(color_mode, style, is_duo)
+    aspect_ratio = compositor.cut_aspect_ratio(layout)
+
+    return f"""Create a single photo-booth portrait photo with {aspect_ratio} aspect ratio.
+{duo_instruction}
+Each generated image must be a different natural pose and expression, like consecutive shots in a photo booth.
+{style_instruction}
+{color_instruction}
+{beauty_instruction}
+Fill the entire image with the photo. No frame, no border, no text, no logo, no QR code."""
+
+
+# AI4컷 생성 프롬프트 생성 함수 (날짜, 프레임 색상, 레이아웃, 색상모드, 스타일, 듀오 모드 동적 생성)
+def get_ai_4_cut_prompt(frame_color='black', layout='1x4', color_mode='color', style='default', is_duo=False):
+    current_date = datetime.now().strftime('%Y.%m.%d')
+
+    # 프레임 색상 (hex 코드 또는 기본 색상 이름)
+    if frame_color.startswith('#'):
+        frame_instruction = f"color {frame_color}"
+    else:
+        color_map = {
+            'black': 'color #000000',
+            'gray': 'color #808080',
+            'white': 'color #FFFFFF'
+        }
+        frame_instruction = color_map.get(frame_color, 'color #000000')
+
+    # 레이아웃별 프롬프트 생성
+    if layout == '1x1':
+        layout_instruction = "IMPORTANT: Single large image layout (1x1). One big portrait photo taking up most of the frame."
+        layout_structure = "[narrow top margin] → [large single image] → [bottom section with logo, date, QR]."
+        image_count_text = "1 image"
+        aspect_ratio = "3:4 aspect ratio (portrait orientation)"
+        frame_size = "2120x3187 pixels"
+    elif layout == '1x3':
+        layout_instruction = "IMPORTANT: 3 images arranged in SINGLE COLUMN vertically (1x3 layout). NOT 2x2, NOT any other layout. Only vertical single column with 3 images."
+        layout_structure = "[narrow top margin] → [image 1] → [image 2] → [image 3] → [bottom section with logo, date, QR]."
+        image_count_text = "3 images"
+        aspect_ratio = "1:1 aspect ratio (square)"
+        frame_size = "1060x3187 pixels"
+    elif layout == '2x2':
+        layout_instruction = "IMPORTANT: 4 images arranged in 2x2 grid layout. Two images in first row, two images in second row."
+        layout_structure = "[narrow top margin] → [Row 1: image 1 | image 2] → [Row 2: image 3 | image 4] → [bottom section with logo, date, QR]."
+        image_count_text = "4 images"
+        aspect_ratio = "3:4 aspect ratio (portrait orientation)"
+        frame_size = "2120x3187 pixels"
+    else:  # 1x4 (default)
+        layout_instruction = "IMPORTANT: 4 images arranged in SINGLE COLUMN vertically (1x4 layout). NOT 2x2, NOT 2x3, NOT 2x4. Only vertical single column layout."
+        layout_structure = "[narrow top margin] → [image 1] → [image 2] → [image 3] → [image 4] → [bottom section with logo, date, QR]."
+        image_count_text = "4 images"
+        aspect_ratio = "4:3 aspect ratio"
+        frame_size = "1060x3187 pixels"
+
+    style_instruction, color_instruction, duo_instruction, beauty_instruction = get_person_instructions(color_mode, style, is_duo)
+
+    return f"""Create an AI-4-cut photo strip. Full frame size {frame_size}.
+{layout_instruction}
+{duo_instruction}
+{image_count_text}, each with {aspect_ratio} with different natural poses and expressions.
+{style_instruction}
+{color_instruction}
+{beauty_instruction}
+All frame with {frame_instruction}. No text on top of frame. Top margin should be narrow, similar to side margins, with images positioned accordingly.
+Layout structure: {layout_structure}
+At the bottom of the frame, add 'MIRAI' (use logo.png) and '{current_date}' in vertical center alignment.
+Date should be 10% of logo size, small. Do not include 'AI4컷' text.
+QR code should be inserted small and naturally at the bottom right corner of the frame (to the right of the date),
+half the size of the logo, as small as possible while maintaining QR functionality."""
@@ -0,0 +1,218 @@
+"""이미지 생성 프로바이더 (FAL, Gemini) 와 지연시간 기반 라우터
+
+모든 프로바이더는 generate(arguments) -> [data URI, ...] 인터페이스를 가진다.
+arguments 는 FAL nano-banana-pro/edit 형식 ({"prompt", "image_urls", "num_images", ...}) 을 공통으로 사용한다.
+ProviderRouter 는 프로바이더별 최근 지연시간 p50/p95 와 에러율을 추적해 가장 빠른 정상 프로바이더로
+보내고, 실패하면 다음 프로바이더로 자동 전환한다.
+"""
+import base64
+import os
+import threading
+import time
+from collections import deque
+
+import requests
+
+import fal_keys
+import generation
+
+GEMINI_API_KEY = os.getenv('GEMINI_API_KEY') or os.getenv('GOOGLE_API_KEY')
+GEMINI_MODEL = os.getenv('GEMINI_IMAGE_MODEL', 'gemini-2.5-flash-image')
+# 사용할 프로바이더 순서 (쉼표 구분, 기본: fal, gemini 키가 있으면 gemini 추가)
+GENERATION_PROVIDERS = os.getenv('GENERATION_PROVIDERS')
+
+ROUTER_WINDOW = int(os.getenv('ROUTER_WINDOW', '50'))
+ROUTER_MAX_ERROR_RATE = float(os.getenv('ROUTER_MAX_ERROR_RATE', '0.5'))
+ROUTER_COOLDOWN_SECONDS = float(os.getenv('ROUTER_COOLDOWN_SECONDS', '60'))
+
+
+class FalProvider:
+    """FAL nano-banana-pro/edit (큐 제출 후 결과 대기, 키 풀에서 가장 한가한 키 사용)"""
+
+    name = 'fal'
+
+    def __init__(self, application=generation.FAL_MODEL, key_pool=None):
+        self.application = application
+        self.key_pool = key_pool
+
+    def generate(self, arguments, cancel_event=None):
+        key_pool = self.key_pool or fal_keys.get_pool()
+        return key_pool.run(lambda client: generation.run_fal_job(arguments, self.application, client, cancel_event))
+
+
+class GeminiProvider:
+    """Gemini 이미지 생성 (google-genai, 이미지 1장당 generate_content 1회)"""
+
+    name = 'gemini'
+
+    def __init__(self, api_key=GEMINI_API_KEY, model=GEMINI_MODEL):
+        from google import genai
+        from google.genai import types
+        self.client = genai.Client(api_key=api_key)
+        self.types = types
+        self.model = model
+
+    def _image_part(self, image_url):
+        if image_url.startswith('data:'):
+            header, data = image_url.split(',', 1)
+            mime_type = header[5:].split(';')[0]
+            return self.types.Part.from_bytes(data=base64.b64decode(data), mime_type=mime_type)
+        response = requests.get(image_url, timeout=30)
+        response.raise_for_status()
+        return self.types.Part.from_bytes(data=response.content, mime_type=response.headers.get('content-type', 'image/png'))
+
+    def generate(self, arguments, cancel_event=None):
+        parts = [self._image_part(url) for url in arguments.get('image_urls', [])]
+        parts.append(self.types.Part.from_text(text=arguments['prompt']))
+        config = self.types.GenerateContentConfig(response_modalities=['IMAGE'])
+
+        result_data_uris = []
+        for _ in range(arguments.get('num_images', 1)):
+            if cancel_event is not None and cancel_event.is_set():
+                raise generation.JobCancelled(self.name)
+            response = self.client.models.generate_content(model=self.model, contents=parts, config=config)
+            for candidate in response.candidates or []:
+                for part in (candidate.content.parts if candidate.content else None) or []:
+                    if part.inline_data and part.inline_data.data:
+                        encoded = base64.b64encode(part.inline_data.data).decode('utf-8')
+                        result_data_uris.append(f"data:{part.inline_data.mime_type or 'image/png'};base64,{encoded}")
+        return result_data_uris
+
+
+class LocalProvider:
+    """테스트/개발용 로컬 대역 프로바이더 - 지연시간과 실패를 흉내내고 입력 첫 이미지를 그대로 돌려줌"""
+
+    def __init__(self, name='local', latency=0.0, fail=False, image_data_uri=None):
+        self.name = name
+        self.latency = latency
+        self.fail = fail
+        self.image_data_uri = image_data_uri
+        self.calls = 0
+
+    def generate(self, arguments, cancel_event=None):
+        self.calls += 1
+        time.sleep(self.latency() if callable(self.latency) else self.latency)
+        if cancel_event is not None and cancel_event.is_set():
+            raise generation.JobCancelled(self.name)
+        if self.fail() if callable(self.fail) else self.fail:
+            raise RuntimeError(f"{self.name} provider failed")
+        image = self.image_data_uri or (arguments.get('image_urls') or ['data:image/png;base64,'])[0]
+        return [image] * arguments.get('num_images', 1)
+
+
+def _percentile(values, percent):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(percent / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class ProviderStats:
+    """프로바이더별 최근 N회 지연시간/성공 여부 (rolling window)"""
+
+    def __init__(self, window=ROUTER_WINDOW):
+        self.samples = deque(maxlen=window)  # (latency_seconds, ok)
+        self.cooldown_until = 0.0
+
+    def record(self, latency, ok):
+        self.samples.append((latency, ok))
+
+    @property
+    def error_rate(self):
+        if not self.samples:
+            return 0.0
+        return sum(1 for _, ok in self.samples if not ok) / len(self.samples)
+
+    def latency(self, percent):
+        latencies = [latency for latency, ok in self.samples if ok]
+        return _percentile(latencies, percent) if latencies else None
+
+    def snapshot(self):
+        p50, p95 = self.latency(50), self.latency(95)
+        return {
+            'samples': len(self.samples),
+            'p50_ms': round(p50 * 1000) if p50 is not None else None,
+            'p95_ms': round(p95 * 1000) if p95 is not None else None,
+            'error_rate': round(self.error_rate, 3),
+            'cooling_down': self.cooldown_until > time.time()
+        }
+
+
+class ProviderRouter:
+    """가장 빠른 정상 프로바이더 우선, 실패 시 다음 프로바이더로 자동 전환"""
+
+    def __init__(self, providers, window=ROUTER_WINDOW, max_error_rate=ROUTER_MAX_ERROR_RATE,
+                 cooldown_seconds=ROUTER_COOLDOWN_SECONDS):
+        self.providers = list(providers)
+        self.max_error_rate = max_error_rate
+        self.cooldown_seconds = cooldown_seconds
+        self.stats = {provider.name: ProviderStats(window) for provider in self.providers}
+        self._lock = threading.Lock()
+
+    def ranked(self):
+        """정상 프로바이더를 p50 오름차순으로 (샘플 없는 프로바이더는 먼저 시도), 비정상은 뒤로"""
+        now = time.time()
+        with self._lock:
+            def sort_key(item):
+                index, provider = item
+                stats = self.stats[provider.name]
+                healthy = stats.cooldown_until <= now
+                p50 = stats.latency(50)
+                return (not healthy, p50 if p50 is not None else 0.0, index)
+            return [provider for _, provider in sorted(enumerate(self.providers), key=sort_key)]
+
+    def _record(self, provider, latency, ok):
+        with self._lock:
+            stats = self.stats[provider.name]
+            stats.record(latency, ok)
+            if not ok and len(stats.samples) >= 3 and stats.error_rate >= self.max_error_rate:
+                stats.cooldown_until = time.time() + self.cooldown_seconds
+                print(f"⚠️ Provider {provider.name} cooling down ({stats.error_rate:.0%} errors)")
+
+    def generate(self, arguments, cancel_event=None):
+        """(결과 data URI 목록, 사용한 프로바이더 이름) 반환 - 모두 실패하면 마지막 에러 발생
+
+        cancel_event 가 set 되면 (fan-out 마감) 진행 중인 작업을 취소하고 다음 프로바이더로 넘어가지 않음
+        """
+        last_error = None
+        for provider in self.ranked():
+            if cancel_event is not None and cancel_event.is_set():
+                raise generation.JobCancelled(provider.name)
+            started = time.perf_counter()
+            try:
+                result = provider.generate(arguments, cancel_event)
+                if not result:
+                    raise RuntimeError(f"{provider.name} returned no images")
+            except generation.JobCancelled:
+                raise
+            except Exception as e:
+                self._record(provider, time.perf_counter() - started, False)
+                print(f"❌ Provider {provider.name} failed, trying next: {e}")
+                last_error = e
+                continue
+            self._record(provider, time.perf_counter() - started, True)
+            return result, provider.name
+        raise last_error or RuntimeError('No generation provider available')
+
+    def snapshot(self):
+        with self._lock:
+            return {name: stats.snapshot() for name, stats in self.stats.items()}
+
+
+def create_router():
+    """환경변수에 따라 프로바이더 라우터 생성"""
+    names = [name.strip() for name in GENERATION_PROVIDERS.split(',')] if GENERATION_PROVIDERS else \
+        ['fal'] + (['gemini'] if GEMINI_API_KEY else [])
+
+    providers = []
+    for name in names:
+        if name == 'fal':
+            providers.append(FalProvider())
+        elif name == 'gemini':
+            try:
+                providers.append(GeminiProvider())
+            except Exception as e:
+                print(f"⚠️ Gemini provider unavailable: {e}")
+        elif name == 'local':
+            providers.append(LocalProvider())
+    print(f"✅ Generation providers: {[provider.name for provider in providers]}")
+    return ProviderRouter(providers)
@@ -0,0 +1,93 @@
+"""완성된 결과 이미지의 색감(bw, cool, warm)을 NumPy 로 후처리 - FAL 재생성 없이 톤만 변경
+
+톤은 채널 행렬(3x3) 과 채널별 톤 커브(256 LUT) 로 정의한다.
+- 행렬의 세 행이 같으면 (흑백) 정수 가중합으로 한 채널만 계산하고 LUT 1개 적용
+- 행렬이 대각이면 채널 게인을 LUT 에 합쳐 채널별 LUT 3개만 적용
+- 그 외에는 float32 행렬곱 후 LUT 적용
+"""
+import functools
+
+import numpy as np
+from PIL import Image
+
+# ITU-R BT.601 휘도 가중치
+LUMA_WEIGHTS = (0.299, 0.587, 0.114)
+
+
+def _gamma_curve(gamma):
+    return 255.0 * (np.arange(256) / 255.0) ** gamma
+
+
+def _contrast_curve(amount):
+    """중간톤 기준 S 커브 (amount 0 이면 항등)"""
+    x = np.arange(256) / 255.0
+    s_curve = x * x * (3 - 2 * x)
+    return 255.0 * ((1 - amount) * x + amount * s_curve)
+
+
+# 톤별 (채널 행렬, 채널별 커브 R/G/B) - get_person_instructions() 의 bw/cool/warm 설명과 같은 방향
+TONES = {
+    'bw': (
+        np.array([LUMA_WEIGHTS] * 3),
+        [_contrast_curve(0.35)] * 3
+    ),
+    'cool': (
+        np.diag([0.94, 1.0, 1.08]),
+        [_gamma_curve(1.06), _gamma_curve(1.0), _gamma_curve(0.92)]
+    ),
+    'warm': (
+        np.diag([1.08, 1.02, 0.90]),
+        [_gamma_curve(0.94), _gamma_curve(0.98), _gamma_curve(1.08)]
+    ),
+}
+
+
+def _to_lut(curve):
+    return np.clip(np.round(curve), 0, 255).astype(np.uint8)
+
+
+@functools.lru_cache(maxsize=None)
+def _compiled_tone(tone):
+    """톤을 적용 방식과 LUT 로 변환 (톤별 1회)"""
+    matrix, curves = TONES[tone]
+    if np.allclose(matrix, matrix[0]):
+        weights = np.round(np.asarray(matrix[0]) * 256).astype(np.uint16)
+        return 'gray', weights, _to_lut(curves[0])
+    if np.allclose(matrix, np.diag(np.diag(matrix))):
+        # 게인을 커브 입력에 합침: out = curve(clip(gain * x))
+        luts = []
+        for channel, gain in enumerate(np.diag(matrix)):
+            index = np.clip(np.round(np.arange(256) * gain), 0, 255).astype(np.intp)
+            luts.append(_to_lut(curves[channel][index]))
+        return 'lut', None, np.stack(luts)
+    return 'matrix', matrix.astype(np.float32), np.stack([_to_lut(curve) for curve in curves])
+
+
+def apply_tone_array(pixels, tone):
+    """RGB uint8 배열 (H, W, 3) 에 톤 적용"""
+    if tone not in TONES:
+        raise ValueError(f'지원하지 않는 톤입니다: {tone}')
+    mode, params, luts = _compiled_tone(tone)
+
+    if mode == 'gray':
+        gray = pixels[..., 0] * params[0]
+        gray += pixels[..., 1] * params[1]
+        gray += pixels[..., 2] * params[2]
+        gray >>= 8
+        return np.repeat(luts[gray][..., None], 3, axis=2)
+
+    if mode == 'matrix':
+        mixed = pixels.reshape(-1, 3).astype(np.float32) @ params.T
+        np.clip(mixed, 0, 255, out=mixed)
+        pixels = mixed.astype(np.uint8).reshape(pixels.shape)
+
+    result = np.empty_like(pixels)
+    for channel in range(3):
+        result[..., channel] = luts[channel][pixels[..., channel]]
+    return result
+
+
+def apply_tone(image, tone):
+    """PIL 이미지에 톤 적용 (RGB 이미지 반환)"""
+    pixels = np.asarray(image.convert('RGB'))
+    return Image.fromarray(apply_tone_array(pixels, tone), 'RGB')
@@ -0,0 +1,41 @@
+"""업로드 스테이징 - 사진을 한 번만 받아 인코딩 결과를 TTL 캐시에 보관하고 짧은 토큰으로 재사용
+
+generate 요청은 사진 대신 upload_token 만 보내므로 재시도/재생성 시 옵션 bytes 만 전송된다.
+(클라이언트는 토큰과 만료 시각을 sessionStorage 의 ai4cut_upload 에 보관해 "한번 더 하기" 에서 재사용)
+토큰은 이 프로세스 메모리에만 있으므로 다른 인스턴스로 간 generate 는 410 upload_expired 를 받고,
+클라이언트는 같은 요청에 사진을 직접 첨부해 다시 보낸다.
+"""
+import os
+import secrets
+
+import fal_client
+
+import generation
+from cache import TTLCache
+
+STAGING_TTL_SECONDS = int(os.getenv('STAGING_TTL_SECONDS', '1800'))
+STAGING_MAX_BYTES = int(os.getenv('STAGING_MAX_BYTES', str(200 * 1024 * 1024)))
+# 1이면 FAL CDN 에 업로드하고 URL 만 보관 (FAL 요청 본문이 작아지고 캐시 메모리도 절약)
+STAGING_UPLOAD_TO_FAL = os.getenv('STAGING_UPLOAD_TO_FAL') == '1'
+
+_staged_uploads = TTLCache(ttl=STAGING_TTL_SECONDS, max_items=2048, max_bytes=STAGING_MAX_BYTES)
+
+
+def stage_images(image_data_list):
+    """업로드 이미지를 FAL 입력 형식(data URI 또는 FAL URL)으로 변환해 보관하고 토큰 반환"""
+    if STAGING_UPLOAD_TO_FAL:
+        image_uris = [fal_client.upload(data, generation.detect_mime_type(data)) for data in image_data_list]
+    else:
+        image_uris = [generation.encode_image_data_uri(data) for data in image_data_list]
+
+    token = secrets.token_urlsafe(16)
+    _staged_uploads.set(token, image_uris, size=sum(len(uri) for uri in image_uris))
+    print(f"✅ Upload staged: {len(image_uris)} images ({_staged_uploads.total_bytes} bytes cached)")
+    return token
+
+
+def get_staged_images(token):
+    """토큰으로 스테이징된 입력 이미지 목록 조회 (만료/없음 시 None)"""
+    if not token:
+        return None
+    return _staged_uploads.get(token)
@@ -0,0 +1,300 @@
+"""결과 저장소 백엔드 (gallery 레코드, 결과 이미지, 생성 통계)
+
+- SupabaseStorage: Supabase Storage 'ai4cut-images' 버킷 + gallery / generations 테이블
+- LocalStorage: 로컬 디렉터리 + SQLite (셀프 호스팅용, 이미지는 앱의 /media/<filename> 으로 서빙)
+
+STORAGE_BACKEND=supabase|local 로 선택 (미지정 시 Supabase 자격증명이 있으면 supabase)
+"""
+import json
+import os
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from circuit_breaker import CircuitBreaker
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+SUPABASE_URL = os.getenv('SUPABASE_URL')
+SUPABASE_KEY = os.getenv('SUPABASE_SERVICE_ROLE_KEY') or os.getenv('SUPABASE_KEY')
+SUPABASE_BUCKET = 'ai4cut-images'
+# Supabase 로 동시에 열어둘 HTTP 연결 수 (이미지 병렬 업로드 수)
+SUPABASE_POOL_SIZE = int(os.getenv('SUPABASE_POOL_SIZE', '8'))
+# Supabase 이미지 변환(render/image) 으로 썸네일 제공 (Pro 플랜 이상, 0 이면 원본 URL 사용)
+SUPABASE_IMAGE_TRANSFORM = os.getenv('SUPABASE_IMAGE_TRANSFORM', '1') == '1'
+# 연속 N번 실패하거나 SUPABASE_SLOW_CALL_SECONDS 보다 느리면 SUPABASE_BREAKER_RESET_SECONDS 동안 호출 생략
+SUPABASE_BREAKER_FAILURES = int(os.getenv('SUPABASE_BREAKER_FAILURES', '3'))
+SUPABASE_BREAKER_RESET_SECONDS = float(os.getenv('SUPABASE_BREAKER_RESET_SECONDS', '30'))
+SUPABASE_SLOW_CALL_SECONDS = float(os.getenv('SUPABASE_SLOW_CALL_SECONDS', '5'))
+SUPABASE_CONNECT_TIMEOUT = float(os.getenv('SUPABASE_CONNECT_TIMEOUT', '3'))
+
+LOCAL_STORAGE_DIR = os.getenv('LOCAL_STORAGE_DIR', os.path.join(BASE_DIR, 'local_storage'))
+LOCAL_MEDIA_URL = '/media'
+
+# 로컬 SQLite 에 JSON 문자열로 저장하는 컬럼
+JSON_COLUMNS = ('image_urls', 'cut_urls')
+
+
+class SupabaseStorage:
+    """Supabase Storage + Postgres 테이블 저장소 (PostgREST / Storage REST API 직접 호출)
+
+    모든 요청이 하나의 requests.Session 을 공유해 HTTP 연결을 재사용하고, 요청 수를 round_trips 로 센다.
+    완료 쓰기는 complete_gallery RPC 로 통계 insert 와 한 번에 처리한다 (stats 는 dict 또는 배치의 dict 목록).
+    연결 실패, 5xx, 느린 응답이 이어지면 회로 차단기가 열려 한동안 요청 없이 바로 CircuitOpenError 를 낸다.
+    """
+
+    name = 'supabase'
+
+    def __init__(self, url, key, bucket=SUPABASE_BUCKET, session=None):
+        self.url = url.rstrip('/')
+        self.bucket = bucket
+        self.session = session or requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=SUPABASE_POOL_SIZE)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update({'apikey': key, 'Authorization': f"Bearer {key}"})
+        self.round_trips = 0
+        self.breaker = CircuitBreaker('supabase', SUPABASE_BREAKER_FAILURES, SUPABASE_BREAKER_RESET_SECONDS,
+                                      SUPABASE_SLOW_CALL_SECONDS)
+        self._lock = threading.Lock()
+
+    def _request(self, method, path, **kwargs):
+        def send():
+            with self._lock:
+                self.round_trips += 1
+            response = self.session.request(method, f"{self.url}{path}", timeout=(SUPABASE_CONNECT_TIMEOUT, 30), **kwargs)
+            # 4xx 는 요청 문제이므로 회로 차단기 실패로 세지 않음
+            if response.status_code >= 500:
+                response.raise_for_status()
+            return response
+
+        response = self.breaker.call(send)
+        response.raise_for_status()
+        return response
+
+    def _rpc(self, function, params):
+        return self._request('POST', f"/rest/v1/rpc/{function}", json=params)
+
+    def insert_gallery(self, row):
+        result = self._request('POST', '/rest/v1/gallery', json=row, headers={'Prefer': 'return=representation'}).json()
+        return result[0]['id'] if result else None
+
+    def update_gallery(self, gallery_id, fields):
+        self._request('PATCH', '/rest/v1/gallery', params={'id': f"eq.{gallery_id}"}, json=fields,
+                      headers={'Prefer': 'return=minimal'})
+
+    def complete_gallery(self, gallery_id, fields, stats=None):
+        """gallery 업데이트와 통계 insert 를 RPC 1회로 처리"""
+        self._rpc('complete_gallery', {'p_id': gallery_id, 'p_fields': fields, 'p_stats': stats})
+
+    def get_gallery(self, gallery_id):
+        result = self._request('GET', '/rest/v1/gallery', params={'id': f"eq.{gallery_id}", 'select': '*', 'limit': 1}).json()
+        return result[0] if result else None
+
+    def upload_image(self, filename, data, content_type='image/png'):
+        self._request('POST', f"/storage/v1/object/{self.bucket}/{filename}", data=data,
+                      headers={'Content-Type': content_type})
+        return f"{self.url}/storage/v1/object/public/{self.bucket}/{filename}"
+
+    def upload_images(self, files):
+        """[(filename, data, content_type), ...] 를 동시에 업로드하고 URL 목록을 같은 순서로 반환"""
+        if len(files) <= 1:
+            return [self.upload_image(*file) for file in files]
+        with ThreadPoolExecutor(max_workers=min(len(files), SUPABASE_POOL_SIZE)) as executor:
+            return list(executor.map(lambda file: self.upload_image(*file), files))
+
+    def insert_stats(self, rows):
+        """통계 행 insert (dict 또는 dict 목록 - PostgREST 는 배열을 한 번에 insert)"""
+        self._request('POST', '/rest/v1/generations', json=rows, headers={'Prefer': 'return=minimal'})
+
+    def list_public_galleries(self, limit, since, before=None):
+        """공개 + 완료된 결과를 (created_at, id) 내림차순으로 조회 (before 커서 이후부터)"""
+        return self._rpc('public_feed', {
+            'p_limit': limit,
+            'p_since': since,
+            'p_before_created_at': before[0] if before else None,
+            'p_before_id': before[1] if before else None
+        }).json()
+
+    def thumbnail_url(self, image_url, width):
+        if not SUPABASE_IMAGE_TRANSFORM:
+            return image_url
+        render_url = image_url.replace('/storage/v1/object/public/', '/storage/v1/render/image/public/', 1)
+        return f"{render_url}?width={width}&resize=contain&quality=70"
+
+    def read_image(self, url):
+        response = self.session.get(url, timeout=30)
+        response.raise_for_status()
+        return response.content
+
+
+class LocalStorage:
+    """로컬 파일시스템 + SQLite 저장소"""
+
+    name = 'local'
+
+    def __init__(self, root=LOCAL_STORAGE_DIR):
+        self.root = root
+        self.media_dir = os.path.join(root, 'images')
+        self.db_path = os.path.join(root, 'gallery.db')
+        self._lock = threading.Lock()
+        os.makedirs(self.media_dir, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                create table if not exists gallery (
+                    id text primary key,
+                    image_url text,
+                    image_urls text,
+                    layout text,
+                    style text,
+                    color_mode text,
+                    is_public integer default 0,
+                    status text,
+                    created_at text not null
+                )""")
+            # 이전 버전 DB 에 없는 컬럼 추가
+            existing = {row[1] for row in conn.execute("pragma table_info(gallery)")}
+            for column in ('cut_urls', 'frame_color'):
+                if column not in existing:
+                    conn.execute(f"alter table gallery add column {column} text")
+            conn.execute("""
+                create index if not exists gallery_public_feed_idx
+                on gallery (created_at desc, id desc) where is_public = 1 and image_url is not null""")
+            conn.execute("""
+                create table if not exists generations (
+                    id integer primary key autoincrement,
+                    layout text,
+                    style text,
+                    color_mode text,
+                    is_duo integer,
+                    image_count integer,
+                    created_at text not null
+                )""")
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=10)
+
+    @staticmethod
+    def _now():
+        return datetime.now(timezone.utc).isoformat()
+
+    @staticmethod
+    def _insert(conn, table, row):
+        columns = ', '.join(row)
+        placeholders = ', '.join('?' for _ in row)
+        conn.execute(f"insert into {table} ({columns}) values ({placeholders})", list(row.values()))
+
+    def _insert_stats(self, conn, stats):
+        for row in stats if isinstance(stats, list) else [stats]:
+            self._insert(conn, 'generations', dict(row, created_at=self._now()))
+
+    def insert_gallery(self, row):
+        row = self._encode(dict(row, created_at=self._now()))
+        with self._lock, self._connect() as conn:
+            self._insert(conn, 'gallery', row)
+        return row['id']
+
+    def update_gallery(self, gallery_id, fields):
+        self.complete_gallery(gallery_id, fields)
+
+    def complete_gallery(self, gallery_id, fields, stats=None):
+        """gallery 업데이트와 통계 insert 를 한 트랜잭션으로 처리"""
+        fields = self._encode(fields)
+        assignments = ', '.join(f"{column} = ?" for column in fields)
+        with self._lock, self._connect() as conn:
+            conn.execute(f"update gallery set {assignments} where id = ?", list(fields.values()) + [gallery_id])
+            if stats:
+                self._insert_stats(conn, stats)
+
+    def get_gallery(self, gallery_id):
+        with self._connect() as conn:
+            conn.row_factory = sqlite3.Row
+            row = conn.execute("select * from gallery where id = ?", (gallery_id,)).fetchone()
+        if row is None:
+            return None
+        gallery = dict(row)
+        for column in JSON_COLUMNS:
+            gallery[column] = json.loads(gallery[column]) if gallery.get(column) else None
+        gallery['is_public'] = bool(gallery['is_public'])
+        return gallery
+
+    @staticmethod
+    def _encode(fields):
+        return {column: json.dumps(value) if column in JSON_COLUMNS and value is not None else value
+                for column, value in fields.items()}
+
+    def upload_image(self, filename, data, content_type='image/png'):
+        with open(os.path.join(self.media_dir, filename), 'wb') as f:
+            f.write(data)
+        return f"{LOCAL_MEDIA_URL}/{filename}"
+
+    def upload_images(self, files):
+        return [self.upload_image(*file) for file in files]
+
+    def list_public_galleries(self, limit, since, before=None):
+        """공개 + 완료된 결과를 (created_at, id) 내림차순으로 조회 (before 커서 이후부터)"""
+        query = ("select id, image_url, layout, style, color_mode, created_at from gallery "
+                 "where is_public = 1 and image_url is not null and created_at > ?")
+        params = [since]
+        if before:
+            query += " and (created_at, id) < (?, ?)"
+            params += list(before)
+        query += " order by created_at desc, id desc limit ?"
+        with self._connect() as conn:
+            conn.row_factory = sqlite3.Row
+            return [dict(row) for row in conn.execute(query, params + [limit])]
+
+    def thumbnail_url(self, image_url, width):
+        stem = os.path.splitext(os.path.basename(image_url.split('?', 1)[0]))[0]
+        return f"{LOCAL_MEDIA_URL}/thumbs/{width}/{stem}.webp"
+
+    def ensure_thumbnail(self, width, filename):
+        """썸네일(WebP) 이 없으면 원본에서 생성하고 썸네일 디렉터리 반환 (원본이 없으면 None)"""
+        from PIL import Image
+
+        thumb_dir = os.path.join(self.media_dir, 'thumbs', str(width))
+        stem = os.path.splitext(os.path.basename(filename))[0]
+        thumb_path = os.path.join(thumb_dir, f"{stem}.webp")
+        source_path = os.path.join(self.media_dir, f"{stem}.png")
+        if not os.path.exists(thumb_path):
+            if not os.path.exists(source_path):
+                return None
+            os.makedirs(thumb_dir, exist_ok=True)
+            with Image.open(source_path) as image:
+                image.thumbnail((width, width * 4))
+                image.convert('RGB').save(thumb_path + '.tmp', format='WEBP', quality=70, method=4)
+            os.replace(thumb_path + '.tmp', thumb_path)
+        return thumb_dir
+
+    def read_image(self, url):
+        filename = os.path.basename(url.split('?', 1)[0])
+        with open(os.path.join(self.media_dir, filename), 'rb') as f:
+            return f.read()
+
+    def insert_stats(self, rows):
+        with self._lock, self._connect() as conn:
+            self._insert_stats(conn, rows)
+
+
+def create_storage():
+    """환경변수에 따라 저장소 백엔드 생성 (사용 불가 시 None)"""
+    backend = os.getenv('STORAGE_BACKEND') or ('supabase' if SUPABASE_URL and SUPABASE_KEY else None)
+
+    if backend == 'local':
+        print(f"✅ Local storage: {LOCAL_STORAGE_DIR}")
+        return LocalStorage()
+
+    if backend == 'supabase':
+        if not (SUPABASE_URL and SUPABASE_KEY):
+            print("⚠️ Supabase credentials not found")
+            return None
+        print("✅ Supabase connected")
+        return SupabaseStorage(SUPABASE_URL, SUPABASE_KEY)
+
+    print("⚠️ Storage backend not configured")
+    return None
+
@@ -0,0 +1,2 @@
+-- webhook 모드 생성 작업 상태 (실패 시 'failed' 기록, 완료 여부는 image_urls 로 판단)
+alter table public.gallery add column if not exists status text;
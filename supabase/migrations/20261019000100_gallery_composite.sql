@@ -0,0 +1,3 @@
+-- 합성 모드: 개별 인물 컷 URL 과 프레임 색상 (프레임만 바꾼 재합성에 사용)
+alter table public.gallery add column if not exists cut_urls jsonb;
+alter table public.gallery add column if not exists frame_color text;
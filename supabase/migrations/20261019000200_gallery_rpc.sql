@@ -0,0 +1,63 @@
+-- 생성 1건당 왕복 수를 줄이기 위한 RPC: gallery 쓰기와 generations 통계 insert 를 한 번에 처리
+-- p_fields / p_stats 는 컬럼명을 키로 하는 JSON (없는 키는 기존 값 유지)
+
+create or replace function public.create_gallery(p_gallery jsonb, p_stats jsonb default null)
+returns text
+language plpgsql
+security definer
+set search_path = public
+as $$
+declare
+  v_id text;
+begin
+  insert into public.gallery (id, image_url, layout, style, color_mode, is_public, status)
+  select r.id, r.image_url, r.layout, r.style, r.color_mode, coalesce(r.is_public, true), r.status
+  from jsonb_populate_record(null::public.gallery, p_gallery) r
+  returning id into v_id;
+
+  if p_stats is not null then
+    insert into public.generations (layout, style, color_mode, is_duo, image_count)
+    select s.layout, s.style, s.color_mode, s.is_duo, s.image_count
+    from jsonb_populate_record(null::public.generations, p_stats) s;
+  end if;
+
+  return v_id;
+end;
+$$;
+
+create or replace function public.complete_gallery(p_id text, p_fields jsonb, p_stats jsonb default null)
+returns void
+language plpgsql
+security definer
+set search_path = public
+as $$
+declare
+  v_row public.gallery;
+begin
+  if p_id is not null then
+    select * into v_row
+    from jsonb_populate_record((select g from public.gallery g where g.id = p_id), p_fields);
+
+    update public.gallery
+    set image_url = v_row.image_url,
+        image_urls = v_row.image_urls,
+        cut_urls = v_row.cut_urls,
+        frame_color = v_row.frame_color,
+        color_mode = v_row.color_mode,
+        status = v_row.status
+    where id = p_id;
+  end if;
+
+  if p_stats is not null then
+    insert into public.generations (layout, style, color_mode, is_duo, image_count)
+    select s.layout, s.style, s.color_mode, s.is_duo, s.image_count
+    from jsonb_populate_record(null::public.generations, p_stats) s;
+  end if;
+end;
+$$;
+
+-- 서버(service_role)에서만 호출
+revoke execute on function public.create_gallery(jsonb, jsonb) from public, anon, authenticated;
+revoke execute on function public.complete_gallery(text, jsonb, jsonb) from public, anon, authenticated;
+grant execute on function public.create_gallery(jsonb, jsonb) to service_role;
+grant execute on function public.complete_gallery(text, jsonb, jsonb) to service_role;
@@ -0,0 +1,30 @@
+-- 공개 피드: 최근 24시간 공개 결과를 (created_at, id) keyset 페이지네이션으로 조회
+-- 부분 인덱스라 공개 + 완료된 행만 담기고, 행 수가 수백만이어도 페이지당 인덱스 범위 스캔 1회로 끝난다.
+create index if not exists gallery_public_feed_idx
+  on public.gallery (created_at desc, id desc)
+  where is_public and image_url is not null;
+
+create or replace function public.public_feed(
+  p_limit int,
+  p_since timestamptz,
+  p_before_created_at timestamptz default null,
+  p_before_id text default null
+)
+returns table (id text, image_url text, layout text, style text, color_mode text, created_at timestamptz)
+language sql
+stable
+security definer
+set search_path = public
+as $$
+  select g.id, g.image_url, g.layout, g.style, g.color_mode, g.created_at
+  from public.gallery g
+  where g.is_public
+    and g.image_url is not null
+    and g.created_at > p_since
+    and (p_before_created_at is null or (g.created_at, g.id) < (p_before_created_at, p_before_id))
+  order by g.created_at desc, g.id desc
+  limit least(p_limit, 100);
+$$;
+
+revoke execute on function public.public_feed(int, timestamptz, timestamptz, text) from public, anon, authenticated;
+grant execute on function public.public_feed(int, timestamptz, timestamptz, text) to service_role;
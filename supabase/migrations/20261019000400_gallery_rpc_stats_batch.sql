@@ -0,0 +1,37 @@
+-- 배치 생성은 변형별 통계를 complete_gallery 1회로 기록 (p_stats 에 JSON 객체 또는 배열)
+-- create_gallery 는 앱에서 호출하지 않으므로 제거 (placeholder 는 gallery insert 1회, 통계는 완료 시 기록)
+drop function if exists public.create_gallery(jsonb, jsonb);
+
+create or replace function public.complete_gallery(p_id text, p_fields jsonb, p_stats jsonb default null)
+returns void
+language plpgsql
+security definer
+set search_path = public
+as $$
+declare
+  v_row public.gallery;
+begin
+  if p_id is not null then
+    select * into v_row
+    from jsonb_populate_record((select g from public.gallery g where g.id = p_id), p_fields);
+
+    update public.gallery
+    set image_url = v_row.image_url,
+        image_urls = v_row.image_urls,
+        cut_urls = v_row.cut_urls,
+        frame_color = v_row.frame_color,
+        color_mode = v_row.color_mode,
+        status = v_row.status
+    where id = p_id;
+  end if;
+
+  if p_stats is not null then
+    insert into public.generations (layout, style, color_mode, is_duo, image_count)
+    select s.layout, s.style, s.color_mode, s.is_duo, s.image_count
+    from jsonb_populate_recordset(
+      null::public.generations,
+      case when jsonb_typeof(p_stats) = 'array' then p_stats else jsonb_build_array(p_stats) end
+    ) s;
+  end if;
+end;
+$$;
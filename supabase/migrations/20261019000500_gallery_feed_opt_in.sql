@@ -0,0 +1,5 @@
+-- 공개 피드는 생성 시 사용자가 공유에 동의한 결과만 노출 (새 행 기본값은 비공개)
+-- 기존 행의 is_public = true 는 동의 없이 기본값으로 들어간 값이므로 모두 비공개로 되돌린다.
+alter table public.gallery alter column is_public set default false;
+
+update public.gallery set is_public = false where is_public;
@@ -0,0 +1,43 @@
+"""pytest 공용 설정 - 저장소 루트 모듈(app, generation, ...)을 import 할 수 있도록 경로 추가
+
+app 은 import 시점에 환경변수를 읽으므로 로컬 저장소/로컬 프로바이더 대역으로 먼저 설정해 둔다.
+"""
+import io
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+os.environ.update({
+    'STORAGE_BACKEND': 'local',
+    'LOCAL_STORAGE_DIR': tempfile.mkdtemp(prefix='ai4cut-test-storage-'),
+    'CHUNKED_UPLOAD_DIR': tempfile.mkdtemp(prefix='ai4cut-test-uploads-'),
+    'GENERATION_PROVIDERS': 'local',
+})
+for name in ('PUBLIC_BASE_URL', 'FAL_WEBHOOK_SECRET', 'GENERATION_FANOUT', 'PROFILE_TOKEN'):
+    os.environ.pop(name, None)
+
+
+def make_png(size=(128, 128), color='red', mode='RGB'):
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.new(mode, size, color).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+@pytest.fixture(scope='session')
+def app_module():
+    import app
+    return app
+
+
+@pytest.fixture
+def client(app_module):
+    import feed
+
+    feed._feed_cache.clear()
+    return app_module.app.test_client()
@@ -0,0 +1,134 @@
+"""Flask 앱 - 로컬 저장소 + 로컬 프로바이더 대역으로 생성/피드/변형 경로 확인"""
+import base64
+import io
+import os
+import threading
+import time
+
+import pytest
+
+from conftest import make_png
+
+
+def generate(client, **fields):
+    data = dict({'image': (io.BytesIO(make_png()), 'photo.png'), 'layout': '1x4', 'style': 'default'}, **fields)
+    response = client.post('/generate', data=data, content_type='multipart/form-data')
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()['share_urls'][0].rsplit('/', 1)[1]
+
+
+def test_generation_is_private_unless_user_opts_in(client, app_module):
+    private_id = generate(client)
+    public_id = generate(client, is_public='1')
+
+    assert app_module.storage_backend.get_gallery(private_id)['is_public'] is False
+    assert app_module.storage_backend.get_gallery(public_id)['is_public'] is True
+
+    feed_ids = [item['id'] for item in client.get('/api/feed').get_json()['items']]
+    assert public_id in feed_ids
+    assert private_id not in feed_ids
+
+
+def test_retone_variant_of_public_result_stays_private(client, app_module):
+    source_id = generate(client, is_public='1')
+
+    response = client.post(f'/r/{source_id}/retone', json={'tone': 'bw'})
+    assert response.status_code == 200, response.get_json()
+    variant_id = response.get_json()['share_urls'][0].rsplit('/', 1)[1]
+    assert variant_id != source_id
+    assert app_module.storage_backend.get_gallery(variant_id)['is_public'] is False
+
+
+def test_staged_token_is_reused(client, app_module, monkeypatch):
+    staged, lookups = [], []
+    stage_images, get_staged_images = app_module.staging.stage_images, app_module.staging.get_staged_images
+    monkeypatch.setattr(app_module.staging, 'stage_images', lambda images: staged.append(images) or stage_images(images))
+    monkeypatch.setattr(app_module.staging, 'get_staged_images', lambda token: lookups.append(token) or get_staged_images(token))
+
+    response = client.post('/uploads/stage', data={'image': (io.BytesIO(make_png()), 'photo.png')},
+                           content_type='multipart/form-data')
+    token = response.get_json()['upload_token']
+    assert response.get_json()['expires_in'] > 0
+
+    # "한번 더 하기" - 같은 토큰으로 옵션만 바꿔 다시 생성 (사진 재전송 없음)
+    for style in ('default', 'ghibli'):
+        response = client.post('/generate', data={'upload_token': token, 'style': style}, content_type='multipart/form-data')
+        assert response.status_code == 200
+        assert response.get_json()['success']
+    assert len(staged) == 1
+    assert lookups == [token, token]
+
+
+def test_unknown_staged_token_falls_back_to_attached_images(client):
+    # 다른 인스턴스에서 발급된 토큰 - 사진이 없으면 410, 함께 첨부하면 그 사진으로 생성
+    response = client.post('/generate', data={'upload_token': 'other-instance'}, content_type='multipart/form-data')
+    assert response.status_code == 410
+    assert response.get_json()['code'] == 'upload_expired'
+
+    response = client.post('/generate', data={'upload_token': 'other-instance', 'image': (io.BytesIO(make_png()), 'photo.png')},
+                           content_type='multipart/form-data')
+    assert response.status_code == 200
+    assert response.get_json()['success']
+
+
+@pytest.mark.parametrize('body', [{'tone': ['bw']}, {'tone': {'name': 'bw'}}, {'tone': 1}, {'tone': 'sepia'}, ['bw']])
+def test_retone_rejects_invalid_tone(client, body):
+    source_id = generate(client)
+    assert client.post(f'/r/{source_id}/retone', json=body).status_code == 400
+
+
+def test_slow_storage_does_not_delay_result(client, app_module, monkeypatch):
+    saved = threading.Event()
+    complete_gallery = app_module.storage_backend.complete_gallery
+
+    def slow_complete_gallery(*args, **kwargs):
+        time.sleep(1.0)
+        complete_gallery(*args, **kwargs)
+        saved.set()
+
+    monkeypatch.setattr(app_module, 'GALLERY_COMPLETE_WAIT_SECONDS', 0.1)
+    monkeypatch.setattr(app_module.storage_backend, 'complete_gallery', slow_complete_gallery)
+
+    started = time.perf_counter()
+    gallery_id = generate(client)
+    assert time.perf_counter() - started < 0.8
+    assert not app_module.storage_backend.get_gallery(gallery_id)['image_urls']
+
+    # 저장은 백그라운드에서 마무리
+    assert saved.wait(5)
+    assert app_module.storage_backend.get_gallery(gallery_id)['image_urls']
+
+
+def test_fanout_late_result_waits_for_background_save(client, app_module, monkeypatch):
+    first, late = (f"data:image/png;base64,{base64.b64encode(make_png(color=color)).decode()}" for color in ('red', 'blue'))
+    latencies = iter([0.0, 0.3])
+
+    class Router:
+        def generate(self, arguments, cancel_event=None):
+            latency = next(latencies)
+            time.sleep(latency)
+            return [late if latency else first], 'stub'
+
+    complete_gallery = app_module.storage_backend.complete_gallery
+
+    def slow_complete_gallery(*args, **kwargs):
+        time.sleep(0.5)
+        complete_gallery(*args, **kwargs)
+
+    monkeypatch.setattr(app_module.generation, 'GENERATION_FANOUT', 2)
+    monkeypatch.setattr(app_module, 'generation_router', Router())
+    monkeypatch.setattr(app_module, 'GALLERY_COMPLETE_WAIT_SECONDS', 0.1)
+    monkeypatch.setattr(app_module.storage_backend, 'complete_gallery', slow_complete_gallery)
+
+    started = time.perf_counter()
+    gallery_id = generate(client)
+    assert time.perf_counter() - started < 0.4
+
+    deadline = time.time() + 5
+    while time.time() < deadline and len(app_module.storage_backend.get_gallery(gallery_id)['image_urls'] or []) < 2:
+        time.sleep(0.05)
+    image_urls = app_module.storage_backend.get_gallery(gallery_id)['image_urls']
+    assert len(image_urls) == 2
+    storage_dir = app_module.storage_backend.media_dir
+    assert [open(os.path.join(storage_dir, url.rsplit('/', 1)[1]), 'rb').read() for url in image_urls] == \
+        [make_png(color='red'), make_png(color='blue')]
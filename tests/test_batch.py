@@ -0,0 +1,130 @@
+"""배치 생성 - 변형 검증, 동시 실행 상한, NDJSON 스트리밍 형식, 공유 gallery 완료 1회 확인"""
+import io
+import json
+import threading
+import time
+
+import pytest
+
+import generation
+from conftest import make_png
+
+
+class CountingRouter:
+    """generation_router 대역 - 동시 실행 수를 세고 style 이 'broken' 인 변형은 실패"""
+
+    def __init__(self, latency=0.05):
+        self.latency = latency
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def generate(self, arguments, cancel_event=None):
+        with self._lock:
+            self.calls += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            time.sleep(self.latency)
+            if 'broken' in arguments['prompt']:
+                raise RuntimeError('provider failed')
+            return [arguments['image_urls'][0]] * arguments['num_images'], 'counting'
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+@pytest.fixture
+def router(app_module, monkeypatch):
+    router = CountingRouter()
+    monkeypatch.setattr(app_module, 'generation_router', router)
+    monkeypatch.setattr(app_module.prompts, 'get_ai_4_cut_prompt',
+                        lambda frame_color, layout, color_mode, style, is_duo: f"{style} {layout} {frame_color}")
+    return router
+
+
+@pytest.fixture
+def completions(app_module, monkeypatch):
+    calls = []
+    update_gallery_with_images = app_module.update_gallery_with_images
+
+    def counting_update(gallery_id, image_data_list, extra_fields=None, stats=None):
+        calls.append({'gallery_id': gallery_id, 'images': len(image_data_list), 'stats': stats})
+        return update_gallery_with_images(gallery_id, image_data_list, extra_fields, stats)
+
+    monkeypatch.setattr(app_module, 'update_gallery_with_images', counting_update)
+    return calls
+
+
+def post_batch(client, variants, **fields):
+    data = dict({'image': (io.BytesIO(make_png()), 'photo.png'),
+                 'variants': variants if isinstance(variants, str) else json.dumps(variants)}, **fields)
+    return client.post('/generate/batch', data=data, content_type='multipart/form-data')
+
+
+@pytest.mark.parametrize('variants', [
+    'not json',
+    [],
+    {'style': 'disney'},
+    ['disney'],
+    [{'style': 'default'}] * (generation.BATCH_MAX_VARIANTS + 1),
+])
+def test_rejects_invalid_variants(client, router, variants):
+    response = post_batch(client, variants)
+    assert response.status_code == 400
+    assert response.get_json()['error']
+    assert router.calls == 0
+
+
+def test_variants_run_under_concurrency_cap(client, router, completions):
+    variants = [{'style': style} for style in ('disney', 'ghibli', 'pixar', 'default', 'bw')]
+    response = post_batch(client, variants)
+
+    assert response.status_code == 200
+    body = response.get_json()
+    assert [item['index'] for item in body['variants']] == list(range(len(variants)))
+    assert router.calls == len(variants)
+    assert router.max_in_flight == generation.BATCH_MAX_CONCURRENCY
+
+
+def test_stream_sends_header_then_one_line_per_variant(client, router, completions):
+    variants = [{'style': 'disney', 'layout': '2x2'}, {'style': 'broken'}, {'style': 'ghibli', 'frame_color': 'white'}]
+    response = post_batch(client, variants, stream='1')
+
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    header, items = lines[0], [line['variant'] for line in lines[1:]]
+
+    assert header['variant_count'] == 3
+    assert header['share_urls'] == [f"/r/{header['gallery_id']}"]
+    assert sorted(item['index'] for item in items) == [0, 1, 2]
+    by_index = {item['index']: item for item in items}
+    assert (by_index[0]['style'], by_index[0]['layout'], len(by_index[0]['result_urls'])) == ('disney', '2x2', 1)
+    assert by_index[1]['result_urls'] == [] and by_index[1]['error']
+    assert by_index[2]['frame_color'] == 'white'
+
+
+def test_shared_gallery_is_completed_once(client, app_module, router, completions):
+    variants = [{'style': 'disney'}, {'style': 'broken'}, {'style': 'ghibli'}]
+    response = post_batch(client, variants)
+
+    assert response.status_code == 200
+    gallery_id = response.get_json()['share_urls'][0].rsplit('/', 1)[1]
+    assert len(completions) == 1
+    assert completions[0]['gallery_id'] == gallery_id
+    assert completions[0]['images'] == 2
+    assert sorted(stats['style'] for stats in completions[0]['stats']) == ['disney', 'ghibli']
+
+    gallery = app_module.storage_backend.get_gallery(gallery_id)
+    assert gallery['image_url'] == gallery['image_urls'][0]
+    assert len(gallery['image_urls']) == 2
+
+
+def test_all_variants_failing_returns_500_without_completing(client, router, completions):
+    response = post_batch(client, [{'style': 'broken'}, {'style': 'broken'}])
+
+    assert response.status_code == 500
+    assert all(item['error'] for item in response.get_json()['variants'])
+    assert completions == []
@@ -0,0 +1,167 @@
+"""blob_utils - MIME 판별, (내용, MIME) Part 캐시, 병렬 읽기 순서, 지연 디코드와 임시 파일 상한 확인"""
+import io
+import os
+import threading
+import time
+
+import pytest
+from PIL import Image
+
+import blob_utils
+from conftest import make_png
+
+
+class Builder:
+    """Part 대신 (mime_type, data) 튜플을 만들고 호출 수를 셈"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, data, mime_type):
+        self.calls += 1
+        return (mime_type, data)
+
+
+def encode(image_format, mode='RGB'):
+    buffer = io.BytesIO()
+    Image.new(mode, (32, 32), 'red').save(buffer, format=image_format)
+    return buffer.getvalue()
+
+
+@pytest.mark.parametrize('data, expected', [
+    (encode('PNG'), 'image/png'),
+    (encode('JPEG'), 'image/jpeg'),
+    (encode('GIF'), 'image/gif'),
+    (encode('WEBP'), 'image/webp'),
+    (encode('BMP'), 'image/bmp'),
+    (b'%PDF-1.7\n', 'application/pdf'),
+    (b'\x00\x00\x00\x20ftypavif', 'image/avif'),
+])
+def test_sniff_mime_type_from_signature(data, expected):
+    # 확장자가 달라도 선두 바이트가 우선
+    assert blob_utils.sniff_mime_type(data, 'photo.txt') == expected
+
+
+def test_sniff_mime_type_falls_back_to_extension_then_octet_stream():
+    assert blob_utils.sniff_mime_type(b'hello', 'notes.txt') == 'text/plain'
+    assert blob_utils.sniff_mime_type(b'hello') == 'application/octet-stream'
+    assert blob_utils.sniff_mime_type(b'', 'unknown.zzz') == 'application/octet-stream'
+
+
+def test_part_cache_reuses_part_for_same_content_and_mime():
+    build = Builder()
+    cache = blob_utils.PartCache(build)
+    data = make_png()
+
+    first = cache.from_bytes(data)
+    assert first == ('image/png', data)
+    assert cache.from_bytes(bytes(data)) is first
+    assert cache.from_bytes(data, 'image/png') is first
+    assert build.calls == 1
+
+
+def test_part_cache_keys_on_mime_type():
+    build = Builder()
+    cache = blob_utils.PartCache(build)
+    data = make_png()
+
+    as_png = cache.from_bytes(data, 'image/png')
+    as_octet = cache.from_bytes(data, 'application/octet-stream')
+    assert as_png[0] == 'image/png'
+    assert as_octet[0] == 'application/octet-stream'
+    assert build.calls == 2 and len(cache) == 2
+
+
+def test_part_cache_evicts_least_recently_used():
+    build = Builder()
+    cache = blob_utils.PartCache(build, max_items=2)
+    cache.from_bytes(b'a', 'text/plain')
+    cache.from_bytes(b'b', 'text/plain')
+    cache.from_bytes(b'a', 'text/plain')
+    cache.from_bytes(b'c', 'text/plain')
+
+    assert len(cache) == 2
+    cache.from_bytes(b'a', 'text/plain')
+    assert build.calls == 3
+    cache.from_bytes(b'b', 'text/plain')
+    assert build.calls == 4
+
+
+def test_part_cache_skips_unchanged_files_and_rereads_changed(tmp_path, monkeypatch):
+    build = Builder()
+    cache = blob_utils.PartCache(build)
+    path = tmp_path / 'photo.png'
+    path.write_bytes(make_png(color='red'))
+
+    first = cache.from_file(path)
+    opened = []
+    real_open = open
+    monkeypatch.setattr('builtins.open', lambda file, *args, **kwargs: opened.append(file) or real_open(file, *args, **kwargs))
+    assert cache.from_file(path) is first
+    assert opened == []
+
+    path.write_bytes(make_png(color='blue'))
+    os.utime(path, ns=(time.time_ns(), time.time_ns() + 10_000_000))
+    second = cache.from_file(path)
+    assert second is not first and second[1] == path.read_bytes()
+    assert build.calls == 2
+
+
+def test_part_cache_file_and_bytes_share_entries(tmp_path):
+    build = Builder()
+    cache = blob_utils.PartCache(build)
+    data = make_png()
+    path = tmp_path / 'photo.png'
+    path.write_bytes(data)
+
+    assert cache.from_file(path) is cache.from_bytes(data)
+    assert build.calls == 1
+
+    cache.clear()
+    assert len(cache) == 0
+    cache.from_file(path)
+    assert build.calls == 2
+
+
+def test_read_parallel_keeps_order_and_uses_threads():
+    threads = set()
+
+    def read(index):
+        threads.add(threading.get_ident())
+        time.sleep(0.02 * (5 - index))
+        return index * 10
+
+    assert blob_utils.read_parallel(read, range(5)) == [0, 10, 20, 30, 40]
+    assert len(threads) > 1
+
+    threads.clear()
+    assert blob_utils.read_parallel(read, [2]) == [20]
+    assert threads == {threading.get_ident()}
+    assert blob_utils.read_parallel(read, []) == []
+
+
+def test_get_bytes_from_image_accepts_mime_names_and_converts_for_jpeg():
+    image = Image.new('RGBA', (16, 16), (255, 0, 0, 128))
+    assert blob_utils.sniff_mime_type(blob_utils.get_bytes_from_image(image, 'image/jpg')) == 'image/jpeg'
+    assert blob_utils.sniff_mime_type(blob_utils.get_bytes_from_image(image, 'WEBP')) == 'image/webp'
+    assert blob_utils.get_bytes_from_image(image) == blob_utils.get_bytes_from_image(image, 'image/png', compress_level=1)
+
+
+def test_lazy_image_decodes_only_on_access():
+    lazy = blob_utils.LazyImage(make_png(size=(40, 20)))
+    assert lazy.mime_type == 'image/png'
+    assert lazy._image is None
+    assert lazy.image.size == (40, 20)
+
+
+def test_lazy_image_to_file_is_content_addressed_and_bounded(tmp_path):
+    paths = []
+    for color in ('red', 'green', 'blue', 'white', 'black'):
+        paths.append(blob_utils.LazyImage(make_png(color=color)).to_file(str(tmp_path), max_files=3))
+        time.sleep(0.02)  # 파일 시각으로 오래된 순서를 구분
+
+    assert all(path.endswith('.png') for path in paths)
+    assert sorted(os.listdir(tmp_path)) == sorted(os.path.basename(path) for path in paths[-3:])
+    # 같은 내용이면 같은 파일을 다시 씀 (개수 변화 없음)
+    assert blob_utils.LazyImage(make_png(color='black')).to_file(str(tmp_path), max_files=3) == paths[-1]
+    assert len(os.listdir(tmp_path)) == 3
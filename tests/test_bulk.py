@@ -0,0 +1,71 @@
+"""대량 생성 CLI - bulk.main(--local) 로 결과 파일, 저널 재개, 실패 재시도, report.json 확인"""
+import json
+import os
+
+import pytest
+
+import bulk
+from conftest import make_png
+
+
+@pytest.fixture
+def photos(tmp_path):
+    photo_dir = tmp_path / 'photos'
+    photo_dir.mkdir()
+    (photo_dir / 'alice.png').write_bytes(make_png(color='red'))
+    (photo_dir / 'bob.png').write_bytes(make_png(color='blue'))
+    (photo_dir / 'broken.png').write_bytes(b'not an image')
+    return photo_dir
+
+
+def run_bulk(photos, out_dir):
+    status = bulk.main([str(photos), '--out', str(out_dir), '--local', '--local-latency', '0', '--concurrency', '2'])
+    with open(out_dir / bulk.REPORT_NAME, encoding='utf-8') as f:
+        return status, json.load(f)
+
+
+def read_journal(out_dir):
+    with open(out_dir / bulk.JOURNAL_NAME, encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+
+def test_local_run_writes_results_and_report(photos, tmp_path):
+    out_dir = tmp_path / 'out'
+    status, report = run_bulk(photos, out_dir)
+
+    assert status == 1
+    assert (report['items'], report['skipped'], report['done'], report['failed'], report['images']) == (3, 0, 2, 1, 2)
+    # 로컬 대역은 첫 입력 사진을 그대로 결과로 돌려줌
+    assert (out_dir / 'alice-1.png').read_bytes() == (photos / 'alice.png').read_bytes()
+    assert (out_dir / 'bob-1.png').read_bytes() == (photos / 'bob.png').read_bytes()
+    assert not (out_dir / 'broken-1.png').exists()
+    assert report['bytes_written'] == os.path.getsize(out_dir / 'alice-1.png') + os.path.getsize(out_dir / 'bob-1.png')
+
+    statuses = {entry['id']: entry['status'] for entry in read_journal(out_dir)}
+    assert statuses == {'alice': 'done', 'bob': 'done', 'broken': 'failed'}
+
+
+def test_rerun_skips_finished_items_and_retries_failed(photos, tmp_path):
+    out_dir = tmp_path / 'out'
+    run_bulk(photos, out_dir)
+    finished_at = os.path.getmtime(out_dir / 'alice-1.png')
+
+    (photos / 'broken.png').write_bytes(make_png(color='green'))
+    status, report = run_bulk(photos, out_dir)
+
+    assert status == 0
+    assert (report['items'], report['skipped'], report['done'], report['failed'], report['images']) == (3, 2, 1, 0, 1)
+    assert (out_dir / 'broken-1.png').read_bytes() == (photos / 'broken.png').read_bytes()
+    assert os.path.getmtime(out_dir / 'alice-1.png') == finished_at
+    assert [entry['id'] for entry in read_journal(out_dir)][3:] == ['broken']
+
+
+def test_finished_item_with_missing_output_is_regenerated(photos, tmp_path):
+    out_dir = tmp_path / 'out'
+    run_bulk(photos, out_dir)
+    os.remove(out_dir / 'bob-1.png')
+
+    _, report = run_bulk(photos, out_dir)
+
+    assert (report['skipped'], report['done'], report['failed']) == (1, 1, 1)
+    assert (out_dir / 'bob-1.png').exists()
@@ -0,0 +1,80 @@
+"""분할 업로드 - 세션 생성/조각 전송/완료 흐름과 잘못된 요청 거절"""
+import io
+
+import pytest
+
+import chunked_upload
+from conftest import make_png
+
+
+@pytest.fixture
+def upload_store(tmp_path):
+    return chunked_upload.UploadStore(str(tmp_path), chunk_size=1024, ttl=60, max_bytes=64 * 1024)
+
+
+@pytest.mark.parametrize('size', [True, False, 0, -1, 1.5, '10', None])
+def test_create_rejects_invalid_size(upload_store, size):
+    with pytest.raises(chunked_upload.UploadError) as excinfo:
+        upload_store.create(size)
+    assert excinfo.value.status == 400
+
+
+def test_chunks_in_any_order_complete_to_original_bytes(upload_store):
+    data = bytes(range(256)) * 10
+    session = upload_store.create(len(data))
+    offsets = session.missing_offsets()
+    assert offsets == [0, 1024, 2048]
+
+    for offset in reversed(offsets):
+        upload_store.write_chunk(session.id, offset, data[offset:offset + 1024])
+    assert upload_store.complete([session.id]) == [data]
+    assert upload_store.snapshot()['reserved_bytes'] == 0
+
+
+def test_complete_requires_every_chunk(upload_store):
+    session = upload_store.create(2048)
+    upload_store.write_chunk(session.id, 0, b'x' * 1024)
+    with pytest.raises(chunked_upload.UploadError) as excinfo:
+        upload_store.complete([session.id])
+    assert excinfo.value.code == 'upload_incomplete'
+
+
+def test_unknown_session_is_upload_expired(upload_store):
+    with pytest.raises(chunked_upload.UploadError) as excinfo:
+        upload_store.write_chunk('other-instance', 0, b'x')
+    assert (excinfo.value.status, excinfo.value.code) == (404, 'upload_expired')
+
+
+def test_http_flow_issues_upload_token(client):
+    image = make_png()
+    response = client.post('/uploads/sessions', json={'size': len(image)})
+    assert response.status_code == 201
+    session = response.get_json()
+
+    chunk_size = session['chunk_size']
+    for offset in session['missing_offsets']:
+        response = client.put(f"/uploads/sessions/{session['session_id']}?offset={offset}",
+                              data=image[offset:offset + chunk_size])
+        assert response.status_code == 200
+
+    response = client.post('/uploads/complete', json={'session_ids': [session['session_id']]})
+    assert response.status_code == 200
+    assert response.get_json()['upload_token']
+
+
+def test_http_rejects_boolean_size(client):
+    response = client.post('/uploads/sessions', json={'size': True})
+    assert response.status_code == 400
+
+
+def test_http_bounds_chunk_without_content_length(client):
+    image = make_png()
+    session = client.post('/uploads/sessions', json={'size': len(image)}).get_json()
+
+    # Content-Length 없는 chunked 전송 - 조각 크기 + 1 바이트만 읽고 413
+    oversized = io.BytesIO(b'x' * (session['chunk_size'] * 4))
+    response = client.put(f"/uploads/sessions/{session['session_id']}?offset=0", input_stream=oversized,
+                          headers={'Transfer-Encoding': 'chunked'},
+                          environ_overrides={'wsgi.input_terminated': True})
+    assert response.status_code == 413
+    assert oversized.tell() == session['chunk_size'] + 1
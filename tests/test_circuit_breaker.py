@@ -0,0 +1,126 @@
+"""회로 차단기 - closed → open → half_open 전환, 시험 호출 1건 제한, 느린 호출의 실패 처리 확인"""
+import threading
+import time
+
+import pytest
+
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+
+
+def fail():
+    raise RuntimeError('backend down')
+
+
+def make_breaker(**kwargs):
+    return CircuitBreaker('test', **dict({'failure_threshold': 3, 'reset_seconds': 0.1, 'slow_call_seconds': 5.0}, **kwargs))
+
+
+def test_opens_after_consecutive_failures_and_rejects_without_calling():
+    breaker = make_breaker()
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            breaker.call(fail)
+    assert breaker.state == 'closed'
+
+    with pytest.raises(RuntimeError):
+        breaker.call(fail)
+    assert breaker.state == 'open'
+
+    calls = []
+    with pytest.raises(CircuitOpenError):
+        breaker.call(calls.append, 'x')
+    assert calls == []
+    assert breaker.snapshot() == {'name': 'test', 'state': 'open', 'consecutive_failures': 3,
+                                  'opened_count': 1, 'rejected': 1}
+
+
+def test_success_resets_failure_count():
+    breaker = make_breaker()
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            breaker.call(fail)
+    assert breaker.call(lambda: 'ok') == 'ok'
+    assert breaker.failures == 0
+
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            breaker.call(fail)
+    assert breaker.state == 'closed'
+
+
+def test_half_open_probe_success_closes():
+    breaker = make_breaker(failure_threshold=1)
+    with pytest.raises(RuntimeError):
+        breaker.call(fail)
+    time.sleep(0.15)
+
+    assert breaker.call(lambda: 'ok') == 'ok'
+    assert breaker.state == 'closed' and breaker.failures == 0
+
+
+def test_half_open_probe_failure_reopens():
+    breaker = make_breaker(failure_threshold=3)
+    for _ in range(3):
+        with pytest.raises(RuntimeError):
+            breaker.call(fail)
+    time.sleep(0.15)
+
+    # half_open 에서는 실패 1번으로 바로 다시 open
+    with pytest.raises(RuntimeError):
+        breaker.call(fail)
+    assert breaker.state == 'open'
+    assert breaker.opened_count == 2
+    with pytest.raises(CircuitOpenError):
+        breaker.call(lambda: 'ok')
+
+
+def test_half_open_allows_a_single_probe():
+    breaker = make_breaker(failure_threshold=1)
+    with pytest.raises(RuntimeError):
+        breaker.call(fail)
+    time.sleep(0.15)
+
+    probe_started, release_probe = threading.Event(), threading.Event()
+
+    def slow_probe():
+        probe_started.set()
+        release_probe.wait(2)
+        return 'probe'
+
+    results = []
+    thread = threading.Thread(target=lambda: results.append(breaker.call(slow_probe)))
+    thread.start()
+    assert probe_started.wait(1)
+    assert breaker.state == 'half_open'
+
+    with pytest.raises(CircuitOpenError):
+        breaker.call(lambda: 'second')
+    release_probe.set()
+    thread.join(2)
+
+    assert results == ['probe']
+    assert breaker.state == 'closed'
+    assert breaker.call(lambda: 'after') == 'after'
+
+
+def test_slow_successful_calls_count_as_failures():
+    breaker = make_breaker(failure_threshold=2, slow_call_seconds=0.02)
+
+    def slow():
+        time.sleep(0.05)
+        return 'late'
+
+    assert breaker.call(slow) == 'late'
+    assert breaker.failures == 1 and breaker.state == 'closed'
+    assert breaker.call(slow) == 'late'
+    assert breaker.state == 'open'
+    with pytest.raises(CircuitOpenError):
+        breaker.call(lambda: 'fast')
+
+
+def test_record_duration_threshold():
+    breaker = make_breaker(failure_threshold=1, slow_call_seconds=1.0)
+    breaker.record(True, duration=0.5)
+    assert breaker.state == 'closed'
+    breaker.record(True, duration=1.5)
+    assert breaker.state == 'open'
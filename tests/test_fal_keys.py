@@ -0,0 +1,131 @@
+"""FAL 키 풀 - LocalFalClient 대역으로 동시 실행 제한, 스로틀 쿨다운, 취소, fan-out 확인"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import pytest
+
+import fal_keys
+import fal_local
+import generation
+
+
+def make_pool(keys, max_concurrency=None, client_limit=None, latency=0.0, **kwargs):
+    return fal_keys.KeyPool(keys, max_concurrency=max_concurrency,
+                            client_factory=lambda key: fal_local.LocalFalClient(key, client_limit, latency),
+                            **kwargs)
+
+
+def run_jobs(pool, count):
+    with ThreadPoolExecutor(max_workers=count) as executor:
+        return list(executor.map(lambda _: pool.run(lambda client: client.submit('app', {}).get()), range(count)))
+
+
+def test_default_concurrency_is_unbounded():
+    assert fal_keys.FAL_KEY_CONCURRENCY is None
+
+    pool = make_pool(['a'], latency=0.2)
+    assert len(run_jobs(pool, 6)) == 6
+    assert pool.slots[0].client.max_in_flight == 6
+    assert pool.snapshot()[0]['utilization'] is None
+
+
+def test_per_key_limit_spreads_jobs_over_keys():
+    pool = make_pool(['a', 'b'], max_concurrency=2, client_limit=2, latency=0.1)
+    assert len(run_jobs(pool, 8)) == 8
+
+    clients = [slot.client for slot in pool.slots]
+    assert all(client.max_in_flight <= 2 for client in clients)
+    assert all(client.submitted > 0 for client in clients)
+    assert sum(slot['completed'] for slot in pool.snapshot()) == 8
+
+
+def test_throttled_key_cools_down_and_retries_on_other_key():
+    # 풀은 키당 2개까지 보내지만 'a' 는 실제로 1개만 받아 두 번째 제출이 429
+    clients = {'a': fal_local.LocalFalClient('a', limit=1, latency=0.3),
+               'b': fal_local.LocalFalClient('b', limit=None, latency=0.3)}
+    pool = fal_keys.KeyPool(['a', 'b'], max_concurrency=2, cooldown_seconds=5, client_factory=clients.get)
+
+    assert len(run_jobs(pool, 4)) == 4
+    snapshot = {slot['key']: slot for slot in pool.snapshot()}
+    assert snapshot['a…']['throttled'] >= 1
+    assert snapshot['a…']['cooling_down']
+    assert clients['a'].max_in_flight == 1
+
+
+def test_acquire_times_out_when_all_keys_cool_down():
+    pool = make_pool(['a'], acquire_timeout=0.1)
+    pool.mark_throttled(pool.slots[0])
+    with pytest.raises(RuntimeError):
+        with pool.acquire():
+            pass
+
+
+def test_run_fal_job_cancels_through_cancel_url():
+    client = fal_local.LocalFalClient('a', latency=5)
+    cancel_event = threading.Event()
+    threading.Timer(0.2, cancel_event.set).start()
+
+    with pytest.raises(generation.JobCancelled):
+        generation.run_fal_job({}, client=client, cancel_event=cancel_event)
+    assert client.cancelled == ['local-1']
+    assert client.in_flight == 0
+
+
+def test_run_fal_job_returns_result_images():
+    client = fal_local.LocalFalClient('a', latency=0.1, result={'images': [{'url': 'data:image/png;base64,AAAA'}]})
+    assert generation.run_fal_job({}, client=client, cancel_event=threading.Event()) == ['data:image/png;base64,AAAA']
+
+
+def test_fanout_returns_first_result_and_cancels_stragglers_at_deadline():
+    pool = make_pool(['a'])
+    latencies = iter([0.05, 5, 5])
+    clients = []
+
+    def job(cancel_event):
+        client = fal_local.LocalFalClient('a', latency=next(latencies), result={'images': [{'url': 'data:,first'}]})
+        clients.append(client)
+        return pool.run(lambda _: generation.run_fal_job({}, client=client, cancel_event=cancel_event))
+
+    late_results = []
+    result, pending_count = generation.run_fanout(job, 3, late_results.append, deadline=0.3)
+    assert result == ['data:,first']
+    assert pending_count == 2
+
+    for _ in range(50):
+        if sum(len(client.cancelled) for client in clients) == 2:
+            break
+        threading.Event().wait(0.1)
+    assert sum(len(client.cancelled) for client in clients) == 2
+    assert late_results == []
+
+
+def test_fanout_late_callbacks_do_not_run_under_callers_lock():
+    # 모든 작업이 즉시 끝나도 늦은 결과 콜백은 호출자가 잡은 lock 밖(executor)에서 실행되어야 함
+    lock = threading.Lock()
+    late_results = []
+
+    def on_late_result(result):
+        with lock:
+            late_results.append(result)
+
+    def call():
+        with lock:
+            generation.run_fanout(lambda cancel_event: ['data:,x'], 3, on_late_result)
+
+    caller = threading.Thread(target=call, daemon=True)
+    caller.start()
+    caller.join(5)
+    assert not caller.is_alive()
+
+
+def test_throttle_is_detected_from_response_status_only():
+    request = httpx.Request('POST', 'https://queue.fal.run/fal-ai/test')
+    throttled = httpx.HTTPStatusError('rate limited', request=request, response=httpx.Response(429, request=request))
+    server_error = httpx.HTTPStatusError('500 for url', request=request, response=httpx.Response(500, request=request))
+
+    assert fal_keys.is_throttle_error(throttled)
+    assert fal_keys.is_throttle_error(fal_keys.FalThrottledError('throttled'))
+    assert not fal_keys.is_throttle_error(server_error)
+    assert not fal_keys.is_throttle_error(ValueError('image is 1429px wide'))
+    assert not fal_keys.is_throttle_error(RuntimeError('too many requests in prompt'))
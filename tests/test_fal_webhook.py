@@ -0,0 +1,75 @@
+"""FAL webhook 모드 - /generate 가 콜백 URL 로 제출하고, /fal/webhook 콜백이 gallery 를 완료하는 흐름"""
+import base64
+import io
+from urllib.parse import urlsplit
+
+import pytest
+
+import fal_webhook
+import generation
+from conftest import make_png
+
+RESULT_URI = 'data:image/png;base64,' + base64.b64encode(make_png(color='blue')).decode()
+
+
+@pytest.fixture
+def webhook_mode(monkeypatch):
+    """webhook 모드를 켜고 FAL 제출 대신 콜백 URL 을 기록"""
+    monkeypatch.setattr(fal_webhook, 'PUBLIC_BASE_URL', 'https://ai4cut.test')
+    monkeypatch.setattr(fal_webhook, 'WEBHOOK_SECRET', 'test-secret')
+    submitted = []
+    monkeypatch.setattr(generation, 'submit_with_webhook',
+                        lambda arguments, webhook_url, **kwargs: submitted.append(webhook_url))
+    return submitted
+
+
+def callback_path(webhook_url):
+    parts = urlsplit(webhook_url)
+    return f"{parts.path}?{parts.query}"
+
+
+def submit(client, webhook_mode):
+    response = client.post('/generate', data={'image': (io.BytesIO(make_png()), 'photo.png')},
+                           content_type='multipart/form-data')
+    data = response.get_json()
+    assert response.status_code == 200, data
+    assert data['result_ready'] is False
+    return data['job_id'], webhook_mode[-1]
+
+
+def test_callback_completes_gallery(client, webhook_mode):
+    gallery_id, webhook_url = submit(client, webhook_mode)
+    assert client.get(f'/jobs/{gallery_id}').get_json()['status'] != 'done'
+
+    response = client.post(callback_path(webhook_url), json=fal_webhook.callback_body(gallery_id, [RESULT_URI] * 2))
+    assert response.get_json() == {'success': True, 'status': 'done', 'image_count': 2}
+
+    job = client.get(f'/jobs/{gallery_id}').get_json()
+    assert job['status'] == 'done'
+    assert len(job['result_urls']) == 2
+    assert client.get(job['result_urls'][0]).status_code == 200
+
+
+def test_duplicate_callback_is_ignored(client, webhook_mode):
+    gallery_id, webhook_url = submit(client, webhook_mode)
+    body = fal_webhook.callback_body(gallery_id, [RESULT_URI])
+
+    assert client.post(callback_path(webhook_url), json=body).get_json()['status'] == 'done'
+    assert client.post(callback_path(webhook_url), json=body).get_json()['duplicate'] is True
+
+
+def test_failed_job_marks_gallery_failed(client, webhook_mode):
+    gallery_id, webhook_url = submit(client, webhook_mode)
+
+    response = client.post(callback_path(webhook_url), json=fal_webhook.callback_body(gallery_id, [], status='ERROR'))
+    assert response.get_json()['status'] == 'failed'
+    assert client.get(f'/jobs/{gallery_id}').get_json()['status'] == 'failed'
+
+
+def test_invalid_signature_is_rejected(client, webhook_mode):
+    gallery_id, webhook_url = submit(client, webhook_mode)
+    forged = webhook_url.replace('token=', 'token=0')
+
+    response = client.post(callback_path(forged), json=fal_webhook.callback_body(gallery_id, [RESULT_URI]))
+    assert response.status_code == 401
+    assert client.get(f'/jobs/{gallery_id}').get_json()['status'] != 'done'
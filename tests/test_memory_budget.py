@@ -0,0 +1,128 @@
+"""메모리 예산 - ByteBudget 대기/거절과 limit 데코레이터의 503, 스트리밍 응답 종료 시 반환 확인"""
+import threading
+import time
+
+import pytest
+from flask import Flask, Response, jsonify
+
+import generation
+import memory_budget
+
+
+@pytest.fixture
+def budget(monkeypatch):
+    budget = memory_budget.ByteBudget(100, wait_seconds=2, max_waiters=4)
+    monkeypatch.setattr(memory_budget, 'budget', budget)
+    return budget
+
+
+def test_acquire_waits_for_release(budget):
+    budget.acquire(80)
+    admitted = threading.Event()
+
+    def waiter():
+        budget.acquire(50)
+        admitted.set()
+
+    thread = threading.Thread(target=waiter)
+    thread.start()
+    time.sleep(0.1)
+    assert not admitted.is_set() and budget.waiting == 1
+
+    budget.release(80)
+    thread.join(1)
+    assert admitted.is_set()
+    assert budget.snapshot()['reserved_bytes'] == 50
+    assert budget.snapshot()['peak_bytes'] == 80
+
+
+def test_acquire_sheds_after_timeout_or_full_queue(budget):
+    budget.acquire(80)
+    with pytest.raises(memory_budget.BudgetExceeded):
+        budget.acquire(50, timeout=0.05)
+
+    budget.max_waiters = 0
+    started = time.time()
+    with pytest.raises(memory_budget.BudgetExceeded):
+        budget.acquire(50)
+    assert time.time() - started < 0.5
+    assert budget.shed == 2 and budget.waiting == 0
+
+
+def test_oversized_request_is_clipped_to_capacity(budget):
+    assert budget.acquire(10_000) == 100
+    budget.release(100)
+    assert budget.reserved == 0
+
+
+def make_app(estimate=lambda: 60):
+    app = Flask(__name__)
+
+    @app.route('/plain')
+    @memory_budget.limit(estimate)
+    def plain():
+        return jsonify({'reserved': memory_budget.budget.reserved})
+
+    @app.route('/stream')
+    @memory_budget.limit(estimate)
+    def stream():
+        def body():
+            yield 'first\n'
+            yield 'last\n'
+        return Response(body(), mimetype='text/plain')
+
+    @app.route('/broken')
+    @memory_budget.limit(estimate)
+    def broken():
+        raise RuntimeError('view failed')
+
+    return app
+
+
+def test_limit_reserves_during_view_and_releases_after(budget):
+    response = make_app().test_client().get('/plain')
+    assert response.get_json() == {'reserved': 60}
+    assert budget.reserved == 0
+
+
+def test_limit_sheds_with_503_and_retry_after(budget):
+    budget.acquire(80)
+    budget.wait_seconds = 0.05
+
+    response = make_app().test_client().get('/plain')
+
+    assert response.status_code == 503
+    assert response.get_json()['code'] == 'overloaded'
+    assert response.headers['Retry-After'] == '1'
+    assert budget.reserved == 80
+
+
+def test_limit_releases_streamed_response_when_closed(budget):
+    response = make_app().test_client().get('/stream', buffered=False)
+    assert budget.reserved == 60
+
+    assert next(response.response) == b'first\n'
+    assert budget.reserved == 60
+    response.close()
+    assert budget.reserved == 0
+
+
+def test_limit_releases_when_view_raises(budget):
+    app = make_app()
+    app.config['PROPAGATE_EXCEPTIONS'] = False
+    assert app.test_client().get('/broken').status_code == 500
+    assert budget.reserved == 0
+
+
+@pytest.mark.parametrize('variants, expected_count', [
+    ('[{"style": "disney"}, {"style": "ghibli"}]', 2),
+    ('[]', 1),
+    ('not json', 1),
+    ('[' + ', '.join(['{}'] * 50) + ']', None),
+])
+def test_batch_footprint_counts_requested_variants(app_module, variants, expected_count):
+    expected_count = expected_count or generation.BATCH_MAX_VARIANTS
+    with app_module.app.test_request_context('/generate/batch', method='POST', data={'variants': variants}):
+        expected = memory_budget.upload_footprint(app_module.request.content_length) + \
+            memory_budget.result_footprint(expected_count)
+        assert app_module.batch_footprint() == expected
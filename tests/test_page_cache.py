@@ -0,0 +1,168 @@
+"""페이지 캐시 - 결과 페이지의 ETag/304, 완료 여부에 따른 Cache-Control 과 max-age 범위,
+정적 페이지의 Accept-Encoding 협상(br / gzip / identity) 과 Vary 확인
+"""
+import gzip
+import secrets
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from flask import Flask, request
+
+import page_cache
+
+
+@pytest.fixture
+def make_gallery(app_module):
+    def make(age, image=True):
+        gallery_id = secrets.token_hex(4)
+        app_module.storage_backend.insert_gallery({
+            'id': gallery_id,
+            'image_url': '/media/strip.png' if image else None,
+            'image_urls': ['/media/strip.png'] if image else None,
+            'layout': '1x4',
+            'style': 'default',
+            'color_mode': 'color'
+        })
+        created_at = datetime.now(timezone.utc) - age
+        app_module.storage_backend.update_gallery(gallery_id, {'created_at': created_at.isoformat()})
+        return gallery_id
+    return make
+
+
+SETTLED_AGE = timedelta(seconds=page_cache.RESULT_PAGE_SETTLE_SECONDS + 60)
+
+
+def test_matching_if_none_match_returns_304(client, make_gallery):
+    gallery_id = make_gallery(SETTLED_AGE)
+    response = client.get(f'/r/{gallery_id}')
+    assert response.status_code == 200
+    etag = response.headers['ETag']
+
+    cached = client.get(f'/r/{gallery_id}', headers={'If-None-Match': etag})
+    assert cached.status_code == 304
+    assert cached.data == b''
+    assert cached.headers['ETag'] == etag
+
+    assert client.get(f'/r/{gallery_id}', headers={'If-None-Match': '"stale"'}).status_code == 200
+
+
+def test_settled_result_is_public_with_bounded_max_age(client, make_gallery):
+    gallery_id = make_gallery(SETTLED_AGE)
+    response = client.get(f'/r/{gallery_id}')
+
+    cache_control = response.cache_control
+    assert cache_control.public and not cache_control.no_cache
+    remaining = (page_cache.RESULT_LIFETIME - SETTLED_AGE).total_seconds()
+    assert remaining - 5 <= cache_control.max_age <= remaining
+    assert page_cache.get_result_page(gallery_id) is not None
+
+
+def test_max_age_never_outlives_the_result(client, make_gallery):
+    gallery_id = make_gallery(page_cache.RESULT_LIFETIME - timedelta(minutes=10))
+    response = client.get(f'/r/{gallery_id}')
+
+    assert 0 < response.cache_control.max_age <= 600
+
+
+def test_pending_result_is_revalidated_and_not_cached(client, make_gallery):
+    gallery_id = make_gallery(timedelta(seconds=5))
+    response = client.get(f'/r/{gallery_id}')
+
+    assert response.status_code == 200
+    assert response.cache_control.no_cache
+    assert not response.cache_control.public and response.cache_control.max_age is None
+    assert page_cache.get_result_page(gallery_id) is None
+    # 아직 바뀔 수 있는 결과도 내용이 같으면 304
+    assert client.get(f'/r/{gallery_id}', headers={'If-None-Match': response.headers['ETag']}).status_code == 304
+
+
+def test_pending_and_settled_etags_follow_record_content(app_module, make_gallery):
+    gallery_id = make_gallery(SETTLED_AGE, image=False)
+    gallery = app_module.storage_backend.get_gallery(gallery_id)
+    assert not page_cache.is_settled(gallery)
+
+    app_module.storage_backend.update_gallery(gallery_id, {'image_url': '/media/strip.png', 'image_urls': ['/media/strip.png']})
+    completed = app_module.storage_backend.get_gallery(gallery_id)
+    assert page_cache.is_settled(completed)
+    assert page_cache.gallery_etag(completed) != page_cache.gallery_etag(gallery)
+
+
+def test_expired_result_redirects(client, make_gallery):
+    gallery_id = make_gallery(page_cache.RESULT_LIFETIME + timedelta(minutes=1))
+    response = client.get(f'/r/{gallery_id}')
+    assert response.status_code == 302
+
+
+def test_invalidate_drops_cached_page():
+    page_cache.put_result_page('cached-id', 'etag', '<html></html>', time.time() + 60)
+    assert page_cache.get_result_page('cached-id')[0] == 'etag'
+
+    page_cache.invalidate_result_page('cached-id')
+    assert page_cache.get_result_page('cached-id') is None
+
+
+class FakeBrotli:
+    """brotli 패키지 대역 (설치 여부와 상관없이 br 협상 경로 확인)"""
+    MODE_TEXT = 1
+
+    @staticmethod
+    def compress(raw, mode, quality):
+        return b'br:' + raw
+
+
+@pytest.fixture
+def static_page(monkeypatch):
+    monkeypatch.setattr(page_cache, 'brotli', FakeBrotli)
+    return page_cache.StaticPage('<html>' + 'ai4cut ' * 200 + '</html>')
+
+
+def serve(static_page, headers):
+    app = Flask(__name__)
+    with app.test_request_context('/', headers=headers):
+        return page_cache.static_response(request, static_page)
+
+
+@pytest.mark.parametrize('accept_encoding, expected', [
+    ('gzip, deflate, br', 'br'),
+    ('br;q=0.5, gzip', 'gzip'),
+    ('gzip', 'gzip'),
+    ('deflate', 'identity'),
+    (None, 'identity'),
+])
+def test_static_response_picks_encoding(static_page, accept_encoding, expected):
+    response = serve(static_page, {'Accept-Encoding': accept_encoding} if accept_encoding else {})
+
+    assert response.get_data() == static_page.bodies[expected]
+    assert response.headers.get('Content-Encoding') == (None if expected == 'identity' else expected)
+    assert 'Accept-Encoding' in response.vary
+    assert response.cache_control.no_cache
+
+
+def test_static_page_without_brotli_offers_gzip_and_identity(monkeypatch):
+    monkeypatch.setattr(page_cache, 'brotli', None)
+    page = page_cache.StaticPage('<html>plain</html>')
+    assert set(page.bodies) == {'identity', 'gzip'}
+    assert gzip.decompress(page.bodies['gzip']) == page.bodies['identity']
+
+    response = serve(page, {'Accept-Encoding': 'br'})
+    assert response.get_data() == b'<html>plain</html>'
+    assert 'Content-Encoding' not in response.headers
+    assert 'Accept-Encoding' in response.vary
+
+
+def test_static_etag_is_per_encoding_and_conditional(static_page):
+    etags = {encoding: serve(static_page, {'Accept-Encoding': encoding}).headers['ETag']
+             for encoding in ('br', 'gzip', 'identity')}
+    assert len(set(etags.values())) == 3
+
+    response = serve(static_page, {'Accept-Encoding': 'gzip', 'If-None-Match': etags['gzip']})
+    assert response.status_code == 304
+    assert serve(static_page, {'Accept-Encoding': 'br', 'If-None-Match': etags['gzip']}).status_code == 200
+
+
+def test_index_is_served_prerendered(client):
+    response = client.get('/', headers={'Accept-Encoding': 'gzip'})
+    assert response.status_code == 200
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert b'<html' in gzip.decompress(response.data).lower()
@@ -0,0 +1,77 @@
+"""프로바이더 라우터 - LocalProvider / LocalFalClient 대역으로 선택, 전환, 쿨다운, 취소 확인"""
+import threading
+
+import pytest
+
+import fal_keys
+import fal_local
+import generation
+import providers
+
+ARGUMENTS = {'prompt': 'test', 'image_urls': ['data:image/png;base64,AAAA'], 'num_images': 2}
+
+
+def test_falls_back_to_next_provider_on_failure():
+    broken = providers.LocalProvider('broken', fail=True)
+    healthy = providers.LocalProvider('healthy')
+    router = providers.ProviderRouter([broken, healthy])
+
+    result, name = router.generate(ARGUMENTS)
+    assert name == 'healthy'
+    assert result == ARGUMENTS['image_urls'] * 2
+    assert router.snapshot()['broken']['error_rate'] == 1.0
+
+
+def test_prefers_provider_with_lower_p50():
+    slow = providers.LocalProvider('slow', latency=0.05)
+    fast = providers.LocalProvider('fast')
+    router = providers.ProviderRouter([slow, fast])
+
+    # 샘플이 없는 프로바이더를 먼저 한 번씩 시도한 뒤에는 p50 이 낮은 쪽으로
+    assert router.generate(ARGUMENTS)[1] == 'slow'
+    assert router.generate(ARGUMENTS)[1] == 'fast'
+    assert router.generate(ARGUMENTS)[1] == 'fast'
+    assert [provider.name for provider in router.ranked()] == ['fast', 'slow']
+
+
+def test_failing_provider_cools_down():
+    flaky = providers.LocalProvider('flaky', fail=True)
+    backup = providers.LocalProvider('backup')
+    router = providers.ProviderRouter([flaky, backup], max_error_rate=0.5, cooldown_seconds=60)
+
+    for _ in range(3):
+        router.generate(ARGUMENTS)
+    assert router.snapshot()['flaky']['cooling_down']
+    assert router.ranked()[0] is backup
+
+    calls = flaky.calls
+    router.generate(ARGUMENTS)
+    assert flaky.calls == calls
+
+
+def test_all_providers_failing_raises_last_error():
+    router = providers.ProviderRouter([providers.LocalProvider('a', fail=True), providers.LocalProvider('b', fail=True)])
+    with pytest.raises(RuntimeError, match='b provider failed'):
+        router.generate(ARGUMENTS)
+
+
+def test_cancelled_job_does_not_fall_back():
+    cancel_event = threading.Event()
+    cancel_event.set()
+    first, second = providers.LocalProvider('first'), providers.LocalProvider('second')
+    router = providers.ProviderRouter([first, second])
+
+    with pytest.raises(generation.JobCancelled):
+        router.generate(ARGUMENTS, cancel_event)
+    assert first.calls == second.calls == 0
+
+
+def test_fal_provider_runs_through_key_pool():
+    pool = fal_keys.KeyPool(['a', 'b'], client_factory=lambda key: fal_local.LocalFalClient(
+        key, result=lambda arguments: {'images': [{'url': url} for url in arguments['image_urls']]}))
+    router = providers.ProviderRouter([providers.FalProvider(key_pool=pool)])
+
+    result, name = router.generate(ARGUMENTS)
+    assert name == 'fal'
+    assert result == ARGUMENTS['image_urls']
+    assert sum(slot['completed'] for slot in pool.snapshot()) == 1
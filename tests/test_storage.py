@@ -0,0 +1,163 @@
+"""저장소 백엔드 - SupabaseStorage 는 로컬 PostgREST 대역 서버로 왕복 수/회로 차단기, LocalStorage 는 임시 디렉터리로 확인"""
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+import storage
+from circuit_breaker import CircuitOpenError
+
+STATS = {'layout': '1x4', 'style': 'default', 'color_mode': 'color', 'is_duo': False, 'image_count': 2}
+
+
+class LocalPostgrest:
+    """PostgREST / Supabase Storage 대역 서버 - 요청 수와 사용된 TCP 연결 수를 기록"""
+
+    def __init__(self):
+        self.requests = []       # (method, path)
+        self.connections = set()  # 클라이언트 (host, port)
+        self.galleries = {}
+        self.generations = []
+        self.objects = {}
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, status, body=None):
+                data = json.dumps(body).encode() if body is not None else b''
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _handle(self):
+                path, _, query = self.path.partition('?')
+                params = dict(part.split('=', 1) for part in query.split('&') if '=' in part)
+                body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+                standin.requests.append((self.command, path))
+                standin.connections.add(self.client_address)
+                gallery_id = params.get('id', '')[3:]  # 'eq.<id>'
+
+                if path.startswith('/storage/v1/object/'):
+                    standin.objects[path] = body
+                    return self._reply(200, {'Key': path})
+                payload = json.loads(body) if body else None
+                if path == '/rest/v1/gallery' and self.command == 'POST':
+                    standin.galleries[payload['id']] = dict(payload)
+                    return self._reply(201, [payload])
+                if path == '/rest/v1/gallery' and self.command == 'PATCH':
+                    standin.galleries[gallery_id].update(payload)
+                    return self._reply(204)
+                if path == '/rest/v1/gallery' and self.command == 'GET':
+                    gallery = standin.galleries.get(gallery_id)
+                    return self._reply(200, [gallery] if gallery else [])
+                if path == '/rest/v1/generations':
+                    standin.generations.extend(payload if isinstance(payload, list) else [payload])
+                    return self._reply(201)
+                if path == '/rest/v1/rpc/complete_gallery':
+                    standin.galleries[payload['p_id']].update(payload['p_fields'])
+                    stats = payload.get('p_stats')
+                    if stats:
+                        standin.generations.extend(stats if isinstance(stats, list) else [stats])
+                    return self._reply(200)
+                return self._reply(404, {'message': 'not found'})
+
+            do_GET = do_POST = do_PATCH = _handle
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def postgrest():
+    with LocalPostgrest() as server:
+        yield server
+
+
+def test_supabase_generation_round_trips(postgrest):
+    backend = storage.SupabaseStorage(postgrest.url, 'test-key')
+
+    gallery_id = backend.insert_gallery({'id': 'abc12345', 'image_url': None, 'layout': '1x4', 'is_public': False})
+    assert backend.round_trips == 1
+
+    urls = backend.upload_images([(f"img{i}.png", b'png', 'image/png') for i in range(2)])
+    backend.complete_gallery(gallery_id, {'image_url': urls[0], 'image_urls': urls}, STATS)
+    assert backend.round_trips == 4  # 업로드 2 + RPC 1
+    assert backend.get_gallery(gallery_id)['image_urls'] == urls
+    assert postgrest.generations == [STATS]
+    assert len(postgrest.connections) <= 2  # 병렬 업로드 2개 연결 재사용
+
+
+def test_supabase_batch_stats_in_one_rpc(postgrest):
+    backend = storage.SupabaseStorage(postgrest.url, 'test-key')
+    backend.insert_gallery({'id': 'batch123', 'image_url': None})
+    variant_stats = [dict(STATS, style=style, image_count=1) for style in ('default', 'ghibli', 'disney')]
+
+    backend.complete_gallery('batch123', {'image_url': '/a.png', 'image_urls': ['/a.png']}, variant_stats)
+    assert postgrest.requests[-1] == ('POST', '/rest/v1/rpc/complete_gallery')
+    assert postgrest.generations == variant_stats
+
+
+def test_supabase_breaker_opens_after_failures():
+    # 닫힌 포트로 연속 실패하면 회로가 열려 이후 호출은 요청 없이 바로 실패
+    down = storage.SupabaseStorage('http://127.0.0.1:9', 'test-key')
+    for _ in range(storage.SUPABASE_BREAKER_FAILURES):
+        with pytest.raises(requests.ConnectionError):
+            down.get_gallery('abc12345')
+    with pytest.raises(CircuitOpenError):
+        down.get_gallery('abc12345')
+    assert down.round_trips == storage.SUPABASE_BREAKER_FAILURES
+    assert down.breaker.snapshot()['state'] == 'open'
+
+
+def test_supabase_client_errors_do_not_open_breaker(postgrest):
+    backend = storage.SupabaseStorage(postgrest.url, 'test-key')
+    for _ in range(storage.SUPABASE_BREAKER_FAILURES + 1):
+        with pytest.raises(requests.HTTPError):
+            backend._rpc('missing_function', {})
+    assert backend.breaker.snapshot()['state'] == 'closed'
+
+
+@pytest.fixture
+def local_backend(tmp_path):
+    return storage.LocalStorage(str(tmp_path))
+
+
+def test_local_gallery_round_trip(local_backend):
+    gallery_id = local_backend.insert_gallery({'id': 'abc12345', 'image_url': None, 'layout': '2x2', 'is_public': False})
+    urls = local_backend.upload_images([('one.png', b'png-1', 'image/png'), ('two.png', b'png-2', 'image/png')])
+    assert urls == ['/media/one.png', '/media/two.png']
+
+    local_backend.complete_gallery(gallery_id, {'image_url': urls[0], 'image_urls': urls, 'cut_urls': None}, STATS)
+    gallery = local_backend.get_gallery(gallery_id)
+    assert gallery['image_urls'] == urls
+    assert gallery['cut_urls'] is None
+    assert gallery['layout'] == '2x2'
+    assert gallery['is_public'] is False
+    assert local_backend.read_image(urls[1]) == b'png-2'
+    assert local_backend.get_gallery('missing') is None
+
+
+def test_local_stats_accept_batch_list(local_backend):
+    local_backend.insert_gallery({'id': 'batch123', 'image_url': None})
+    local_backend.complete_gallery('batch123', {'image_url': '/media/a.png'}, [STATS, dict(STATS, style='ghibli')])
+    local_backend.insert_stats(STATS)
+
+    with local_backend._connect() as conn:
+        styles = [row[0] for row in conn.execute('select style from generations order by id')]
+    assert styles == ['default', 'ghibli', 'default']
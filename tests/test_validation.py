@@ -0,0 +1,45 @@
+"""업로드 검증 - 매직 바이트, 잘린 파일, 해상도 제한, decompression bomb"""
+import io
+
+import pytest
+
+import validation
+from conftest import make_png
+
+
+def test_accepts_png_and_jpeg():
+    info, error = validation.inspect_image(make_png((200, 100)))
+    assert error is None
+    assert (info.mime_type, info.width, info.height) == ('image/png', 200, 100)
+
+    from PIL import Image
+    buffer = io.BytesIO()
+    Image.new('RGB', (100, 100)).save(buffer, format='JPEG')
+    assert validation.inspect_image(buffer.getvalue())[0].mime_type == 'image/jpeg'
+
+
+@pytest.mark.parametrize('data', [b'', b'GIF89a' + b'\0' * 100, make_png()[:-20]])
+def test_rejects_empty_unsupported_and_truncated(data):
+    info, error = validation.inspect_image(data)
+    assert info is None and error
+
+
+def test_rejects_out_of_range_dimensions():
+    assert '작습니다' in validation.inspect_image(make_png((32, 32)))[1]
+    assert '큽니다' in validation.inspect_image(make_png((validation.UPLOAD_MAX_DIMENSION + 1, 64), mode='1'))[1]
+
+
+@pytest.mark.parametrize('size', [(10000, 10000), (20000, 20000)])
+def test_rejects_decompression_bomb(size):
+    # 수십 KB 짜리 1-bit PNG 가 수억 픽셀을 선언 - Pillow 경고/에러 모두 일반 검증 에러로
+    data = make_png(size, color=0, mode='1')
+    assert len(data) < 100 * 1024
+    info, error = validation.inspect_image(data)
+    assert info is None
+    assert '큽니다' in error
+
+
+def test_decompression_bomb_upload_is_400(client):
+    response = client.post('/uploads/stage', data={'image': (io.BytesIO(make_png((20000, 20000), color=0, mode='1')), 'bomb.png')},
+                           content_type='multipart/form-data')
+    assert response.status_code == 400
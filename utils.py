@@ -1,12 +1,13 @@
 """Utils for the app."""
 
 import base64
-import io
-import mimetypes
 import typing
 from google.genai import types
 import gradio as gr
-from PIL import Image
+
+import blob_utils
+# Re-exported so existing callers keep importing them from utils.
+from blob_utils import IMAGE_ENCODE_OPTIONS, LazyImage, get_bytes_from_image, sniff_mime_type  # pylint: disable=unused-import
 
 # Error message for invalid key.
 ker_error_msg = """Please open the app from
@@ -112,36 +113,35 @@ def validate_key(request):
     raise gr.Error(ker_error_msg, None, title=error_title)
 
 
-def get_part_from_file(file):
-  """Help function to get the part from a file."""
-  guessed_type = mimetypes.guess_type(file)
-  if guessed_type:
-    mime_type = guessed_type[0]
-  else:
-    mime_type = "application/octet-stream"
-  with open(file, "rb") as f:
-    data = f.read()
-    return types.Part.from_bytes(
-        data=data,
-        mime_type=mime_type,
-    )
+# Parts built from file or byte contents, keyed by (SHA-256, MIME type).
+_part_cache = blob_utils.PartCache(
+    lambda data, mime_type: types.Part.from_bytes(data=data, mime_type=mime_type)
+)
 
 
-def get_bytes_from_image(image: Image.Image, mime_type: str = "PNG") -> bytes:
-  """Converts a PIL Image object to bytes in the specified format.
+def get_part_from_bytes(data: bytes, mime_type: typing.Optional[str] = None) -> types.Part:
+  """Builds a Part from bytes, reusing a cached Part for identical content."""
+  return _part_cache.from_bytes(data, mime_type)
 
-  Args:
-      image: The PIL Image object.
-      mime_type: The image format to save as (e.g., 'PNG', 'JPEG', 'GIF').
-        Defaults to 'PNG'.
 
-  Returns:
-      A bytes object representing the image in the specified format.
+def get_part_from_file(file):
+  """Help function to get the part from a file.
+
+  Parts are cached by the SHA-256 of the file contents and the sniffed MIME
+  type. A file whose path, mtime and size are unchanged since the last call
+  is not read again.
   """
-  img_byte_arr = io.BytesIO()
-  image.save(img_byte_arr, format=mime_type)
-  img_byte_arr = img_byte_arr.getvalue()
-  return img_byte_arr
+  return _part_cache.from_file(file)
+
+
+def clear_part_cache():
+  """Drops all cached Parts."""
+  _part_cache.clear()
+
+
+def _read_parts(files) -> list:
+  """Reads files into Parts, in parallel when there is more than one."""
+  return blob_utils.read_parallel(get_part_from_file, files)
 
 
 def get_parts_from_message(
@@ -156,23 +156,23 @@ def get_parts_from_message(
       parts.append(types.Part.from_text(text=message["text"]))
 
     if "files" in message:
-      for file in message["files"]:
-        parts.append(get_part_from_file(file))
+      parts.extend(_read_parts(message["files"]))
   elif isinstance(message, str):
     if message:
       parts.append(types.Part.from_text(text=message))
   elif isinstance(message, gr.Image):
     if message.type == "pil":
-      bytes_data = get_bytes_from_image(message.value)
-      parts.append(
-          types.Part.from_bytes(data=bytes_data, mime_type=message.format)
-      )
+      bytes_data = get_bytes_from_image(message.value, message.format)
+      parts.append(get_part_from_bytes(bytes_data))
     elif message.type == "filepath":
       parts.append(get_part_from_file(message.value))
   else:
-    for part in list(message):
-      if part.startswith("/tmp/gradio"):
-        parts.append(get_part_from_file(part))
+    items = list(message)
+    files = [part for part in items if part.startswith("/tmp/gradio")]
+    file_parts = dict(zip(files, _read_parts(files)))
+    for part in items:
+      if part in file_parts:
+        parts.append(file_parts[part])
       elif part:
         parts.append(types.Part.from_text(text=part))
 
@@ -183,15 +183,17 @@ def get_parts_from_message(
   return parts
 
 
-def convert_blob_to_gr_image(blob: types.Blob) -> gr.Image:
-  """Converts a blob of image data to a gr.Image object."""
-  blob_data = blob.data
-  # Create an in-memory binary stream using io.BytesIO
-  image_stream = io.BytesIO(blob_data)
+def convert_blob_to_gr_image(blob: types.Blob, lazy: bool = False) -> gr.Image:
+  """Converts a blob of image data to a gr.Image object.
 
-  # Open the image from the stream using PIL.Image.open()
-  image = Image.open(image_stream)
-  return gr.Image(image)
+  With lazy=True the bytes are handed to Gradio as a file under
+  blob_utils.LAZY_BLOB_DIR, so they are never decoded and re-encoded on the
+  server. That directory is bounded by blob_utils.LAZY_BLOB_MAX_FILES.
+  """
+  image = LazyImage(blob.data, blob.mime_type)
+  if lazy:
+    return gr.Image(image.to_file())
+  return gr.Image(image.image)
 
 
 def image_blob_to_markdown_base64(blob: types.Blob) -> str:
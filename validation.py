@@ -0,0 +1,84 @@
+"""업로드 이미지 검증 - 매직 바이트 판별 + Pillow 헤더만 읽는 probe (전체 디코드 없음)
+
+잘못된 업로드는 gallery placeholder 생성이나 FAL 호출 전에 여기서 거절하고,
+통과한 이미지는 실제 포맷의 MIME 타입을 함께 돌려준다.
+"""
+import io
+import os
+import warnings
+from collections import namedtuple
+
+from PIL import Image, UnidentifiedImageError
+
+UPLOAD_MAX_BYTES = int(os.getenv('UPLOAD_MAX_BYTES', str(20 * 1024 * 1024)))
+# 요청 1건의 본문 상한 - 사진 2장을 data URI(base64)로 보내도 들어가는 크기 + 폼 필드 여유분
+REQUEST_MAX_BYTES = int(os.getenv('REQUEST_MAX_BYTES', str(2 * UPLOAD_MAX_BYTES * 4 // 3 + 1024 * 1024)))
+UPLOAD_MIN_DIMENSION = 64
+UPLOAD_MAX_DIMENSION = 8192
+
+# FAL / Gemini 가 입력으로 받는 포맷
+PILLOW_FORMAT_MIME_TYPES = {
+    'PNG': 'image/png',
+    'JPEG': 'image/jpeg',
+    'WEBP': 'image/webp',
+}
+
+ImageInfo = namedtuple('ImageInfo', ['mime_type', 'width', 'height', 'size'])
+
+
+def sniff_image_type(data):
+    """선두 바이트로 이미지 MIME 타입 판별 (지원하지 않는 포맷이면 None)"""
+    if data[:8] == b'\x89PNG\r\n\x1a\n':
+        return 'image/png'
+    if data[:3] == b'\xff\xd8\xff':
+        return 'image/jpeg'
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'image/webp'
+    return None
+
+
+def _is_truncated(data, mime_type):
+    """파일 끝 마커로 잘린 업로드 판별 (디코드 없이 수 바이트만 확인)"""
+    if mime_type == 'image/png':
+        return b'IEND' not in data[-16:]
+    if mime_type == 'image/jpeg':
+        # 카메라 JPEG 은 EOI 뒤에 부가 데이터가 붙기도 하므로 마지막 64KB 안에서 찾음
+        return data.rfind(b'\xff\xd9', max(2, len(data) - 65536)) == -1
+    if mime_type == 'image/webp':
+        return int.from_bytes(data[4:8], 'little') + 8 > len(data)
+    return False
+
+
+def inspect_image(data):
+    """업로드 이미지 검증 - (ImageInfo, None) 또는 (None, 에러 메시지) 반환"""
+    if not data:
+        return None, '이미지 데이터를 읽을 수 없습니다.'
+    if len(data) > UPLOAD_MAX_BYTES:
+        return None, f'이미지 크기는 {UPLOAD_MAX_BYTES // (1024 * 1024)}MB 이하여야 합니다.'
+
+    mime_type = sniff_image_type(data)
+    if mime_type is None:
+        return None, 'PNG, JPEG, WebP 이미지만 업로드할 수 있습니다.'
+    if _is_truncated(data, mime_type):
+        return None, '이미지 파일이 손상되었거나 업로드가 완료되지 않았습니다.'
+
+    # Image.open 은 헤더만 파싱하고 픽셀은 디코드하지 않음
+    # 작은 파일에 큰 해상도를 적은 decompression bomb 은 경고(MAX_IMAGE_PIXELS 초과)도 오류로 보고 거절
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter('error', Image.DecompressionBombWarning)
+            with Image.open(io.BytesIO(data)) as image:
+                image_format, (width, height) = image.format, image.size
+    except (Image.DecompressionBombError, Image.DecompressionBombWarning):
+        return None, f'이미지가 너무 큽니다. (최대 {UPLOAD_MAX_DIMENSION}px)'
+    except (UnidentifiedImageError, OSError, ValueError):
+        return None, '이미지 파일이 손상되었습니다.'
+
+    if PILLOW_FORMAT_MIME_TYPES.get(image_format) != mime_type:
+        return None, '이미지 파일이 손상되었습니다.'
+    if min(width, height) < UPLOAD_MIN_DIMENSION:
+        return None, f'이미지가 너무 작습니다. (최소 {UPLOAD_MIN_DIMENSION}px)'
+    if max(width, height) > UPLOAD_MAX_DIMENSION:
+        return None, f'이미지가 너무 큽니다. (최대 {UPLOAD_MAX_DIMENSION}px)'
+
+    return ImageInfo(mime_type, width, height, len(data)), None